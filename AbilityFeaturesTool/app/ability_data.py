@@ -3,7 +3,7 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Dict, List, Mapping, Optional
+from typing import Dict, List, Mapping, Optional, Tuple
 import copy
 
 
@@ -950,9 +950,133 @@ NCALC_LINKS: List[Dict[str, str]] = [
 ]
 
 
+# Identifier tables used to validate NCalc formulas inside [code=...] blocks.
+# Kinds are "number", "bool" or "any" (value type depends on the arguments).
+NCALC_FUNCTIONS: Mapping[str, Tuple[int, Optional[int], str]] = {
+    # Built-in NCalc functions: (minimum arguments, maximum or None, result kind)
+    "Abs": (1, 1, "number"),
+    "Acos": (1, 1, "number"),
+    "Asin": (1, 1, "number"),
+    "Atan": (1, 1, "number"),
+    "Ceiling": (1, 1, "number"),
+    "Cos": (1, 1, "number"),
+    "Exp": (1, 1, "number"),
+    "Floor": (1, 1, "number"),
+    "IEEERemainder": (2, 2, "number"),
+    "Log": (2, 2, "number"),
+    "Log10": (1, 1, "number"),
+    "Max": (2, 2, "number"),
+    "Min": (2, 2, "number"),
+    "Pow": (2, 2, "number"),
+    "Round": (1, 2, "number"),
+    "Sign": (1, 1, "number"),
+    "Sin": (1, 1, "number"),
+    "Sqrt": (1, 1, "number"),
+    "Tan": (1, 1, "number"),
+    "Truncate": (1, 1, "number"),
+    "in": (2, None, "bool"),
+    "if": (3, 3, "any"),
+    # Memoria additions
+    "GetRandom": (2, 2, "number"),
+    "HasSA": (1, None, "bool"),
+    "HasAA": (1, None, "bool"),
+    "CheckAnyStatus": (2, None, "bool"),
+    "CheckHasStatus": (2, None, "bool"),
+    "CombineStatuses": (2, None, "number"),
+    "RemoveStatuses": (2, None, "number"),
+    "GetItemProperty": (2, 2, "any"),
+    "GetAbilityUsageCount": (1, 1, "number"),
+}
+
+# Unit properties; formulas may also use them with a Caster or Target prefix.
+NCALC_UNIT_PROPERTIES: Mapping[str, str] = {
+    **{
+        name: "number"
+        for name in (
+            "HP", "MP", "MaxHP", "MaxMP", "ATB", "MaxATB", "Trance", "Level", "Exp",
+            "Speed", "Strength", "Magic", "Spirit", "Defence", "Evade", "MagicDefence",
+            "MagicEvade", "Row", "Position", "CurrentStatus", "PermanentStatus",
+            "ResistStatus", "HalfElement", "GuardElement", "AbsorbElement", "WeakElement",
+            "BonusElement", "WeaponId", "HeadId", "WristId", "ArmorId", "AccessoryId",
+            "WeaponPower", "WeaponRate", "WeaponElement", "WeaponStatus", "WeaponCategory",
+            "SerialNumber", "CharacterIndex", "PlayerCategory", "Category", "Id",
+            "CriticalRateBonus", "CriticalRateWeakening", "MaxDamageLimit",
+            "MaxMPDamageLimit", "BonusExp", "BonusGil", "BonusCard", "HPDamage", "MPDamage",
+            "ModelId", "PartyIndex",
+        )
+    },
+    **{
+        name: "bool"
+        for name in (
+            "IsPlayer", "IsSlave", "IsOutOfReach", "IsTargetable", "IsUnderStatus",
+            "IsAllyOfCaster", "HasTrance", "InTrance",
+        )
+    },
+}
+
+# Battle, command and effect variables available without a prefix.
+NCALC_VARIABLES: Mapping[str, str] = {
+    **{
+        name: "number"
+        for name in (
+            "AbilityId", "CommandId", "ScriptId", "AbilityCategory", "AbilityFlags",
+            "AbilityStatus", "AbilityElement", "AbilityElementForBonus", "Power",
+            "Attack", "AttackPower", "DefencePower", "StatusRate", "HitRate",
+            "EffectFlags", "EffectCasterFlags", "EffectTargetFlags", "DamageModifierCount",
+            "TranceIncrease", "ItemSteal", "Gil", "BattleBonusAP", "Counter", "ReturnMagic",
+            "AutoItem", "MPCost", "MPCostFactor", "MaxHPLimit", "MaxMPLimit",
+            "CommandTargetId", "TargetCount", "BackAttack", "Preemptive",
+            "PreemptivePriority", "SpecialEffect", "Patch", "BanishSAByLvl", "BanishAAByLvl",
+            "BonusAP", "BonusEXP", "BonusItemAdd", "EachBonusItem", "EachBonusItemCount",
+            "FleeGil", "Status", "ScenarioCounter", "BattleId", "FieldId", "Frogs",
+            "StealCount", "TonberryKills", "Steps", "Timer",
+        )
+    },
+    **{
+        name: "bool"
+        for name in (
+            "IsCounterableCommand", "IsShortRanged", "IsReflectNull", "IsMeteorMiss",
+            "IsShortSummon", "TryCover", "IsSingleTarget", "IsMultiTarget",
+        )
+    },
+}
+
+# Enumerations exposed as constants (BattleStatus_Trance, RegularItem_Avenger …).
+NCALC_CONSTANT_PREFIXES: Tuple[str, ...] = (
+    "BattleStatus_", "BattleStatusId_", "RegularItem_", "BattleAbilityId_", "BattleCommandId_",
+    "SupportAbility_", "CalcFlag_", "BattleCalcFlags_", "EffectElement_", "TargetType_",
+    "CharacterId_", "CharacterPresetId_", "AbilityCategory_", "AbilityFlags_", "ItemType_",
+)
+
+# Expected result of blocks that are not simply property overrides.
+# Disable/HardDisable accept either a boolean or a number (templates use 1).
+NCALC_BLOCK_RESULTS: Mapping[str, str] = {
+    "Condition": "bool",
+    "HardDisable": "any",
+    "Disable": "any",
+    "Patch": "any",
+}
+
+
 def feature_type_details() -> List[Dict[str, object]]:
     return FEATURE_TYPE_DETAILS
 
 
 def ncalc_links() -> List[Dict[str, str]]:
     return list(NCALC_LINKS)
+
+
+def ncalc_identifiers() -> Dict[str, str]:
+    """Identifier -> kind for every name a formula may reference (constants excluded)."""
+    known: Dict[str, str] = {}
+    for detail in FEATURE_TYPE_DETAILS:
+        for prop in detail.get("properties", []):
+            name = str(prop).split(" ", 1)[0]
+            if name.isidentifier():
+                known[name] = "bool" if name.startswith("Is") else "number"
+    known.update(NCALC_VARIABLES)
+    for name, kind in NCALC_UNIT_PROPERTIES.items():
+        known.setdefault(name, kind)
+        known[f"Caster{name}"] = kind
+        known[f"Target{name}"] = kind
+    return known
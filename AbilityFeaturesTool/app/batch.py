@@ -0,0 +1,158 @@
+"""Generate entries in bulk by filling a template's ``{placeholders}`` from CSV rows.
+
+A template body is compiled once into alternating literal text and
+placeholder slots, then bound to the CSV header so every row is rendered with
+a single ``%`` format of the row's cells; no searching or parsing of the
+template happens per row. Rows are streamed, so the CSV can be of any size.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from operator import itemgetter
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Sequence, TextIO, Tuple
+import csv
+import re
+import time
+
+from .ability_data import AbilityTemplate
+from .models import AbilityEntry
+
+
+PLACEHOLDER_PATTERN = re.compile(r"{([A-Za-z0-9_]+)}")
+
+
+class BatchError(Exception):
+    """Raised when a CSV sheet does not fit the template."""
+
+
+@dataclass(frozen=True)
+class CompiledTemplate:
+    """``literals[i]`` precedes ``fields[i]``; the final literal closes the body."""
+
+    literals: Tuple[str, ...]
+    fields: Tuple[str, ...]
+
+    @property
+    def names(self) -> List[str]:
+        """Distinct placeholder names in order of first use."""
+        return list(dict.fromkeys(self.fields))
+
+    def bind(self, columns: Sequence[str]) -> Callable[[Sequence[str]], str]:
+        """A ``row -> text`` renderer for CSV rows laid out as *columns*."""
+        positions = {name: index for index, name in enumerate(columns)}
+        missing = [name for name in self.names if name not in positions]
+        if missing:
+            raise BatchError("The CSV has no column for " + ", ".join(f"{{{name}}}" for name in missing))
+        if not self.fields:
+            text = self.literals[0]
+            return lambda row: text
+        pattern = "%s".join(literal.replace("%", "%%") for literal in self.literals)
+        indexes = [positions[name] for name in self.fields]
+        if len(indexes) == 1:
+            only = indexes[0]
+            return lambda row: pattern % (row[only],)
+        pick = itemgetter(*indexes)
+        return lambda row: pattern % pick(row)
+
+
+def compile_template(body: str) -> CompiledTemplate:
+    literals: List[str] = []
+    fields: List[str] = []
+    position = 0
+    for match in PLACEHOLDER_PATTERN.finditer(body):
+        literals.append(body[position:match.start()])
+        fields.append(match.group(1))
+        position = match.end()
+    literals.append(body[position:])
+    return CompiledTemplate(tuple(literals), tuple(fields))
+
+
+@dataclass
+class BatchResult:
+    entries: List[AbilityEntry] = field(default_factory=list)
+    rows: int = 0
+    skipped_rows: int = 0
+    unused_columns: List[str] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    def summary(self) -> str:
+        text = f"Generated {len(self.entries)} entries from {self.rows} rows in {self.elapsed * 1000:.0f} ms"
+        if self.skipped_rows:
+            text += f"; skipped {self.skipped_rows} blank rows"
+        if self.unused_columns:
+            text += "; ignored columns " + ", ".join(self.unused_columns)
+        return text
+
+
+def split_entries(text: str) -> List[AbilityEntry]:
+    """Split rendered template text into entries, one per ``>`` header line.
+
+    Lines before the first header have no entry to belong to and are dropped.
+    """
+    entries: List[AbilityEntry] = []
+    current: List[str] = []
+    for line in text.strip().split("\n"):
+        line = line.rstrip("\r")
+        if line.lstrip().startswith(">"):
+            if current:
+                entries.append(AbilityEntry(header=current[0], body_lines=current[1:]))
+            current = [line]
+        elif current:
+            current.append(line)
+    if current:
+        entries.append(AbilityEntry(header=current[0], body_lines=current[1:]))
+    return entries
+
+
+def generate(
+    template: AbilityTemplate,
+    columns: Sequence[str],
+    rows: Iterable[Sequence[str]],
+) -> BatchResult:
+    """Render *template* once per row; *columns* names the cells of every row.
+
+    Raises :class:`BatchError` when a placeholder has no column, or when a row
+    is too short or does not render into an entry with a ``>`` header.
+    """
+    started = time.perf_counter()
+    compiled = compile_template(template.body)
+    columns = [column.strip() for column in columns]
+    render = compiled.bind(columns)
+    known = set(compiled.fields) | set(template.placeholders)
+    result = BatchResult(unused_columns=[column for column in columns if column and column not in known])
+    width = len(columns)
+    # Line 1 of the sheet is the header.
+    for line_no, row in enumerate(rows, start=2):
+        if not any(cell.strip() for cell in row):
+            result.skipped_rows += 1
+            continue
+        if len(row) < width:
+            raise BatchError(f"Row {line_no} has {len(row)} cells, expected {width}")
+        result.rows += 1
+        entries = split_entries(render([cell.strip() for cell in row]))
+        if not entries:
+            raise BatchError(f"Row {line_no} does not produce an entry starting with '>'")
+        result.entries.extend(entries)
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+def read_csv(handle: TextIO) -> Tuple[List[str], Iterator[List[str]]]:
+    """Header and a lazy row reader; the delimiter is sniffed from the header line."""
+    first = handle.readline()
+    try:
+        dialect = csv.Sniffer().sniff(first, delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    header = next(csv.reader([first], dialect), [])
+    if not header:
+        raise BatchError("The CSV file is empty")
+    return header, csv.reader(handle, dialect)
+
+
+def generate_from_csv(template: AbilityTemplate, path: Path) -> BatchResult:
+    with path.open("r", encoding="utf-8-sig", newline="") as handle:
+        columns, rows = read_csv(handle)
+        return generate(template, columns, rows)
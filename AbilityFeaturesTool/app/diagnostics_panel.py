@@ -0,0 +1,273 @@
+"""Live lint results for the open document and the entry editor.
+
+:class:`DiagnosticsPanel` validates on a worker thread. After each document
+edit it hands a snapshot of the entries to :class:`lint.IncrementalLinter`,
+which re-checks only the entries that changed; the editor text is linted as a
+standalone entry once typing pauses. The first pass over a freshly opened
+document streams its findings into the list as they come. Activating a row
+emits the entry, or the editor line, it refers to.
+"""
+
+from __future__ import annotations
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from queue import Empty, SimpleQueue
+from typing import List, Optional, Tuple
+
+from PySide6.QtCore import QAbstractListModel, QModelIndex, QObject, Qt, QTimer, Signal
+from PySide6.QtGui import QBrush, QColor
+from PySide6.QtWidgets import QLabel, QListView, QVBoxLayout, QWidget
+
+from . import lint, ncalc
+from .models import AbilityDocument, AbilityEntry
+from .persistent import PersistentVector
+
+
+# entry_index of diagnostics that belong to the entry editor.
+EDITOR_INDEX = -1
+
+DOCUMENT_DELAY_MS = 100
+EDITOR_DELAY_MS = 300
+
+_SEVERITY_COLORS = {ncalc.ERROR: QColor("#c62828"), ncalc.WARNING: QColor("#9a6700")}
+
+
+class DiagnosticListModel(QAbstractListModel):
+    def __init__(self, parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        self._editor: List[ncalc.Diagnostic] = []
+        self._document: List[ncalc.Diagnostic] = []
+        self._entries: Optional[PersistentVector[AbilityEntry]] = None
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:  # noqa: N802 - Qt API
+        if parent.isValid():
+            return 0
+        return len(self._editor) + len(self._document)
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole):  # noqa: ANN001 - Qt API
+        if not index.isValid():
+            return None
+        diagnostic = self.diagnostic(index.row())
+        if role == Qt.DisplayRole:
+            if diagnostic.entry_index == EDITOR_INDEX:
+                return f"Editor: {diagnostic.severity} (line {diagnostic.line}, column {diagnostic.column}): {diagnostic.message}"
+            return ncalc.format_diagnostic(diagnostic)
+        if role == Qt.ForegroundRole:
+            color = _SEVERITY_COLORS.get(diagnostic.severity)
+            return QBrush(color) if color is not None else None
+        if role == Qt.ToolTipRole:
+            return diagnostic.message
+        return None
+
+    def diagnostic(self, row: int) -> ncalc.Diagnostic:
+        if row < len(self._editor):
+            return self._editor[row]
+        return self._document[row - len(self._editor)]
+
+    def entry(self, row: int) -> Optional[AbilityEntry]:
+        """The entry a document diagnostic refers to, as of the pass that found it."""
+        diagnostic = self.diagnostic(row)
+        entries = self._entries
+        if diagnostic.entry_index == EDITOR_INDEX or entries is None:
+            return None
+        if 0 <= diagnostic.entry_index < len(entries):
+            return entries[diagnostic.entry_index]
+        return None
+
+    def diagnostics(self) -> List[ncalc.Diagnostic]:
+        return self._editor + self._document
+
+    def set_editor(self, diagnostics: List[ncalc.Diagnostic]) -> None:
+        self.beginResetModel()
+        self._editor = diagnostics
+        self.endResetModel()
+
+    def set_document(
+        self, diagnostics: List[ncalc.Diagnostic], entries: Optional[PersistentVector[AbilityEntry]]
+    ) -> None:
+        self.beginResetModel()
+        self._document = diagnostics
+        self._entries = entries
+        self.endResetModel()
+
+    def extend_document(self, diagnostics: List[ncalc.Diagnostic]) -> None:
+        if not diagnostics:
+            return
+        first = self.rowCount()
+        self.beginInsertRows(QModelIndex(), first, first + len(diagnostics) - 1)
+        self._document.extend(diagnostics)
+        self.endInsertRows()
+
+
+class DiagnosticsPanel(QWidget):
+    entry_activated = Signal(object)
+    editor_line_activated = Signal(int)
+
+    def __init__(self, parent: Optional[QWidget] = None) -> None:
+        super().__init__(parent)
+        self._document: Optional[AbilityDocument] = None
+        self._linted_version = -1
+        self._linter = lint.IncrementalLinter()
+        self._editor_text: Optional[str] = None
+        self._last_pass: Optional[lint.LintPass] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._future: Optional[Future] = None
+        self._future_entries: Optional[PersistentVector[AbilityEntry]] = None
+        self._future_generation = 0
+        # Batches streamed by the worker during a first pass.
+        self._batches: "SimpleQueue[Tuple[int, List[ncalc.Diagnostic]]]" = SimpleQueue()
+        self._generation = 0
+        self._rerun = False
+
+        self._document_timer = QTimer(self)
+        self._document_timer.setSingleShot(True)
+        self._document_timer.setInterval(DOCUMENT_DELAY_MS)
+        self._document_timer.timeout.connect(self._start_pass)
+        self._editor_timer = QTimer(self)
+        self._editor_timer.setSingleShot(True)
+        self._editor_timer.setInterval(EDITOR_DELAY_MS)
+        self._editor_timer.timeout.connect(self._start_pass)
+        self._poll_timer = QTimer(self)
+        self._poll_timer.setInterval(50)
+        self._poll_timer.timeout.connect(self._poll_pass)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(4, 4, 4, 4)
+        self.summary_label = QLabel("No document.")
+        layout.addWidget(self.summary_label)
+        self.model = DiagnosticListModel(self)
+        self.result_view = QListView()
+        self.result_view.setUniformItemSizes(True)
+        self.result_view.setModel(self.model)
+        self.result_view.setToolTip("Double-click a problem to open the entry.")
+        self.result_view.activated.connect(self._open_row)
+        layout.addWidget(self.result_view)
+
+    # ------------------------------------------------------------------ input
+    def document_changed(self, document: Optional[AbilityDocument]) -> None:
+        """Re-validate after *document* changed (or a different one was opened)."""
+        if document is not self._document:
+            self._document = document
+            self._linted_version = -1
+            # A pass still running for the old document keeps its own linter.
+            self._linter = lint.IncrementalLinter()
+            self._generation += 1
+            self._last_pass = None
+            self.model.set_document([], None)
+            if document is None:
+                self._document_timer.stop()
+                self._update_summary()
+                return
+        elif document is None or document.version == self._linted_version:
+            return
+        self._document_timer.start()
+
+    def editor_text_changed(self, text: str) -> None:
+        self._editor_text = text
+        self._editor_timer.start()
+
+    # ------------------------------------------------------------------ passes
+    def _start_pass(self) -> None:
+        if self._future is not None:
+            self._rerun = True
+            return
+        document = self._document
+        entries = None
+        if document is not None and document.version != self._linted_version:
+            entries = document.entries.snapshot()
+            self._linted_version = document.version
+        editor_text, self._editor_text = self._editor_text, None
+        if entries is None and editor_text is None:
+            return
+        stream = entries is not None and self._last_pass is None
+        if stream:
+            self.model.set_document([], entries)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1)
+        self._future = self._executor.submit(
+            self._run_pass, self._linter, entries, editor_text, self._generation if stream else None
+        )
+        self._future_entries = entries
+        self._future_generation = self._generation
+        self._poll_timer.start()
+        if stream:
+            self.summary_label.setText(f"Checking {len(entries)} entries…")
+
+    def _run_pass(
+        self,
+        linter: lint.IncrementalLinter,
+        entries: Optional[PersistentVector[AbilityEntry]],
+        editor_text: Optional[str],
+        stream: Optional[int],
+    ) -> Tuple[Optional[lint.LintPass], Optional[List[ncalc.Diagnostic]]]:
+        # Runs on the worker thread; batches reach the list through _poll_pass.
+        result = None
+        if entries is not None:
+            on_batch = None if stream is None else (lambda batch: self._batches.put((stream, batch)))
+            result = linter.run(entries, on_batch)
+        editor = None if editor_text is None else lint_editor_text(editor_text)
+        return result, editor
+
+    def _poll_pass(self) -> None:
+        while True:
+            try:
+                generation, batch = self._batches.get_nowait()
+            except Empty:
+                break
+            if generation == self._generation:
+                self.model.extend_document(batch)
+                self._update_summary(streaming=True)
+        future = self._future
+        if future is None or not future.done():
+            return
+        self._poll_timer.stop()
+        self._future = None
+        result, editor = future.result()
+        if editor is not None:
+            self.model.set_editor(editor)
+        if result is not None and self._future_generation == self._generation:
+            self._last_pass = result
+            scrollbar = self.result_view.verticalScrollBar()
+            scroll = scrollbar.value()
+            self.model.set_document(result.diagnostics, self._future_entries)
+            scrollbar.setValue(scroll)
+        self._update_summary()
+        if self._rerun:
+            self._rerun = False
+            self._start_pass()
+
+    # ------------------------------------------------------------------ output
+    def _update_summary(self, streaming: bool = False) -> None:
+        counts = ncalc.summarize(self.model.diagnostics())
+        problems = f"{counts[ncalc.ERROR]} errors, {counts[ncalc.WARNING]} warnings"
+        result = self._last_pass
+        if streaming:
+            self.summary_label.setText(f"{problems} so far…")
+        elif result is not None:
+            self.summary_label.setText(
+                f"{problems}. Checked {result.checked} of {result.total} entries in {result.elapsed * 1000:.0f} ms."
+            )
+        elif self._document is None:
+            self.summary_label.setText(f"{problems} in the editor." if self.model.rowCount() else "No document.")
+        else:
+            self.summary_label.setText(problems + ".")
+
+    def _open_row(self, index: QModelIndex) -> None:
+        diagnostic = self.model.diagnostic(index.row())
+        if diagnostic.entry_index == EDITOR_INDEX:
+            self.editor_line_activated.emit(diagnostic.line)
+            return
+        entry = self.model.entry(index.row())
+        if entry is not None:
+            self.entry_activated.emit(entry)
+
+
+def lint_editor_text(text: str) -> List[ncalc.Diagnostic]:
+    """Lint the entry editor's text as one entry; empty text has no findings."""
+    if not text.strip():
+        return []
+    try:
+        entry = AbilityEntry.from_text(text)
+    except ValueError as exc:
+        return [ncalc.Diagnostic(ncalc.ERROR, str(exc), EDITOR_INDEX, "", 1, 1, "")]
+    return lint.lint_entry(entry, EDITOR_INDEX)
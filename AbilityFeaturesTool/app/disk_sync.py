@@ -0,0 +1,558 @@
+"""Fold changes made to the open file by other programs into the edited document.
+
+:class:`DiskState` remembers the file as it was last loaded or saved: its
+bytes and the entries they hold, in file order. When the file changes,
+:func:`read_changes` compares the new bytes with the old ones (common prefix
+and common suffix), widens the difference to whole entries and parses only
+those. Entries whose bytes did not change keep their objects and anchor the
+comparison; the rest of the region is paired with
+:func:`document_diff.diff_documents`.
+
+:func:`plan_sync` then holds each changed entry against the document. Entries
+are never edited in place, so an entry of the old file that is still in the
+document (the very object) has no local edits: the file's version replaces
+it, and its removal or move is carried over. An entry that was also edited in
+the document becomes a :class:`SyncConflict`, unless both sides made the same
+edit; the caller decides those before :func:`apply_sync` applies the plan in a
+few batch edits. Local edits to entries the file did not touch are kept.
+Nothing here imports Qt.
+"""
+
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+import os
+import re
+import time
+
+from .document_diff import ADDED, MODIFIED, MOVED, REMOVED, EntryChange, diff_documents, in_order
+from .models import AbilityDocument, AbilityEntry, gc_paused, parse_header, parse_source
+from .storage import FileFingerprint, new_hasher
+
+
+# A ">" that starts a line after any of the three kinds of line break.
+_HEADER_START = re.compile(rb"[\r\n]>")
+# Bytes compared per step while looking for the common prefix and suffix.
+_COMPARE_STEP = 1 << 16
+
+
+@dataclass
+class DiskState:
+    """The file as last loaded or saved; ``entries[i]`` starts at ``header_starts()[i]``."""
+
+    data: memoryview
+    entries: Tuple[AbilityEntry, ...]
+    preamble: Tuple[str, ...]
+    fingerprint: Optional[FileFingerprint]
+    _starts: Optional[array] = field(default=None, init=False, repr=False)
+    _ids: Optional[Set[int]] = field(default=None, init=False, repr=False)
+
+    @classmethod
+    def loaded(cls, document: AbilityDocument) -> Optional["DiskState"]:
+        """State of a document that has just finished loading from its file."""
+        data = document.loaded_bytes
+        if data is None:
+            return None
+        return cls(data, tuple(document.entries), tuple(document.preamble), document.fingerprint)
+
+    @classmethod
+    def saved(cls, document: AbilityDocument, data: bytes, fingerprint: FileFingerprint) -> Optional["DiskState"]:
+        """State after *document* was written out as *data*.
+
+        None when those bytes would not read back as the same entries, e.g.
+        when an edited body holds a line starting with ``>``.
+        """
+        headers = data.count(b"\n>") + data.count(b"\r>") + data.startswith(b">")
+        if headers != len(document.entries):
+            return None
+        return cls(memoryview(data), tuple(document.entries), tuple(document.preamble), fingerprint)
+
+    def header_starts(self) -> array:
+        if self._starts is None:
+            data = self.data
+            starts = array("q", [0] if data[:1] == b">" else [])
+            starts.extend(match.start() + 1 for match in _HEADER_START.finditer(data))
+            self._starts = starts
+        return self._starts
+
+    def contains(self, entry: AbilityEntry) -> bool:
+        """True when *entry* (this very object) is one of the file's entries."""
+        if self._ids is None:
+            self._ids = {id(entry) for entry in self.entries}
+        return id(entry) in self._ids
+
+
+@dataclass
+class DiskChange:
+    """Entries ``[start, stop)`` of ``previous`` became ``entries`` in ``state``.
+
+    ``changes`` are indexed relative to the region. Entries whose text did not
+    change are the objects of ``previous``, not new copies.
+    """
+
+    previous: DiskState
+    state: DiskState
+    start: int = 0
+    stop: int = 0
+    entries: List[AbilityEntry] = field(default_factory=list)
+    changes: List[EntryChange] = field(default_factory=list)
+    # Set when the changed region includes the preamble.
+    preamble: Optional[List[str]] = None
+    bytes_parsed: int = 0
+    elapsed: float = 0.0
+
+
+@dataclass
+class SyncConflict:
+    """An entry edited in the document that the file changed (or removed) as well."""
+
+    base: AbilityEntry
+    ours: Optional[AbilityEntry]
+    theirs: Optional[AbilityEntry]
+    take_disk: bool = False
+
+    @property
+    def header(self) -> str:
+        for entry in (self.ours, self.theirs, self.base):
+            if entry is not None:
+                return entry.header.strip()
+        return ""
+
+
+@dataclass
+class SyncPlan:
+    change: DiskChange
+    # (entry in the document, the file's version) for entries without local edits.
+    replacements: List[Tuple[AbilityEntry, AbilityEntry]] = field(default_factory=list)
+    removals: List[AbilityEntry] = field(default_factory=list)
+    # Entries of the new region to insert (added, or moved on disk).
+    placements: List[AbilityEntry] = field(default_factory=list)
+    conflicts: List[SyncConflict] = field(default_factory=list)
+    preamble: Optional[List[str]] = None
+    preamble_conflict: bool = False
+    # Region entry -> the entry standing for it in the document, for anchoring insertions.
+    counterparts: Dict[int, AbilityEntry] = field(default_factory=dict)
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.replacements or self.removals or self.placements or self.conflicts) and self.preamble is None
+
+    def successor(self, entry: AbilityEntry) -> Optional[AbilityEntry]:
+        """The file's version that took the place of *entry* in the document, if any."""
+        for ours, theirs in self.replacements:
+            if ours is entry:
+                return theirs
+        for conflict in self.conflicts:
+            if conflict.take_disk and conflict.ours is entry:
+                return conflict.theirs
+        for item in self.change.changes:
+            if item.kind == MODIFIED and item.old is entry:
+                return item.new
+        return None
+
+    def summary(self) -> str:
+        change = self.change
+        applied = len(self.replacements) + len(self.removals) + len(self.placements)
+        if self.preamble is not None:
+            applied += 1
+        parts = [
+            f"compared {change.stop - change.start} entries and parsed {change.bytes_parsed} bytes "
+            f"in {change.elapsed * 1000:.0f} ms",
+            f"{applied} changes applied",
+        ]
+        if self.conflicts:
+            taken = sum(conflict.take_disk for conflict in self.conflicts)
+            parts.append(f"{len(self.conflicts) - taken} of {len(self.conflicts)} conflicting edits kept")
+        if self.preamble_conflict:
+            parts.append("kept the edited preamble")
+        return ", ".join(parts)
+
+
+# ---------------------------------------------------------------------- reading
+def read_file(path: Path) -> Tuple[bytes, FileFingerprint]:
+    with path.open("rb") as handle:
+        stat = os.fstat(handle.fileno())
+        data = handle.read()
+    hasher = new_hasher()
+    hasher.update(data)
+    return data, FileFingerprint(path, len(data), stat.st_mtime_ns, hasher.hexdigest())
+
+
+def read_changes(state: DiskState, path: Path) -> DiskChange:
+    """Read *path* again and work out which of *state*'s entries it changed.
+
+    Raises ``OSError`` or ``UnicodeDecodeError`` when the file cannot be read.
+    """
+    started = time.perf_counter()
+    data, fingerprint = read_file(path)
+    old, new = state.data, memoryview(data)
+    starts = state.header_starts()
+    unchanged = state.fingerprint.digest == fingerprint.digest if state.fingerprint is not None else old == new
+    if unchanged:
+        same = DiskState(new, state.entries, state.preamble, fingerprint)
+        same._starts = starts
+        return DiskChange(state, same, elapsed=time.perf_counter() - started)
+
+    prefix = _common_prefix(old, new)
+    suffix = _common_suffix(old, new, min(len(old), len(new)) - prefix)
+    # Widen to whole entries: back to the last header whose ">" lies in the
+    # common prefix, forward to the first one whose line break lies in the
+    # common suffix. Both are headers at the same place in either file.
+    first = bisect_left(starts, prefix) - 1
+    begin = starts[first] if first >= 0 else 0
+    first = max(first, 0)
+    stop = bisect_left(starts, len(old) - suffix + 1)
+    old_end = starts[stop] if stop < len(starts) else len(old)
+    new_end = old_end - len(old) + len(new)
+
+    with gc_paused():
+        region = new[begin:new_end]
+        local = array("q", [0] if region[:1] == b">" else [])
+        local.extend(match.start() + 1 for match in _HEADER_START.finditer(region))
+        bounds = list(local) + [len(region)]
+        preamble = parse_source(region[:bounds[0]])[0] if begin == 0 else None
+
+        # Entries whose bytes did not change are taken over as they are; only
+        # the spans that differ are parsed. Copies of the same bytes are
+        # paired in order, unless their number changed: then only copies
+        # between the same two unchanged entries are paired.
+        old_entries = list(state.entries[first:stop])
+        old_bounds = list(starts[first:stop]) + [old_end]
+        old_spans = [bytes(old[low:high]) for low, high in zip(old_bounds, old_bounds[1:])]
+        spans = [bytes(region[low:high]) for low, high in zip(bounds, bounds[1:])]
+        unchanged: Dict[bytes, List[int]] = {}
+        for index in range(len(old_spans) - 1, -1, -1):
+            unchanged.setdefault(old_spans[index], []).append(index)
+        copies = Counter(spans)
+        taken: List[Optional[int]] = []
+        ambiguous = False
+        for span in spans:
+            bucket = unchanged.get(span)
+            if bucket and len(bucket) == copies[span]:
+                taken.append(bucket.pop())
+                copies[span] -= 1
+            else:
+                taken.append(None)
+                ambiguous = ambiguous or bool(bucket)
+        if ambiguous:
+            _pair_copies(old_spans, spans, taken)
+        parsed: List[AbilityEntry] = []
+        parsed_bytes = 0
+        for old_index, low, high in zip(taken, bounds, bounds[1:]):
+            if old_index is not None:
+                parsed.append(old_entries[old_index])
+            else:
+                parsed.extend(parse_source(region[low:high])[1])
+                parsed_bytes += high - low
+
+        entries, changes = _region_changes(old_entries, parsed)
+
+    shift = len(new) - len(old)
+    new_state = DiskState(
+        new,
+        state.entries[:first] + tuple(entries) + state.entries[stop:],
+        tuple(preamble) if preamble is not None else state.preamble,
+        fingerprint,
+    )
+    new_state._starts = (
+        starts[:first]
+        + array("q", [begin + start for start in local])
+        + array("q", [start + shift for start in starts[stop:]])
+    )
+    return DiskChange(
+        previous=state,
+        state=new_state,
+        start=first,
+        stop=stop,
+        entries=entries,
+        changes=changes,
+        preamble=preamble,
+        bytes_parsed=parsed_bytes,
+        elapsed=time.perf_counter() - started,
+    )
+
+
+def _common_prefix(old: memoryview, new: memoryview) -> int:
+    limit = min(len(old), len(new))
+    position = 0
+    while position < limit:
+        end = min(limit, position + _COMPARE_STEP)
+        if old[position:end] != new[position:end]:
+            low, high = position, end
+            while high - low > 1:
+                middle = (low + high) // 2
+                if old[low:middle] == new[low:middle]:
+                    low = middle
+                else:
+                    high = middle
+            return low
+        position = end
+    return limit
+
+
+def _common_suffix(old: memoryview, new: memoryview, limit: int) -> int:
+    """Length of the common suffix, at most *limit* bytes."""
+    old_end, new_end = len(old), len(new)
+    length = 0
+    while length < limit:
+        end = min(limit, length + _COMPARE_STEP)
+        if old[old_end - end:old_end - length] != new[new_end - end:new_end - length]:
+            low, high = length, end
+            while high - low > 1:
+                middle = (low + high) // 2
+                if old[old_end - middle:old_end - low] == new[new_end - middle:new_end - low]:
+                    low = middle
+                else:
+                    high = middle
+            return low
+        length = end
+    return limit
+
+
+def _pair_copies(old_spans: List[bytes], spans: List[bytes], taken: List[Optional[int]]) -> None:
+    """Pair up the copies left in *taken* that lie between the same two paired spans."""
+    used = {index for index in taken if index is not None}
+    previous_old = previous_new = -1
+    for new_index in sorted(in_order(taken)) + [len(spans)]:
+        old_index = taken[new_index] if new_index < len(spans) else len(old_spans)
+        assert old_index is not None
+        waiting: Dict[bytes, List[int]] = {}
+        for index in range(old_index - 1, previous_old, -1):
+            if index not in used:
+                waiting.setdefault(old_spans[index], []).append(index)
+        if waiting:
+            for index in range(previous_new + 1, new_index):
+                if taken[index] is None:
+                    bucket = waiting.get(spans[index])
+                    if bucket:
+                        taken[index] = bucket.pop()
+        previous_old, previous_new = old_index, new_index
+
+
+def _region_changes(
+    old_entries: List[AbilityEntry], new_entries: List[AbilityEntry]
+) -> Tuple[List[AbilityEntry], List[EntryChange]]:
+    """Entry changes from *old_entries* to *new_entries*, indexed within the region.
+
+    Entries taken over byte for byte are the same objects on both sides. They
+    anchor the comparison: the others are paired up with ``diff_documents``
+    within each gap between anchors first, so copies of one entry pair with
+    the copy at the same place, and then across the region to find moves.
+    New entries whose text did not change are swapped for the old objects, so
+    the document keeps the entries it already has.
+    """
+    positions = {id(entry): index for index, entry in enumerate(old_entries)}
+    new_to_old: List[Optional[int]] = [positions.get(id(entry)) for entry in new_entries]
+    entries = list(new_entries)
+    modified: Set[int] = set()
+
+    def pair(old_indexes: List[int], new_indexes: List[int]) -> Tuple[List[int], List[int]]:
+        # Pairs what it can and returns the old and new indexes left over.
+        if not old_indexes or not new_indexes:
+            return old_indexes, new_indexes
+        diff = diff_documents(
+            AbilityDocument(entries=[old_entries[index] for index in old_indexes]),
+            AbilityDocument(entries=[new_entries[index] for index in new_indexes]),
+        )
+        paired_old: Set[int] = set()
+        paired_new: Set[int] = set()
+        for change in diff.changes:
+            if change.kind in (MODIFIED, MOVED):
+                assert change.old_index is not None and change.new_index is not None
+                old_index, new_index = old_indexes[change.old_index], new_indexes[change.new_index]
+                new_to_old[new_index] = old_index
+                if change.kind == MODIFIED:
+                    modified.add(new_index)
+                else:
+                    entries[new_index] = old_entries[old_index]
+            if change.old_index is not None and change.kind != ADDED:
+                paired_old.add(change.old_index)
+            if change.new_index is not None:
+                paired_new.add(change.new_index)
+        # Unchanged pairs are the rest of either side, in the same order. Those
+        # that only differ in trailing blank lines count as modified, so the
+        # document writes back the file's exact bytes.
+        left_old = [index for position, index in enumerate(old_indexes) if position not in paired_old]
+        left_new = [index for position, index in enumerate(new_indexes) if position not in paired_new]
+        for new_index, old_index in zip(left_new, left_old):
+            new_to_old[new_index] = old_index
+            if old_entries[old_index].original_bytes == new_entries[new_index].original_bytes:
+                entries[new_index] = old_entries[old_index]
+            else:
+                modified.add(new_index)
+        removed = [change.old_index for change in diff.changes if change.kind == REMOVED]
+        added = [change.new_index for change in diff.changes if change.kind == ADDED]
+        return [old_indexes[index] for index in removed], [new_indexes[index] for index in added]
+
+    taken = {old_index for old_index in new_to_old if old_index is not None}
+    anchors = sorted(in_order(new_to_old))
+    gone: List[int] = []
+    fresh: List[int] = []
+    previous_old = previous_new = -1
+    for new_index in anchors + [len(new_entries)]:
+        old_index = new_to_old[new_index] if new_index < len(new_entries) else len(old_entries)
+        assert old_index is not None
+        gap_old = [index for index in range(previous_old + 1, old_index) if index not in taken]
+        gap_new = [index for index in range(previous_new + 1, new_index) if new_to_old[index] is None]
+        left_old, left_new = pair(gap_old, gap_new)
+        gone.extend(left_old)
+        fresh.extend(left_new)
+        previous_old, previous_new = old_index, new_index
+    gone, fresh = pair(gone, fresh)
+
+    kept = in_order(new_to_old)
+    changes: List[EntryChange] = []
+    for new_index, old_index in enumerate(new_to_old):
+        entry = entries[new_index]
+        if old_index is None:
+            changes.append(EntryChange(ADDED, None, new_index, None, entry))
+        elif new_index in modified:
+            changes.append(EntryChange(MODIFIED, old_index, new_index, old_entries[old_index], entry, new_index not in kept))
+        elif new_index not in kept:
+            changes.append(EntryChange(MOVED, old_index, new_index, entry, entry, True))
+    changes.extend(EntryChange(REMOVED, index, None, old_entries[index], None) for index in gone)
+    return entries, changes
+
+
+# ---------------------------------------------------------------------- merging
+def plan_sync(document: AbilityDocument, change: DiskChange) -> SyncPlan:
+    """Decide what *change* does to *document*; conflicts are left undecided."""
+    plan = SyncPlan(change)
+    previous = change.previous
+    # Entries edited (or added) in the document, looked up by header and by
+    # (type, ID) to find the local version of an entry the file changed.
+    by_header: Dict[str, List[AbilityEntry]] = {}
+    by_key: Dict[Tuple[str, int], List[AbilityEntry]] = {}
+    if any(item.kind in (MODIFIED, REMOVED) and document.index_of(item.old) is None for item in change.changes):
+        for entry in document.entries:
+            if not previous.contains(entry):
+                by_header.setdefault(entry.header.strip(), []).append(entry)
+                key = parse_header(entry.header)
+                if key is not None and key[1] is not None:
+                    by_key.setdefault((key[0], key[1]), []).append(entry)
+    claimed: Set[int] = set()
+
+    def local_version(base: AbilityEntry) -> Optional[AbilityEntry]:
+        candidates = by_header.get(base.header.strip(), [])
+        key = parse_header(base.header)
+        if key is not None and key[1] is not None:
+            candidates = candidates + by_key.get((key[0], key[1]), [])
+        for candidate in candidates:
+            if id(candidate) not in claimed:
+                claimed.add(id(candidate))
+                return candidate
+        return None
+
+    counterparts = plan.counterparts
+    for item in change.changes:
+        old, new = item.old, item.new
+        in_document = old is not None and document.index_of(old) is not None
+        if item.kind == ADDED:
+            assert new is not None
+            plan.placements.append(new)
+        elif item.kind == MOVED:
+            assert old is not None
+            if in_document:
+                plan.removals.append(old)
+                plan.placements.append(old)
+        elif item.kind == MODIFIED:
+            assert old is not None and new is not None
+            if in_document:
+                if item.moved:
+                    plan.removals.append(old)
+                    plan.placements.append(new)
+                else:
+                    plan.replacements.append((old, new))
+                continue
+            if old.rendered() == new.rendered():
+                continue  # only blank lines changed; the local edit stands
+            ours = local_version(old)
+            if ours is not None and ours.rendered() == new.rendered():
+                # Both sides made the same edit; adopt the file's object.
+                plan.replacements.append((ours, new))
+            else:
+                plan.conflicts.append(SyncConflict(old, ours, new))
+                if ours is not None:
+                    counterparts[id(new)] = ours
+        elif item.kind == REMOVED:
+            assert old is not None
+            if in_document:
+                plan.removals.append(old)
+                continue
+            ours = local_version(old)
+            if ours is not None:
+                plan.conflicts.append(SyncConflict(old, ours, None))
+
+    if change.preamble is not None and tuple(change.preamble) != previous.preamble:
+        if tuple(document.preamble) == previous.preamble:
+            plan.preamble = list(change.preamble)
+        elif list(document.preamble) != change.preamble:
+            plan.preamble_conflict = True
+    return plan
+
+
+def apply_sync(document: AbilityDocument, plan: SyncPlan) -> None:
+    """Carry out *plan* (with its conflicts decided) and adopt the new file state."""
+    replacements = list(plan.replacements)
+    removals = list(plan.removals)
+    placed = {id(entry) for entry in plan.placements}
+    for conflict in plan.conflicts:
+        if not conflict.take_disk:
+            continue
+        if conflict.theirs is None:
+            assert conflict.ours is not None
+            removals.append(conflict.ours)
+        elif conflict.ours is None:
+            placed.add(id(conflict.theirs))
+        else:
+            replacements.append((conflict.ours, conflict.theirs))
+            plan.counterparts.pop(id(conflict.theirs), None)
+
+    with gc_paused():
+        for ours, theirs in replacements:
+            index = document.index_of(ours)
+            if index is not None:
+                document.replace_at(index, theirs)
+        if removals:
+            indexes = [document.index_of(entry) for entry in removals]
+            document.remove_many([index for index in indexes if index is not None])
+        if placed:
+            _place(document, plan, placed)
+        if plan.preamble is not None:
+            document.set_preamble(plan.preamble)
+    document.fingerprint = plan.change.state.fingerprint
+
+
+def _place(document: AbilityDocument, plan: SyncPlan, placed: Set[int]) -> None:
+    # Each new entry goes after the document's version of the entry before it
+    # in the file; runs of new entries share one insert.
+    change = plan.change
+    positions = {id(entry): index for index, entry in enumerate(document.entries)}
+    anchor: Optional[int] = None
+    for entry in reversed(change.previous.entries[:change.start]):
+        if id(entry) in positions:
+            anchor = positions[id(entry)]
+            break
+    groups: List[Tuple[int, List[AbilityEntry]]] = []
+    run: List[AbilityEntry] = []
+    for entry in change.entries:
+        if id(entry) in placed:
+            run.append(entry)
+            continue
+        if run:
+            groups.append((0 if anchor is None else anchor + 1, run))
+            run = []
+        standing = plan.counterparts.get(id(entry), entry)
+        if id(standing) in positions:
+            anchor = positions[id(standing)]
+    if run:
+        groups.append((0 if anchor is None else anchor + 1, run))
+    # Back to front, so earlier indexes stay valid; of two runs for the same
+    # place, the later one goes in first and ends up second.
+    for order, (index, entries) in sorted(enumerate(groups), key=lambda item: (item[1][0], item[0]), reverse=True):
+        document.insert_many(index, entries)
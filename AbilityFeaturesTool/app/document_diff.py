@@ -0,0 +1,218 @@
+"""Entry-level comparison of two AbilityDocuments.
+
+Entries are paired with hash lookups: first identical entries (same rendered
+text), then entries that kept their header, then entries that kept their
+``(type, ID)``. Paired entries that fall outside the longest run kept in the
+same relative order are reported as moved. Line diffs are only computed, on
+demand, for the entries that actually changed.
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Hashable, List, Optional, Sequence, Set, Tuple
+import difflib
+import time
+
+from .models import AbilityDocument, AbilityEntry, parse_header
+
+
+ADDED = "added"
+REMOVED = "removed"
+MODIFIED = "modified"
+MOVED = "moved"
+
+CHANGE_KINDS = (ADDED, REMOVED, MODIFIED, MOVED)
+
+
+@dataclass
+class EntryChange:
+    """One entry that differs; ``moved`` also flags modified entries that changed position."""
+
+    kind: str
+    old_index: Optional[int]
+    new_index: Optional[int]
+    old: Optional[AbilityEntry]
+    new: Optional[AbilityEntry]
+    moved: bool = False
+
+    @property
+    def header(self) -> str:
+        entry = self.new if self.new is not None else self.old
+        assert entry is not None
+        return entry.header
+
+    def describe(self) -> str:
+        if self.kind == MODIFIED and self.moved:
+            return "modified and moved"
+        return self.kind
+
+    def line_diff(self, context: int = 3) -> List[str]:
+        """Unified diff of the entry's lines (header included)."""
+        old_lines = [self.old.header, *self.old.body_lines] if self.old is not None else []
+        new_lines = [self.new.header, *self.new.body_lines] if self.new is not None else []
+        old_name = f"before #{self.old_index + 1}" if self.old_index is not None else "before"
+        new_name = f"after #{self.new_index + 1}" if self.new_index is not None else "after"
+        return list(difflib.unified_diff(old_lines, new_lines, old_name, new_name, n=context, lineterm=""))
+
+
+@dataclass
+class DocumentDiff:
+    changes: List[EntryChange] = field(default_factory=list)
+    unchanged: int = 0
+    preamble_changed: bool = False
+    elapsed: float = 0.0
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.changes and not self.preamble_changed
+
+    def counts(self) -> Dict[str, int]:
+        counts = {kind: 0 for kind in CHANGE_KINDS}
+        for change in self.changes:
+            counts[change.kind] += 1
+        return counts
+
+    def summary(self) -> str:
+        if self.is_empty:
+            return "No differences."
+        counts = self.counts()
+        parts = [f"{counts[kind]} {kind}" for kind in CHANGE_KINDS if counts[kind]]
+        if self.preamble_changed:
+            parts.append("preamble changed")
+        return ", ".join(parts) + f"; {self.unchanged} unchanged"
+
+
+def diff_documents(old: AbilityDocument, new: AbilityDocument) -> DocumentDiff:
+    """Compare *old* (e.g. the file on disk) with *new* (e.g. the edited document)."""
+    started = time.perf_counter()
+    old_entries = list(old.entries)
+    new_entries = list(new.entries)
+    old_to_new: List[Optional[int]] = [None] * len(old_entries)
+    new_to_old: List[Optional[int]] = [None] * len(new_entries)
+
+    def pair_by(key: Callable[[AbilityEntry], Optional[Hashable]], old_span: range, new_span: range) -> None:
+        # Buckets are filled back to front so pop() hands out old entries in document order.
+        buckets: Dict[Hashable, List[int]] = {}
+        for index in reversed(old_span):
+            if old_to_new[index] is None:
+                value = key(old_entries[index])
+                if value is not None:
+                    buckets.setdefault(value, []).append(index)
+        if not buckets:
+            return
+        for index in new_span:
+            if new_to_old[index] is not None:
+                continue
+            bucket = buckets.get(key(new_entries[index]))
+            if bucket:
+                match = bucket.pop()
+                old_to_new[match] = index
+                new_to_old[index] = match
+
+    keys: List[Callable[[AbilityEntry], Optional[Hashable]]] = [
+        AbilityEntry.rendered,
+        lambda entry: entry.header,
+        lambda entry: parse_header(entry.header),
+    ]
+
+    # Anchors: entries whose text occurs exactly once on each side (as in a
+    # patience diff). Those that kept their relative order split both
+    # documents into gaps; repeated or edited entries are paired inside their
+    # own gap first so one moved duplicate does not shift all the others.
+    old_counts = Counter(entry.rendered() for entry in old_entries)
+    new_counts = Counter(entry.rendered() for entry in new_entries)
+    unique_old = {
+        entry.rendered(): index
+        for index, entry in enumerate(old_entries)
+        if old_counts[entry.rendered()] == 1
+    }
+    for index, entry in enumerate(new_entries):
+        text = entry.rendered()
+        if new_counts[text] == 1 and text in unique_old:
+            new_to_old[index] = unique_old[text]
+            old_to_new[unique_old[text]] = index
+    anchors = sorted(in_order(new_to_old))
+    bounds = [(-1, -1)] + [(new_to_old[index], index) for index in anchors] + [(len(old_entries), len(new_entries))]
+    for (old_start, new_start), (old_stop, new_stop) in zip(bounds, bounds[1:]):
+        assert old_start is not None and old_stop is not None
+        if old_stop - old_start > 1 and new_stop - new_start > 1:
+            old_span = range(old_start + 1, old_stop)
+            new_span = range(new_start + 1, new_stop)
+            for key in keys:
+                pair_by(key, old_span, new_span)
+    for key in keys:
+        pair_by(key, range(len(old_entries)), range(len(new_entries)))
+
+    kept = in_order(new_to_old)
+    changes: List[EntryChange] = []
+    unchanged = 0
+    for new_index, old_index in enumerate(new_to_old):
+        entry = new_entries[new_index]
+        if old_index is None:
+            changes.append(EntryChange(ADDED, None, new_index, None, entry))
+            continue
+        previous = old_entries[old_index]
+        moved = new_index not in kept
+        if previous is not entry and previous.rendered() != entry.rendered():
+            changes.append(EntryChange(MODIFIED, old_index, new_index, previous, entry, moved))
+        elif moved:
+            changes.append(EntryChange(MOVED, old_index, new_index, previous, entry, True))
+        else:
+            unchanged += 1
+
+    # Removed entries are listed where they used to be: before the new position
+    # of the next old entry that survived.
+    removed: List[Tuple[int, EntryChange]] = []
+    anchor = len(new_entries)
+    for old_index in range(len(old_entries) - 1, -1, -1):
+        new_index = old_to_new[old_index]
+        if new_index is None:
+            removed.append((anchor, EntryChange(REMOVED, old_index, None, old_entries[old_index], None)))
+        else:
+            anchor = new_index
+    if removed:
+        removed.reverse()
+        merged: List[EntryChange] = []
+        position = 0
+        for change in changes:
+            assert change.new_index is not None
+            while position < len(removed) and removed[position][0] <= change.new_index:
+                merged.append(removed[position][1])
+                position += 1
+            merged.append(change)
+        merged.extend(change for _, change in removed[position:])
+        changes = merged
+
+    return DocumentDiff(
+        changes=changes,
+        unchanged=unchanged,
+        preamble_changed=list(old.preamble) != list(new.preamble),
+        elapsed=time.perf_counter() - started,
+    )
+
+
+def in_order(new_to_old: Sequence[Optional[int]]) -> Set[int]:
+    """New indexes of the longest run of pairs whose old indexes increase (patience LIS)."""
+    tails: List[int] = []
+    tail_at: List[int] = []
+    parents: Dict[int, Optional[int]] = {}
+    for new_index, old_index in enumerate(new_to_old):
+        if old_index is None:
+            continue
+        slot = bisect_left(tails, old_index)
+        parents[new_index] = tail_at[slot - 1] if slot else None
+        if slot == len(tails):
+            tails.append(old_index)
+            tail_at.append(new_index)
+        else:
+            tails[slot] = old_index
+            tail_at[slot] = new_index
+    kept: Set[int] = set()
+    cursor: Optional[int] = tail_at[-1] if tail_at else None
+    while cursor is not None:
+        kept.add(cursor)
+        cursor = parents[cursor]
+    return kept
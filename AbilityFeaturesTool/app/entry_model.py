@@ -0,0 +1,258 @@
+"""Qt item models exposing an AbilityDocument to the entry list view."""
+
+from __future__ import annotations
+
+from typing import Callable, Iterable, List, Optional, Sequence, Set
+
+from PySide6.QtCore import (
+    QAbstractListModel,
+    QMimeData,
+    QModelIndex,
+    QObject,
+    QSortFilterProxyModel,
+    Qt,
+    Signal,
+)
+
+from .models import AbilityDocument, AbilityEntry
+from .search_index import SearchQuery
+
+
+ENTRY_ROLE = Qt.UserRole
+ENTRY_ROWS_MIME_TYPE = "application/x-abilityfeatures-entry-rows"
+
+
+class EntryListModel(QAbstractListModel):
+    """Flat list model over ``AbilityDocument.entries``.
+
+    Mutations go through the model so views receive fine-grained row
+    notifications instead of being rebuilt. ``sync_rows`` exposes entries that
+    were appended to the document directly (e.g. while streaming a file in).
+    """
+
+    def __init__(self, parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        self._document: Optional[AbilityDocument] = None
+        self._row_count = 0
+
+    def document(self) -> Optional[AbilityDocument]:
+        return self._document
+
+    def set_document(self, document: Optional[AbilityDocument]) -> None:
+        self.beginResetModel()
+        self._document = document
+        self._row_count = len(document.entries) if document else 0
+        self.endResetModel()
+
+    # ------------------------------------------------------------------ Qt API
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:  # noqa: N802
+        if parent.isValid():
+            return 0
+        return self._row_count
+
+    def flags(self, index: QModelIndex) -> Qt.ItemFlags:
+        if not index.isValid():
+            return Qt.ItemIsDropEnabled
+        return super().flags(index) | Qt.ItemIsDragEnabled
+
+    def supportedDropActions(self) -> Qt.DropActions:  # noqa: N802
+        return Qt.MoveAction
+
+    def supportedDragActions(self) -> Qt.DropActions:  # noqa: N802
+        return Qt.MoveAction | Qt.CopyAction
+
+    def mimeTypes(self) -> List[str]:  # noqa: N802
+        return [ENTRY_ROWS_MIME_TYPE]
+
+    def mimeData(self, indexes: Sequence[QModelIndex]) -> QMimeData:  # noqa: N802
+        # Only rows are carried; the view performs the move itself (see EntryListView).
+        mime = QMimeData()
+        rows = sorted({index.row() for index in indexes if index.isValid()})
+        mime.setData(ENTRY_ROWS_MIME_TYPE, ",".join(map(str, rows)).encode("ascii"))
+        return mime
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole) -> object:
+        entry = self.entry_at(index.row()) if index.isValid() else None
+        if entry is None:
+            return None
+        if role == Qt.DisplayRole:
+            return entry.header
+        if role == ENTRY_ROLE:
+            return entry
+        return None
+
+    # ------------------------------------------------------------------ helpers
+    def entry_at(self, row: int) -> Optional[AbilityEntry]:
+        if self._document is None or row < 0 or row >= self._row_count:
+            return None
+        return self._document.entries[row]
+
+    def row_of(self, entry: AbilityEntry) -> Optional[int]:
+        if self._document is None:
+            return None
+        row = self._document.index_of(entry)
+        if row is None or row >= self._row_count:
+            return None
+        return row
+
+    def sync_rows(self) -> None:
+        """Announce entries appended to the document since the last notification."""
+        total = len(self._document.entries) if self._document else 0
+        if total > self._row_count:
+            self.beginInsertRows(QModelIndex(), self._row_count, total - 1)
+            self._row_count = total
+            self.endInsertRows()
+
+    def insert_entry(self, index: int, entry: AbilityEntry) -> int:
+        assert self._document is not None
+        self.sync_rows()
+        index = max(0, min(index, self._row_count))
+        self.beginInsertRows(QModelIndex(), index, index)
+        self._document.insert(index, entry)
+        self._row_count += 1
+        self.endInsertRows()
+        return index
+
+    def remove_entry(self, index: int) -> AbilityEntry:
+        assert self._document is not None
+        self.beginRemoveRows(QModelIndex(), index, index)
+        entry = self._document.remove(index)
+        self._row_count -= 1
+        self.endRemoveRows()
+        return entry
+
+    def move_entry(self, old_index: int, new_index: int) -> bool:
+        assert self._document is not None
+        if old_index == new_index or not (0 <= old_index < self._row_count and 0 <= new_index < self._row_count):
+            return False
+        destination = new_index + 1 if new_index > old_index else new_index
+        if not self.beginMoveRows(QModelIndex(), old_index, old_index, QModelIndex(), destination):
+            return False
+        moved = self._document.move(old_index, new_index)
+        self.endMoveRows()
+        return moved
+
+    def replace_entry(self, index: int, entry: AbilityEntry) -> AbilityEntry:
+        assert self._document is not None
+        previous = self._document.replace_at(index, entry)
+        model_index = self.index(index, 0)
+        self.dataChanged.emit(model_index, model_index)
+        return previous
+
+    # ------------------------------------------------------------------ batches
+    # One document pass and one notification per batch, however many rows it touches.
+    def insert_entries(self, index: int, entries: Sequence[AbilityEntry]) -> int:
+        assert self._document is not None
+        self.sync_rows()
+        index = max(0, min(index, self._row_count))
+        if not entries:
+            return index
+        self.beginInsertRows(QModelIndex(), index, index + len(entries) - 1)
+        self._document.insert_many(index, entries)
+        self._row_count += len(entries)
+        self.endInsertRows()
+        return index
+
+    def remove_entries(self, rows: Iterable[int]) -> List[AbilityEntry]:
+        assert self._document is not None
+        self.sync_rows()
+        chosen = sorted({row for row in rows if 0 <= row < self._row_count})
+        if not chosen:
+            return []
+        contiguous = chosen[-1] - chosen[0] + 1 == len(chosen)
+        if contiguous:
+            self.beginRemoveRows(QModelIndex(), chosen[0], chosen[-1])
+        else:
+            self.beginResetModel()
+        removed = self._document.remove_many(chosen)
+        self._row_count = len(self._document.entries)
+        if contiguous:
+            self.endRemoveRows()
+        else:
+            self.endResetModel()
+        return removed
+
+    def move_entries(self, rows: Iterable[int], destination: int) -> bool:
+        document = self._document
+        assert document is not None
+        return self._relayout(lambda: document.move_many(rows, destination))
+
+    def shift_entries(self, rows: Iterable[int], delta: int) -> bool:
+        document = self._document
+        assert document is not None
+        return self._relayout(lambda: document.shift_many(rows, delta))
+
+    def sort_entries(self, rows: Optional[Iterable[int]] = None) -> bool:
+        document = self._document
+        assert document is not None
+        return self._relayout(lambda: document.sort_by_id(rows))
+
+    def _relayout(self, change: Callable[[], bool]) -> bool:
+        """Apply a reordering as a single layout change, keeping persistent indexes on their entries."""
+        self.sync_rows()
+        self.layoutAboutToBeChanged.emit()
+        persistent = self.persistentIndexList()
+        tracked = [self.entry_at(index.row()) for index in persistent]
+        changed = change()
+        if changed:
+            assert self._document is not None
+            updated = []
+            for entry in tracked:
+                row = self._document.index_of(entry) if entry is not None else None
+                updated.append(self.index(row, 0) if row is not None else QModelIndex())
+            self.changePersistentIndexList(persistent, updated)
+        self.layoutChanged.emit()
+        return changed
+
+
+class EntryFilterProxyModel(QSortFilterProxyModel):
+    """Filters the entry list with a search query answered by the document's search index.
+
+    Matches are cached per query and recomputed lazily whenever the index
+    reports a change, so rows inserted or replaced later are filtered too.
+    """
+
+    filtering_finished = Signal()
+
+    def __init__(self, parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        self._query = SearchQuery()
+        self._text = ""
+        self._matches: Optional[Set[int]] = None
+        self._matches_version = -1
+
+    def filter_text(self) -> str:
+        return self._text
+
+    def query(self) -> SearchQuery:
+        return self._query
+
+    def set_filter_text(self, text: str) -> None:
+        if text == self._text:
+            return
+        self._text = text
+        self._query = SearchQuery.parse(text)
+        self._matches = None
+        self.invalidateRowsFilter()
+        self.filtering_finished.emit()
+
+    def entry_for(self, index: QModelIndex) -> Optional[AbilityEntry]:
+        if not index.isValid():
+            return None
+        return self.data(index, ENTRY_ROLE)
+
+    def filterAcceptsRow(self, source_row: int, source_parent: QModelIndex) -> bool:  # noqa: N802
+        if self._query.is_empty:
+            return True
+        source = self.sourceModel()
+        if not isinstance(source, EntryListModel):
+            return True
+        entry = source.entry_at(source_row)
+        document = source.document()
+        if entry is None or document is None:
+            return False
+        index = document.search_index()
+        if self._matches is None or self._matches_version != index.version:
+            self._matches = index.match(self._query)
+            self._matches_version = index.version
+        return id(entry) in self._matches
@@ -0,0 +1,145 @@
+"""Structural parse of AbilityFeatures entry bodies.
+
+A body is made of scope lines (``StatusInit``, ``Ability AsTarget`` …),
+``[code=Block] expression [/code]`` segments that may span several lines, the
+feature keywords that follow a scope (``AsTarget``, ``InitialStatus Doom`` …)
+and ``#`` comments. ``AbilityEntry.parsed()`` memoizes the result per entry so
+block detection, searching and validation share a single pass over the text.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import FrozenSet, List, Optional, Sequence, Tuple
+import re
+
+from . import ability_data
+
+
+CODE_BLOCK_PATTERN = re.compile(r"\[code=([A-Za-z0-9_]+)\]")
+CODE_BLOCK_END = "[/code]"
+# A block opening plus its expression up to [/code] or, when it continues on
+# later lines, the end of the line (group 3 is empty in that case).
+_SEGMENT_PATTERN = re.compile(r"\[code=([A-Za-z0-9_]+)\](.*?)(\[/code\]|$)")
+
+SCOPE_KEYWORDS: FrozenSet[str] = frozenset(
+    scope.key for scopes in ability_data.SCOPE_REGISTRY.values() for scope in scopes
+)
+
+
+@dataclass
+class CodeBlock:
+    name: str
+    expression: str
+    line: int
+    column: int
+    end_line: int
+    closed: bool
+    scope: Optional[int]
+
+
+@dataclass
+class ScopeLine:
+    keyword: str
+    line: int
+    keywords: Tuple[str, ...]
+
+
+@dataclass
+class ParsedBody:
+    """Scopes, code blocks and comments of an entry body.
+
+    ``line`` numbers index ``body_lines``. ``CodeBlock.scope`` points into
+    ``scopes`` (``None`` for blocks that appear before any scope line) and
+    ``stray`` holds words that could not be attributed to a scope.
+    """
+
+    scopes: Tuple[ScopeLine, ...]
+    blocks: Tuple[CodeBlock, ...]
+    comments: Tuple[int, ...]
+    stray: Tuple[Tuple[int, str], ...]
+
+    @property
+    def block_names(self) -> List[str]:
+        """Distinct block names in order of first appearance."""
+        return list(dict.fromkeys(block.name for block in self.blocks))
+
+    @property
+    def scope_keywords(self) -> FrozenSet[str]:
+        return frozenset(scope.keyword for scope in self.scopes)
+
+    def blocks_named(self, name: str) -> List[CodeBlock]:
+        return [block for block in self.blocks if block.name == name]
+
+
+def parse_body(lines: Sequence[str]) -> ParsedBody:
+    scopes: List[Tuple[str, int, List[str]]] = []
+    blocks: List[CodeBlock] = []
+    comments: List[int] = []
+    stray: List[Tuple[int, str]] = []
+    # Block still waiting for its [/code]: (name, line, column, scope, expression parts).
+    pending: Optional[Tuple[str, int, int, Optional[int], List[str]]] = None
+
+    for line_no, line in enumerate(lines):
+        position = 0
+        if pending is not None:
+            end = line.find(CODE_BLOCK_END)
+            if end < 0:
+                pending[4].append(line)
+                continue
+            pending[4].append(line[:end])
+            name, start_line, column, scope, parts = pending
+            expression = " ".join(part.strip() for part in parts if part and not part.isspace())
+            blocks.append(CodeBlock(name, expression, start_line, column, line_no, True, scope))
+            pending = None
+            position = end + len(CODE_BLOCK_END)
+        else:
+            stripped = line.lstrip()
+            if not stripped:
+                continue
+            if stripped[0] == "#":
+                comments.append(line_no)
+                continue
+
+        for match in _SEGMENT_PATTERN.finditer(line, position):
+            words = line[position:match.start()].split()
+            if words:
+                _attach_words(words, position == 0, line_no, scopes, stray)
+            scope = len(scopes) - 1 if scopes else None
+            if match.group(3):
+                blocks.append(
+                    CodeBlock(match.group(1), match.group(2).strip(), line_no, match.start(), line_no, True, scope)
+                )
+            else:
+                pending = (match.group(1), line_no, match.start(), scope, [match.group(2)])
+            position = match.end()
+        if pending is None and position < len(line):
+            words = line[position:].split()
+            if words:
+                _attach_words(words, position == 0, line_no, scopes, stray)
+
+    if pending is not None:
+        name, start_line, column, scope, parts = pending
+        expression = " ".join(part.strip() for part in parts if part and not part.isspace())
+        blocks.append(CodeBlock(name, expression, start_line, column, max(len(lines) - 1, start_line), False, scope))
+    return ParsedBody(
+        scopes=tuple(ScopeLine(keyword, line, tuple(words)) for keyword, line, words in scopes),
+        blocks=tuple(blocks),
+        comments=tuple(comments),
+        stray=tuple(stray),
+    )
+
+
+def _attach_words(
+    words: List[str],
+    line_start: bool,
+    line_no: int,
+    scopes: List[Tuple[str, int, List[str]]],
+    stray: List[Tuple[int, str]],
+) -> None:
+    if line_start and words[0] in SCOPE_KEYWORDS:
+        scopes.append((words[0], line_no, words[1:]))
+    elif scopes:
+        scopes[-1][2].extend(words)
+    else:
+        stray.append((line_no, " ".join(words)))
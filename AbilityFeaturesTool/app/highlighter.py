@@ -0,0 +1,277 @@
+"""Syntax highlighting for AbilityFeatures text.
+
+:func:`highlight_line` splits one line into styled spans and returns the state
+carried into the next line: ``NORMAL``, or ``IN_CODE`` while a ``[code=...]``
+block continues past the end of the line. Header types come from
+``ability_data.ABILITY_TYPES``, scope keywords from ``SCOPE_REGISTRY`` and block
+names are checked against ``FEATURE_BLOCKS`` and the NCalc tables (see
+``lint.is_known_block``), so the colours agree with the validator.
+
+:class:`AbilityFeaturesHighlighter` is a ``QSyntaxHighlighter`` for the editors:
+Qt re-highlights the edited block and keeps going only while the carried state
+changes. :class:`ViewportHighlighter` serves the document preview, where a full
+pass over a 20 MB document would freeze the window: it formats the blocks that
+scroll into view and nothing else.
+"""
+
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+import re
+
+from PySide6.QtCore import QObject, QPoint, QTimer
+from PySide6.QtGui import (
+    QColor,
+    QFont,
+    QSyntaxHighlighter,
+    QTextBlock,
+    QTextCharFormat,
+    QTextDocument,
+    QTextLayout,
+)
+from PySide6.QtWidgets import QPlainTextEdit
+
+from . import ability_data, ncalc
+from .entry_parser import CODE_BLOCK_END, SCOPE_KEYWORDS
+from .lint import is_known_block
+
+
+NORMAL = 0
+IN_CODE = 1
+
+# (start, length, style) spans of one line.
+Span = Tuple[int, int, str]
+
+
+def _header_pattern() -> "re.Pattern[str]":
+    # ABILITY_TYPES keys spell the header: SA_GLOBAL_LAST -> ">SA GlobalLast+".
+    variants: Dict[str, List[str]] = {}
+    for key in ability_data.ABILITY_TYPES:
+        base, *rest = key.split("_")
+        variants.setdefault(base, [])
+        if rest:
+            variants[base].append("".join(part.capitalize() for part in rest))
+    alternatives = []
+    for base, suffixes in variants.items():
+        suffix = "|".join(sorted(suffixes, key=len, reverse=True))
+        alternatives.append(f"{base}\\b(?:\\s+(?:{suffix})\\+)?" if suffix else f"{base}\\b")
+    return re.compile(rf"(\s*>\s*)({'|'.join(alternatives)})(\s*\d+\b)?(.*)$", re.IGNORECASE)
+
+
+_HEADER = _header_pattern()
+_TITLE = re.compile(r"~~.*?~~")
+_SEGMENT = re.compile(r"\[code=([A-Za-z0-9_]+)\](.*?)(\[/code\]|$)")
+_WORD = re.compile(r"\S+")
+_FORMULA_TOKEN = re.compile(
+    r"(?P<number>\b\d+(?:\.\d+)?\b)|(?P<name>[A-Za-z_][A-Za-z0-9_]*)(?P<call>\s*\()?|(?P<string>'[^']*'?)"
+)
+
+
+@lru_cache(maxsize=4096)
+def _name_style(name: str, call: bool) -> Optional[str]:
+    if call and name in ability_data.NCALC_FUNCTIONS:
+        return "function"
+    if name.startswith(ability_data.NCALC_CONSTANT_PREFIXES):
+        return "constant"
+    if ncalc.identifier_kind(name) is not None or name in ("true", "false"):
+        return "variable"
+    return None
+
+
+def _formula_spans(text: str, start: int, end: int, spans: List[Span]) -> None:
+    for match in _FORMULA_TOKEN.finditer(text, start, end):
+        if match.lastgroup == "number":
+            spans.append((match.start(), match.end() - match.start(), "number"))
+        elif match.lastgroup == "string":
+            spans.append((match.start(), match.end() - match.start(), "string"))
+        else:
+            style = _name_style(match.group("name"), match.group("call") is not None)
+            if style is not None:
+                spans.append((match.start("name"), match.end("name") - match.start("name"), style))
+
+
+def _word_spans(text: str, start: int, end: int, line_start: bool, spans: List[Span]) -> None:
+    for match in _WORD.finditer(text, start, end):
+        word = match.group()
+        if line_start and match.start() == start and word in SCOPE_KEYWORDS:
+            style = "scope"
+        elif word.isidentifier():
+            style = "keyword"
+        else:
+            continue
+        spans.append((match.start(), len(word), style))
+
+
+def highlight_line(text: str, state: int = NORMAL) -> Tuple[List[Span], int]:
+    """Styled spans of one line and the state the next line starts in."""
+    spans: List[Span] = []
+    position = 0
+    stripped = text.lstrip()
+    if stripped.startswith(">"):
+        # A header starts a new entry, closing any block the last one left open.
+        header = _HEADER.match(text)
+        spans.append((0, len(text), "header"))
+        if header is not None:
+            spans.append((header.start(2), header.end(2) - header.start(2), "type"))
+            if header.group(3):
+                spans.append((header.start(3), header.end(3) - header.start(3), "number"))
+            title = _TITLE.search(text, header.start(4))
+            if title is not None:
+                spans.append((title.start(), title.end() - title.start(), "title"))
+        return spans, NORMAL
+    if state == IN_CODE:
+        end = text.find(CODE_BLOCK_END)
+        if end < 0:
+            _formula_spans(text, 0, len(text), spans)
+            return spans, IN_CODE
+        _formula_spans(text, 0, end, spans)
+        spans.append((end, len(CODE_BLOCK_END), "block"))
+        position = end + len(CODE_BLOCK_END)
+    else:
+        if not stripped:
+            return spans, NORMAL
+        if stripped[0] == "#":
+            spans.append((len(text) - len(stripped), len(stripped), "comment"))
+            return spans, NORMAL
+
+    line_start = position == 0
+    for match in _SEGMENT.finditer(text, position):
+        _word_spans(text, position, match.start(), line_start, spans)
+        line_start = False
+        tag_end = match.start(2)
+        spans.append((match.start(), tag_end - match.start(), "block" if is_known_block(match.group(1)) else "unknown_block"))
+        _formula_spans(text, tag_end, match.end(2), spans)
+        if not match.group(3):
+            return spans, IN_CODE
+        spans.append((match.start(3), len(CODE_BLOCK_END), "block"))
+        position = match.end()
+    _word_spans(text, position, len(text), line_start, spans)
+    return spans, NORMAL
+
+
+def _format(color: str, bold: bool = False, italic: bool = False) -> QTextCharFormat:
+    text_format = QTextCharFormat()
+    text_format.setForeground(QColor(color))
+    if bold:
+        text_format.setFontWeight(QFont.Bold)
+    if italic:
+        text_format.setFontItalic(True)
+    return text_format
+
+
+def _styles() -> Dict[str, QTextCharFormat]:
+    return {
+        "header": _format("#1f4e9e", bold=True),
+        "type": _format("#6a1b9a", bold=True),
+        "title": _format("#1f4e9e", bold=True, italic=True),
+        "comment": _format("#808080", italic=True),
+        "scope": _format("#8e24aa", bold=True),
+        "keyword": _format("#00838f"),
+        "block": _format("#2e7d32", bold=True),
+        "unknown_block": _format("#c62828", bold=True),
+        "number": _format("#d84315"),
+        "string": _format("#d84315"),
+        "function": _format("#1565c0"),
+        "constant": _format("#00695c"),
+        "variable": _format("#5d4037"),
+    }
+
+
+class AbilityFeaturesHighlighter(QSyntaxHighlighter):
+    def __init__(self, document: QTextDocument) -> None:
+        super().__init__(document)
+        self._styles = _styles()
+
+    def highlightBlock(self, text: str) -> None:
+        spans, state = highlight_line(text, max(self.previousBlockState(), NORMAL))
+        for start, length, style in spans:
+            self.setFormat(start, length, self._styles[style])
+        self.setCurrentBlockState(state)
+
+
+class ViewportHighlighter(QObject):
+    """Highlights the blocks of a read-only editor as they scroll into view.
+
+    A block's ``userState`` is -1 until it has been formatted and then holds the
+    state carried out of it. Edits reset the blocks they touch and the rest of
+    that entry, since an entry header always starts in ``NORMAL``.
+    """
+
+    # Blocks to walk back looking for the carried state before giving up.
+    MAX_LOOKBACK = 500
+
+    def __init__(self, editor: QPlainTextEdit) -> None:
+        super().__init__(editor)
+        self._editor = editor
+        self._styles = _styles()
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(0)
+        self._timer.timeout.connect(self.highlight_visible)
+        editor.updateRequest.connect(self._timer.start)
+        editor.document().contentsChange.connect(self._on_contents_change)
+
+    def highlight_visible(self) -> None:
+        editor = self._editor
+        viewport = editor.viewport()
+        block = editor.firstVisibleBlock()
+        last = editor.cursorForPosition(QPoint(viewport.width() - 1, viewport.height() - 1)).block().blockNumber()
+        state: Optional[int] = None
+        dirty_start = dirty_end = -1
+        while block.isValid() and block.blockNumber() <= last:
+            if block.userState() >= 0:
+                state = block.userState()
+            else:
+                if state is None:
+                    state = self._state_before(block)
+                spans, state = highlight_line(block.text(), state)
+                self._apply(block, spans)
+                block.setUserState(state)
+                if dirty_start < 0:
+                    dirty_start = block.position()
+                dirty_end = block.position() + block.length()
+            block = block.next()
+        if dirty_start >= 0:
+            editor.document().markContentsDirty(dirty_start, dirty_end - dirty_start)
+
+    def _state_before(self, block: QTextBlock) -> int:
+        pending: List[str] = []
+        previous = block.previous()
+        state = NORMAL
+        while previous.isValid() and len(pending) < self.MAX_LOOKBACK:
+            if previous.userState() >= 0:
+                state = previous.userState()
+                break
+            text = previous.text()
+            pending.append(text)
+            if text.lstrip().startswith(">"):
+                break
+            previous = previous.previous()
+        for text in reversed(pending):
+            state = highlight_line(text, state)[1]
+        return state
+
+    def _apply(self, block: QTextBlock, spans: List[Span]) -> None:
+        ranges = []
+        for start, length, style in spans:
+            format_range = QTextLayout.FormatRange()
+            format_range.start = start
+            format_range.length = length
+            format_range.format = self._styles[style]
+            ranges.append(format_range)
+        block.layout().setFormats(ranges)
+
+    def _on_contents_change(self, position: int, removed: int, added: int) -> None:
+        # Inserted blocks start at -1; reset the edited block and the rest of
+        # its entry, whose carried state may have changed.
+        text_document = self._editor.document()
+        text_document.findBlock(position).setUserState(-1)
+        end = position + added
+        block = text_document.findBlock(end)
+        for _ in range(self.MAX_LOOKBACK):
+            if not block.isValid() or (block.position() > end and block.text().lstrip().startswith(">")):
+                break
+            block.setUserState(-1)
+            block = block.next()
+        self._timer.start()
@@ -0,0 +1,89 @@
+"""Bounded undo/redo for AbilityDocument built on its O(1) snapshots."""
+
+from __future__ import annotations
+
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, List, Optional, Tuple
+
+from .models import AbilityDocument, DocumentSnapshot
+
+
+UNDO_LIMIT = 200
+
+
+@dataclass(frozen=True)
+class HistoryStep:
+    label: str
+    snapshot: DocumentSnapshot
+
+
+class DocumentHistory:
+    """Undo and redo stacks of document snapshots.
+
+    Call ``record`` right before changing the document; the snapshot it takes
+    shares every entry with the document, so a step only costs the chunks the
+    change itself rewrites. The oldest steps are dropped beyond ``limit``.
+    """
+
+    def __init__(self, limit: int = UNDO_LIMIT) -> None:
+        self._undo: Deque[HistoryStep] = deque(maxlen=limit)
+        self._redo: List[HistoryStep] = []
+        # What the latest ``record`` dropped: the redo steps, and the oldest
+        # undo step when the limit was reached. ``discard_last`` puts them back.
+        self._dropped: Optional[Tuple[List[HistoryStep], Optional[HistoryStep]]] = None
+
+    def clear(self) -> None:
+        self._undo.clear()
+        self._redo.clear()
+        self._dropped = None
+
+    def record(self, document: AbilityDocument, label: str) -> None:
+        oldest = self._undo[0] if self._undo and len(self._undo) == self._undo.maxlen else None
+        self._undo.append(HistoryStep(label, document.snapshot()))
+        self._dropped = (self._redo, oldest)
+        self._redo = []
+
+    def discard_last(self, document: AbilityDocument) -> None:
+        """Forget the latest ``record`` if the change it announced never happened.
+
+        The redo steps that ``record`` cleared are restored.
+        """
+        if self._dropped is None or not self._undo or self._undo[-1].snapshot.version != document.version:
+            return
+        self._undo.pop()
+        self._redo, oldest = self._dropped
+        if oldest is not None:
+            self._undo.appendleft(oldest)
+        self._dropped = None
+
+    def can_undo(self) -> bool:
+        return bool(self._undo)
+
+    def can_redo(self) -> bool:
+        return bool(self._redo)
+
+    def undo_label(self) -> Optional[str]:
+        return self._undo[-1].label if self._undo else None
+
+    def redo_label(self) -> Optional[str]:
+        return self._redo[-1].label if self._redo else None
+
+    def undo(self, document: AbilityDocument) -> Optional[str]:
+        """Restore the state before the latest change; returns its label."""
+        if not self._undo:
+            return None
+        step = self._undo.pop()
+        self._dropped = None
+        self._redo.append(HistoryStep(step.label, document.snapshot()))
+        document.restore(step.snapshot)
+        return step.label
+
+    def redo(self, document: AbilityDocument) -> Optional[str]:
+        if not self._redo:
+            return None
+        step = self._redo.pop()
+        self._dropped = None
+        self._undo.append(HistoryStep(step.label, document.snapshot()))
+        document.restore(step.snapshot)
+        return step.label
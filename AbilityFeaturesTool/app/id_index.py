@@ -0,0 +1,217 @@
+"""Which SA/AA ability IDs are taken, across one or more documents.
+
+Every ID space (``SA`` and ``AA``; the GLOBAL variants share their base
+type's space) is a ``bytearray`` holding one byte per ID, 1 when at least
+one entry uses it. ``bytearray.find`` then scans for the next free or used
+ID at C speed, so "next free ID" and "free ranges" cost O(range) and "is it
+used" or "used by which entries" are O(1). IDs above :data:`MAX_ABILITY_ID`
+(typos such as ``>SA 2000000000``) stay out of the bitmaps, so a header
+cannot decide how much memory they take; they are still listed as used.
+
+Documents are tracked rather than rebuilt: :meth:`IdOccupancy.sync` compares
+the entry chunks of each document with those seen on the previous sync and
+only re-reads entries in chunks that changed, as ``AbilityDocument.restore``
+does.
+"""
+
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Sequence, Tuple
+import re
+
+from .models import AbilityDocument, AbilityEntry, parse_header
+from .persistent import PersistentVector
+
+
+IdKey = Tuple[str, int]
+
+ID_SPACES = ("SA", "AA")
+
+# Highest ID kept in the bitmaps; anything above is out of range.
+MAX_ABILITY_ID = 0xFFFF
+
+_HEADER_ID = re.compile(r"(\s*>\s*(?:SA|AA))\b[ \t]*(?:\d+\b)?[ \t]*", re.IGNORECASE)
+
+
+def id_key(entry: AbilityEntry) -> Optional[IdKey]:
+    """``(space, ID)`` claimed by *entry*, e.g. ``("SA", 12)`` for ``>SA 12 Auto-Regen``."""
+    key = parse_header(entry.header)
+    if key is None or key[1] is None:
+        return None
+    return key[0].split("_", 1)[0], key[1]
+
+
+def with_id(header: str, ability_id: int) -> str:
+    """*header* with its ID set to *ability_id* (``>SA 12 Name`` -> ``>SA 40 Name``).
+
+    Only plain ``>SA``/``>AA`` headers are rewritten; others are returned as is.
+    """
+    key = parse_header(header)
+    match = _HEADER_ID.match(header)
+    if key is None or key[0] not in ID_SPACES or match is None:
+        return header
+    rest = header[match.end():]
+    return f"{match.group(1)} {ability_id}" + (f" {rest}" if rest else "")
+
+
+class IdOccupancy:
+    def __init__(self) -> None:
+        self._bitmaps: Dict[str, bytearray] = {space: bytearray() for space in ID_SPACES}
+        # (space, ID) -> {(id(document), id(entry)): entry}
+        self._users: Dict[IdKey, Dict[Tuple[int, int], AbilityEntry]] = {}
+        self._tracked: Dict[int, Tuple[AbilityDocument, Optional[PersistentVector], int]] = {}
+
+    # ------------------------------------------------------------------ tracking
+    def track(self, document: AbilityDocument) -> None:
+        """Include *document*'s entries; call :meth:`sync` after it changes."""
+        if id(document) not in self._tracked:
+            self._tracked[id(document)] = (document, None, -1)
+            self.sync()
+
+    def untrack(self, document: AbilityDocument) -> None:
+        tracked = self._tracked.pop(id(document), None)
+        if tracked is not None and tracked[1] is not None:
+            for entry in tracked[1]:
+                self._discard(id(document), entry)
+
+    def clear(self) -> None:
+        self._tracked.clear()
+        self._users.clear()
+        for space in ID_SPACES:
+            self._bitmaps[space] = bytearray()
+
+    def sync(self) -> None:
+        """Catch up with edits made to tracked documents since the last call."""
+        for document_id, (document, seen, version) in list(self._tracked.items()):
+            if document.version == version:
+                continue
+            current = document.entries.snapshot()
+            if seen is None:
+                for entry in current:
+                    self._add(document_id, entry)
+            else:
+                old_chunks = {id(chunk) for chunk in seen.chunks}
+                new_chunks = {id(chunk) for chunk in current.chunks}
+                leaving = {id(e): e for chunk in seen.chunks if id(chunk) not in new_chunks for e in chunk}
+                arriving = {id(e): e for chunk in current.chunks if id(chunk) not in old_chunks for e in chunk}
+                for entry_id, entry in leaving.items():
+                    if entry_id not in arriving:
+                        self._discard(document_id, entry)
+                for entry_id, entry in arriving.items():
+                    if entry_id not in leaving:
+                        self._add(document_id, entry)
+            self._tracked[document_id] = (document, current, document.version)
+
+    def _add(self, document_id: int, entry: AbilityEntry) -> None:
+        key = id_key(entry)
+        if key is None:
+            return
+        self._users.setdefault(key, {})[(document_id, id(entry))] = entry
+        space, ability_id = key
+        if ability_id > MAX_ABILITY_ID:
+            return
+        bitmap = self._bitmaps.setdefault(space, bytearray())
+        if ability_id >= len(bitmap):
+            bitmap.extend(bytes(ability_id + 1 - len(bitmap)))
+        bitmap[ability_id] = 1
+
+    def _discard(self, document_id: int, entry: AbilityEntry) -> None:
+        key = id_key(entry)
+        if key is None:
+            return
+        users = self._users.get(key)
+        if users is None:
+            return
+        users.pop((document_id, id(entry)), None)
+        if not users:
+            del self._users[key]
+            space, ability_id = key
+            if ability_id <= MAX_ABILITY_ID:
+                self._bitmaps[space][ability_id] = 0
+
+    # ------------------------------------------------------------------ queries
+    def is_used(self, space: str, ability_id: int) -> bool:
+        if ability_id > MAX_ABILITY_ID:
+            return (space, ability_id) in self._users
+        bitmap = self._bitmaps.get(space, b"")
+        return 0 <= ability_id < len(bitmap) and bitmap[ability_id] == 1
+
+    def used_by(self, space: str, ability_id: int) -> List[AbilityEntry]:
+        return list(self._users.get((space, ability_id), {}).values())
+
+    def used_count(self, space: str) -> int:
+        return self._bitmaps.get(space, bytearray()).count(1) + len(self.out_of_range(space))
+
+    def out_of_range(self, space: str) -> List[int]:
+        """IDs above :data:`MAX_ABILITY_ID` that entries claim, in order."""
+        return sorted(
+            ability_id for key_space, ability_id in self._users if key_space == space and ability_id > MAX_ABILITY_ID
+        )
+
+    def next_free(self, space: str, start: int = 0) -> int:
+        """Lowest unused ID at or after *start*; from 0 when *start* is out of range."""
+        bitmap = self._bitmaps.get(space, bytearray())
+        start = max(0, start) if start <= MAX_ABILITY_ID else 0
+        if start >= len(bitmap):
+            return start
+        found = bitmap.find(0, start)
+        return len(bitmap) if found < 0 else found
+
+    def highest_used(self, space: str) -> Optional[int]:
+        found = self._bitmaps.get(space, bytearray()).rfind(1)
+        return None if found < 0 else found
+
+    def free_ranges(self, space: str, start: int = 0, stop: Optional[int] = None) -> List[Tuple[int, int]]:
+        """Half-open ``(first, end)`` runs of unused IDs within ``[start, stop)``.
+
+        *stop* defaults to one past the highest ID in use, i.e. only the gaps.
+        """
+        bitmap = self._bitmaps.get(space, bytearray())
+        if stop is None:
+            highest = self.highest_used(space)
+            stop = 0 if highest is None else highest + 1
+        known = min(stop, len(bitmap))
+        ranges: List[Tuple[int, int]] = []
+        position = max(0, start)
+        while position < known:
+            free = bitmap.find(0, position, known)
+            if free < 0:
+                break
+            used = bitmap.find(1, free, known)
+            end = known if used < 0 else used
+            ranges.append((free, end))
+            position = end
+        tail = max(len(bitmap), start)
+        if stop > tail:
+            if ranges and ranges[-1][1] == tail:
+                ranges[-1] = (ranges[-1][0], stop)
+            else:
+                ranges.append((tail, stop))
+        return ranges
+
+    def describe_free(self, space: str, limit: int = 6) -> str:
+        """Free IDs as ``"3, 7-9, 40+"``: the gaps, then everything past the highest used ID."""
+        parts: List[str] = []
+        for first, end in self.free_ranges(space):
+            if len(parts) == limit:
+                parts.append("…")
+                break
+            parts.append(str(first) if end - first == 1 else f"{first}-{end - 1}")
+        highest = self.highest_used(space)
+        parts.append(f"{0 if highest is None else highest + 1}+")
+        return ", ".join(parts)
+
+    def collisions(self, entries: Sequence[AbilityEntry]) -> List[IdKey]:
+        """IDs claimed by *entries* that are already taken or repeated among them."""
+        seen: Dict[IdKey, int] = {}
+        clashes: List[IdKey] = []
+        for entry in entries:
+            key = id_key(entry)
+            if key is None:
+                continue
+            count = seen[key] = seen.get(key, 0) + 1
+            used = self.is_used(*key)
+            if (count == 1 and used) or (count == 2 and not used):
+                clashes.append(key)
+        return clashes
+
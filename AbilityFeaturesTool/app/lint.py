@@ -0,0 +1,195 @@
+"""Structural checks for AbilityFeatures entries on top of the formula checks.
+
+``lint_entry`` reports unrecognised entry types, scopes that the entry's type
+does not support (per ``ability_data.SCOPE_REGISTRY``), ``[code=...]`` blocks
+that are neither in ``ability_data.FEATURE_BLOCKS`` nor a known property,
+unbalanced ``[/code]`` tags, and everything :func:`ncalc.validate_entry`
+finds. ``lint_document`` adds document-wide checks such as duplicate headers,
+and :class:`IncrementalLinter` repeats them over successive versions of a
+document, re-checking only the entries that changed. Diagnostics use
+:class:`ncalc.Diagnostic`, so the report dialog and the command line print
+them the same way.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+import time
+
+from . import ability_data, ncalc
+from .entry_parser import CODE_BLOCK_END
+from .models import AbilityDocument, AbilityEntry, gc_paused, parse_header
+
+
+@lru_cache(maxsize=None)
+def _valid_scopes(type_key: str) -> FrozenSet[str]:
+    return frozenset(scope.key for scope in ability_data.SCOPE_REGISTRY.get(type_key, ()))
+
+
+@lru_cache(maxsize=1024)
+def is_known_block(name: str) -> bool:
+    return name in ability_data.FEATURE_BLOCKS or ncalc.identifier_kind(name) is not None
+
+
+def lint_entry(entry: AbilityEntry, entry_index: int = 0) -> List[ncalc.Diagnostic]:
+    diagnostics: List[ncalc.Diagnostic] = []
+    header = entry.header
+    key = parse_header(header)
+    parsed = entry.parsed()
+    if key is None:
+        diagnostics.append(
+            ncalc.Diagnostic(ncalc.ERROR, "Unrecognised entry type (expected >SA or >AA)", entry_index, header, 1, 1, "")
+        )
+    else:
+        valid = _valid_scopes(key[0])
+        for scope in parsed.scopes:
+            if scope.keyword not in valid:
+                diagnostics.append(
+                    ncalc.Diagnostic(
+                        ncalc.WARNING,
+                        f"Scope {scope.keyword} is not available for {key[0]} entries",
+                        entry_index, header, scope.line + 2, 1, "",
+                    )
+                )
+    closes_expected: Dict[int, int] = {}
+    for block in parsed.blocks:
+        if not is_known_block(block.name):
+            diagnostics.append(
+                ncalc.Diagnostic(
+                    ncalc.WARNING, f"Unknown block [code={block.name}]", entry_index, header,
+                    block.line + 2, block.column + 1, block.name,
+                )
+            )
+        if block.closed:
+            closes_expected[block.end_line] = closes_expected.get(block.end_line, 0) + 1
+    for line_no, line in enumerate(entry.body_lines):
+        if CODE_BLOCK_END not in line:
+            continue
+        expected = closes_expected.get(line_no, 0)
+        if not expected and line.lstrip().startswith("#"):
+            continue
+        if line.count(CODE_BLOCK_END) > expected:
+            diagnostics.append(
+                ncalc.Diagnostic(
+                    ncalc.ERROR, f"{CODE_BLOCK_END} without a matching [code=...]", entry_index, header,
+                    line_no + 2, line.rfind(CODE_BLOCK_END) + 1, "",
+                )
+            )
+    diagnostics.extend(ncalc.validate_entry(entry, entry_index))
+    return diagnostics
+
+
+def lint_entries(entries: Iterable[Tuple[int, AbilityEntry]]) -> List[ncalc.Diagnostic]:
+    diagnostics: List[ncalc.Diagnostic] = []
+    for index, entry in entries:
+        diagnostics.extend(lint_entry(entry, index))
+    return diagnostics
+
+
+def duplicate_headers(document: AbilityDocument) -> List[ncalc.Diagnostic]:
+    first_seen: Dict[str, int] = {}
+    diagnostics: List[ncalc.Diagnostic] = []
+    for index, entry in enumerate(document.entries):
+        first = first_seen.setdefault(entry.header.strip(), index)
+        if first != index:
+            diagnostics.append(_duplicate_header(entry, index, first))
+    return diagnostics
+
+
+def lint_document(document: AbilityDocument) -> List[ncalc.Diagnostic]:
+    """All entry checks plus duplicate headers, ordered by entry."""
+    diagnostics = lint_entries(enumerate(document.entries)) + duplicate_headers(document)
+    diagnostics.sort(key=_diagnostic_order)
+    return diagnostics
+
+
+@dataclass
+class LintPass:
+    diagnostics: List[ncalc.Diagnostic]
+    # Entries linted in this pass; the others reused earlier results.
+    checked: int
+    total: int
+    elapsed: float
+
+
+class IncrementalLinter:
+    """``lint_document`` for successive versions of one document.
+
+    Entries are immutable, so an entry's diagnostics stay valid while it is in
+    the document and only their ``entry_index`` changes when it moves. Results
+    are kept per ``id(entry)`` together with the entry, which stops the id from
+    being reused while the result is cached. Use one run at a time; any thread
+    will do, given a snapshot such as ``document.entries.snapshot()``.
+    """
+
+    def __init__(self) -> None:
+        self._results: Dict[int, Tuple[AbilityEntry, int, Tuple[ncalc.Diagnostic, ...]]] = {}
+
+    def clear(self) -> None:
+        self._results = {}
+
+    def run(
+        self,
+        entries: Sequence[AbilityEntry],
+        on_batch: Optional[Callable[[List[ncalc.Diagnostic]], None]] = None,
+        batch_size: int = 2000,
+    ) -> LintPass:
+        """Lint *entries*, passing the findings to *on_batch* every *batch_size* entries."""
+        with gc_paused():
+            return self._run(entries, on_batch, batch_size)
+
+    def _run(
+        self,
+        entries: Sequence[AbilityEntry],
+        on_batch: Optional[Callable[[List[ncalc.Diagnostic]], None]],
+        batch_size: int,
+    ) -> LintPass:
+        started = time.perf_counter()
+        previous = self._results
+        results: Dict[int, Tuple[AbilityEntry, int, Tuple[ncalc.Diagnostic, ...]]] = {}
+        first_seen: Dict[str, int] = {}
+        diagnostics: List[ncalc.Diagnostic] = []
+        streamed = 0
+        checked = 0
+        for index, entry in enumerate(entries):
+            cached = previous.get(id(entry))
+            if cached is None:
+                found = tuple(lint_entry(entry, index))
+                checked += 1
+            elif cached[1] != index:
+                found = tuple(_moved(diagnostic, index) for diagnostic in cached[2])
+            else:
+                found = cached[2]
+            results[id(entry)] = (entry, index, found)
+            diagnostics.extend(found)
+            first = first_seen.setdefault(entry.header.strip(), index)
+            if first != index:
+                diagnostics.append(_duplicate_header(entry, index, first))
+            if on_batch is not None and (index + 1) % batch_size == 0:
+                on_batch(diagnostics[streamed:])
+                streamed = len(diagnostics)
+        if on_batch is not None and streamed < len(diagnostics):
+            on_batch(diagnostics[streamed:])
+        self._results = results
+        diagnostics.sort(key=_diagnostic_order)
+        return LintPass(diagnostics, checked, len(entries), time.perf_counter() - started)
+
+
+def _duplicate_header(entry: AbilityEntry, index: int, first: int) -> ncalc.Diagnostic:
+    return ncalc.Diagnostic(
+        ncalc.WARNING, f"Duplicate header (first used by entry #{first + 1})", index, entry.header, 1, 1, ""
+    )
+
+
+def _moved(diagnostic: ncalc.Diagnostic, index: int) -> ncalc.Diagnostic:
+    # Cheaper than dataclasses.replace, which matters when every entry moved.
+    return ncalc.Diagnostic(
+        diagnostic.severity, diagnostic.message, index, diagnostic.header,
+        diagnostic.line, diagnostic.column, diagnostic.block,
+    )
+
+
+def _diagnostic_order(diagnostic: ncalc.Diagnostic) -> Tuple[int, int, int]:
+    return diagnostic.entry_index, diagnostic.line, diagnostic.column
@@ -2,28 +2,34 @@ from __future__ import annotations
 
 import json
 import re
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterator, List, Optional, Set, Tuple
 from uuid import uuid4
 
 from functools import partial
 
-from PySide6.QtCore import Qt, QModelIndex, QUrl
+from PySide6.QtCore import Qt, QFileSystemWatcher, QItemSelection, QModelIndex, QTimer, QUrl, Signal
 from PySide6.QtGui import (
     QAction,
     QCursor,
+    QFontDatabase,
+    QTextBlock,
     QTextCursor,
     QDesktopServices,
-    QTextDocument,
     QTextOption,
     QKeySequence,
     QShortcut,
 )
 from PySide6.QtWidgets import (
+    QAbstractItemView,
+    QApplication,
     QFileDialog,
     QGroupBox,
     QHBoxLayout,
     QLabel,
+    QListView,
     QListWidget,
     QListWidgetItem,
     QMainWindow,
@@ -44,10 +50,25 @@ from PySide6.QtWidgets import (
     QToolButton,
     QInputDialog,
     QFormLayout,
+    QCompleter,
+    QDockWidget,
 )
 
-from . import ability_data
-from .models import AbilityDocument, AbilityEntry
+from . import ability_data, batch, disk_sync, document_diff, merge, ncalc, overlay, references, storage
+from .diagnostics_panel import DiagnosticsPanel
+from .entry_model import EntryFilterProxyModel, EntryListModel
+from .entry_parser import parse_body
+from .highlighter import AbilityFeaturesHighlighter
+from .history import DocumentHistory
+from .id_index import MAX_ABILITY_ID, IdOccupancy, with_id
+from .models import AbilityDocument, AbilityEntry, detect_entry_type, parse_header
+from .preview import DocumentPreviewEdit
+from .text_search import FindError, FindQuery
+
+
+ENTRY_FILTER_DELAY_MS = 150
+# Editors often write a file in several steps; changes are read once it settles.
+DISK_CHANGE_DELAY_MS = 300
 
 
 class MainWindow(QMainWindow):
@@ -60,8 +81,12 @@ class MainWindow(QMainWindow):
 
         self._document: Optional[AbilityDocument] = None
         self._document_path: Optional[Path] = None
+        self._history = DocumentHistory()
+        self._ids = IdOccupancy()
+        self._saved_version = 0
         self._preview_window: Optional[QMainWindow] = None
-        self._preview_editor: Optional[QPlainTextEdit] = None
+        self._preview_editor: Optional[DocumentPreviewEdit] = None
+        self._overlay_dialog: Optional[OverlayDialog] = None
         self.require_confirmations = True
         self._selected_template_item: Optional[QListWidgetItem] = None
         self._template_selection_recent = False
@@ -71,10 +96,37 @@ class MainWindow(QMainWindow):
         self._preview_find_bar: Optional[QWidget] = None
         self._preview_find_input: Optional[QLineEdit] = None
         self._preview_find_status: Optional[QLabel] = None
+        self._preview_find_regex: Optional[QCheckBox] = None
+        self._preview_find_word: Optional[QCheckBox] = None
+        self._preview_find_case: Optional[QCheckBox] = None
+        self._pending_preview_find: Optional[Tuple[bool, bool]] = None
         self._preview_shortcuts: List[QShortcut] = []
         self._templates_dir = Path(__file__).resolve().parent / "templates"
         self._templates_dir.mkdir(parents=True, exist_ok=True)
         self._template_set_paths: Dict[str, Path] = {}
+        self._loader: Optional[Iterator[AbilityEntry]] = None
+        self._load_progress: Tuple[int, int] = (0, 0)
+        self._loading_reload = False
+        self._previous_document: Tuple[Optional[AbilityDocument], Optional[Path]] = (None, None)
+        self._load_timer = QTimer(self)
+        self._load_timer.setInterval(0)
+        self._load_timer.timeout.connect(self._pump_loader)
+        # The open file as last loaded or saved, for merging in outside changes.
+        self._disk_state: Optional[disk_sync.DiskState] = None
+        self._disk_executor: Optional[ThreadPoolExecutor] = None
+        self._disk_future: Optional[Future] = None
+        self._disk_recheck = False
+        # Set while a merge waits on the conflict prompt's event loop.
+        self._disk_merging = False
+        self._disk_watcher = QFileSystemWatcher(self)
+        self._disk_watcher.fileChanged.connect(self._on_disk_file_changed)
+        self._disk_timer = QTimer(self)
+        self._disk_timer.setSingleShot(True)
+        self._disk_timer.setInterval(DISK_CHANGE_DELAY_MS)
+        self._disk_timer.timeout.connect(self._check_disk)
+        self._disk_poll_timer = QTimer(self)
+        self._disk_poll_timer.setInterval(50)
+        self._disk_poll_timer.timeout.connect(self._poll_disk)
 
         self._load_default_templates()
         self._load_saved_template_sets()
@@ -90,10 +142,27 @@ class MainWindow(QMainWindow):
 
         # Left panel: current document entries
         self.entry_filter = QLineEdit()
-        self.entry_filter.setPlaceholderText("Filter entries…")
+        self.entry_filter.setPlaceholderText("Filter entries… (type:SA id:12 scope:Ability block:Patch)")
+        self.entry_filter.setToolTip(
+            "Words must all appear in the entry. Narrow with type:, id: (or id:10-20),\n"
+            "scope: and block: terms; quote phrases such as \"MP Cost\"."
+        )
         self.entry_filter.textChanged.connect(self._on_entry_filter_changed)
-        self.entry_list = QListWidget()
-        self.entry_list.currentItemChanged.connect(self._on_entry_selected)
+        self._entry_filter_timer = QTimer(self)
+        self._entry_filter_timer.setSingleShot(True)
+        self._entry_filter_timer.setInterval(ENTRY_FILTER_DELAY_MS)
+        self._entry_filter_timer.timeout.connect(self._apply_entry_filter)
+        self.entry_model = EntryListModel(self)
+        self.entry_proxy = EntryFilterProxyModel(self)
+        self.entry_proxy.setSourceModel(self.entry_model)
+        self.entry_proxy.filtering_finished.connect(self._on_entry_filter_finished)
+        self.entry_list = EntryListView()
+        self.entry_list.setUniformItemSizes(True)
+        self.entry_list.setEditTriggers(QListView.NoEditTriggers)
+        self.entry_list.setModel(self.entry_proxy)
+        self.entry_list.selectionModel().currentChanged.connect(self._on_entry_selected)
+        self.entry_list.selectionModel().selectionChanged.connect(self._update_entry_actions)
+        self.entry_list.rows_dropped.connect(self._on_entries_dropped)
         self.entry_list.setContextMenuPolicy(Qt.CustomContextMenu)
         self.entry_list.customContextMenuRequested.connect(self._show_entry_context_menu)
         left_panel = QWidget()
@@ -190,20 +259,44 @@ class MainWindow(QMainWindow):
         self.template_preview = QPlainTextEdit()
         self.template_preview.setReadOnly(True)
         self.template_preview.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        self._template_highlighter = AbilityFeaturesHighlighter(self.template_preview.document())
         preview_box.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
         preview_layout.addWidget(self.template_preview)
 
+        template_actions = QHBoxLayout()
         apply_btn = QPushButton("Insert template into editor")
         apply_btn.clicked.connect(self._insert_template)
-        preview_layout.addWidget(apply_btn)
+        template_actions.addWidget(apply_btn, 1)
+        generate_btn = QPushButton("Generate from CSV…")
+        generate_btn.setToolTip(
+            "Create one entry per row of a CSV sheet whose header names the template's placeholders."
+        )
+        generate_btn.clicked.connect(self._generate_from_csv)
+        template_actions.addWidget(generate_btn)
+        preview_layout.addLayout(template_actions)
 
         editor_box = QGroupBox("Entry editor")
         editor_layout = QVBoxLayout(editor_box)
         self.entry_editor = QPlainTextEdit()
         self.entry_editor.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        self._editor_highlighter = AbilityFeaturesHighlighter(self.entry_editor.document())
         editor_box.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
         editor_layout.addWidget(self.entry_editor)
 
+        id_row = QHBoxLayout()
+        self.id_status_label = QLabel()
+        self.id_status_label.setWordWrap(True)
+        self.id_status_label.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        id_row.addWidget(self.id_status_label, 1)
+        self.next_id_btn = QPushButton("Use next free ID")
+        self.next_id_btn.setToolTip("Change the header to the first unused ID at or after its current one.")
+        self.next_id_btn.setEnabled(False)
+        self.next_id_btn.clicked.connect(self._use_next_free_id)
+        id_row.addWidget(self.next_id_btn)
+        editor_layout.addLayout(id_row)
+        self.entry_editor.textChanged.connect(self._update_id_status)
+        self.entry_editor.textChanged.connect(self._on_editor_text_changed)
+
         button_row = QHBoxLayout()
         self.save_entry_btn = QPushButton("Replace selected entry")
         self.save_entry_btn.clicked.connect(self._replace_entry)
@@ -217,6 +310,11 @@ class MainWindow(QMainWindow):
         self.validate_entry_btn.clicked.connect(self._validate_entry)
         button_row.addWidget(self.validate_entry_btn)
 
+        self.sweep_formula_btn = QPushButton("Sweep formula…")
+        self.sweep_formula_btn.setToolTip("Evaluate a [code=...] formula over ranges of input stats.")
+        self.sweep_formula_btn.clicked.connect(self._sweep_formula)
+        button_row.addWidget(self.sweep_formula_btn)
+
         self.save_template_btn = QPushButton("Save as template…")
         self.save_template_btn.clicked.connect(self._save_entry_as_template)
         button_row.addWidget(self.save_template_btn)
@@ -251,6 +349,18 @@ class MainWindow(QMainWindow):
         splitter.setStretchFactor(1, 1)
 
         self.setCentralWidget(splitter)
+
+        self.diagnostics_panel = DiagnosticsPanel()
+        self.diagnostics_panel.entry_activated.connect(self._reveal_entry)
+        self.diagnostics_panel.editor_line_activated.connect(self._go_to_editor_line)
+        diagnostics_dock = QDockWidget("Diagnostics", self)
+        diagnostics_dock.setObjectName("diagnosticsDock")
+        diagnostics_dock.setWidget(self.diagnostics_panel)
+        self.addDockWidget(Qt.BottomDockWidgetArea, diagnostics_dock)
+        toggle_diagnostics = diagnostics_dock.toggleViewAction()
+        toggle_diagnostics.setText("Diagnostics panel")
+        self.tools_menu.insertAction(self.merge_action, toggle_diagnostics)
+
         self.statusBar().showMessage("Pick an ability type to begin.")
 
         self._refresh_template_set_box()
@@ -341,16 +451,16 @@ class MainWindow(QMainWindow):
         if hasattr(self, "delete_template_btn"):
             self.delete_template_btn.setEnabled(has_selection)
 
-    def _update_entry_actions(self) -> None:
-        row = self.entry_list.currentRow()
-        has_selection = row >= 0
-        max_index = self.entry_list.count() - 1
+    def _update_entry_actions(self, *args: object) -> None:
+        rows = self._selected_entry_indexes()
+        total = len(self._document.entries) if self._document else 0
         if hasattr(self, "move_up_btn"):
-            self.move_up_btn.setEnabled(has_selection and row > 0)
+            # Disabled once the selection is packed against the top (or bottom).
+            self.move_up_btn.setEnabled(bool(rows) and rows[-1] != len(rows) - 1)
         if hasattr(self, "move_down_btn"):
-            self.move_down_btn.setEnabled(has_selection and row < max_index and max_index >= 0)
+            self.move_down_btn.setEnabled(bool(rows) and rows[0] != total - len(rows))
         if hasattr(self, "duplicate_entry_btn"):
-            self.duplicate_entry_btn.setEnabled(has_selection)
+            self.duplicate_entry_btn.setEnabled(bool(rows))
 
     def _entry_text_for_editing(self, entry: AbilityEntry) -> str:
         lines = [entry.header]
@@ -379,15 +489,64 @@ class MainWindow(QMainWindow):
             return None
         return entry, type_key
 
+    def _on_editor_text_changed(self) -> None:
+        self.diagnostics_panel.editor_text_changed(self.entry_editor.toPlainText())
+
+    def _go_to_editor_line(self, line: int) -> None:
+        block = self.entry_editor.document().findBlockByNumber(max(0, line - 1))
+        if not block.isValid():
+            return
+        cursor = self.entry_editor.textCursor()
+        cursor.setPosition(block.position())
+        self.entry_editor.setTextCursor(cursor)
+        self.entry_editor.setFocus(Qt.OtherFocusReason)
+
     def _validate_entry(self) -> None:
         result = self._parse_entry_text(self.entry_editor.toPlainText(), require_type=True)
         if not result:
             return
-        _, type_key = result
+        entry, type_key = result
         type_label = ability_data.ABILITY_TYPES.get(type_key or "", {}).get("label", type_key or "unknown")
+        diagnostics = ncalc.validate_entry(entry)
+        if diagnostics:
+            counts = ncalc.summarize(diagnostics)
+            details = "\n".join(
+                f"Line {d.line}, column {d.column} [{d.block}] {d.severity}: {d.message}" for d in diagnostics
+            )
+            title = "Formula errors" if counts[ncalc.ERROR] else "Formula warnings"
+            QMessageBox.warning(self, title, f"Detected ability type: {type_label}.\n\n{details}")
+            self.statusBar().showMessage(
+                f"Entry has {counts[ncalc.ERROR]} formula errors and {counts[ncalc.WARNING]} warnings.", 5000
+            )
+            return
         QMessageBox.information(self, "Entry valid", f"Detected ability type: {type_label}.")
         self.statusBar().showMessage("Entry validation succeeded.", 5000)
 
+    def _sweep_formula(self) -> None:
+        try:
+            from .sweep_dialog import FormulaSweepDialog
+        except ImportError:
+            QMessageBox.warning(self, "NumPy required", "Formula sweeps need NumPy. Install it with: pip install numpy")
+            return
+        raw = self.entry_editor.toPlainText()
+        result = self._parse_entry_text(raw)
+        if not result:
+            return
+        entry, _type_key = result
+        blocks = entry.parsed().blocks
+        if not blocks:
+            QMessageBox.information(self, "No formulas", "The entry has no [code=...] blocks to sweep.")
+            return
+        # Body line under the cursor; _parse_entry_text strips leading blank lines and the header is line 0.
+        leading = raw[: len(raw) - len(raw.lstrip())].count("\n")
+        cursor_line = self.entry_editor.textCursor().blockNumber() - leading - 1
+        current = next(
+            (idx for idx, block in enumerate(blocks) if block.line <= cursor_line <= block.end_line),
+            0,
+        )
+        dialog = FormulaSweepDialog([(block.name, block.expression) for block in blocks], current, self)
+        dialog.exec()
+
     def _save_template_set(
         self,
         name: str,
@@ -583,22 +742,153 @@ class MainWindow(QMainWindow):
         )
         if not path:
             return
-        file_path = Path(path)
-        try:
-            document = AbilityDocument.load(file_path)
-        except Exception as exc:  # pragma: no cover - GUI path
-            QMessageBox.critical(self, "Failed to load", f"{exc}")
-            return
+        self._start_loading(Path(path))
+
+    def _start_loading(self, file_path: Path, *, reload: bool = False) -> None:
+        self._cancel_loading()
+        self._previous_document = (self._document, self._document_path)
+        document = AbilityDocument()
+        self._loader = document.iter_load(file_path, progress=self._on_load_progress)
+        self._load_progress = (0, 0)
+        self._loading_reload = reload
         self._document = document
         self._document_path = file_path
+        self._watch_file(None)
+        self._history.clear()
+        self._ids.clear()
+        self._ids.track(document)
+        self._update_history_actions()
         self.entry_filter.blockSignals(True)
         self.entry_filter.clear()
         self.entry_filter.blockSignals(False)
+        self._entry_filter_timer.stop()
+        self.entry_proxy.set_filter_text("")
+        document.search_index()
+        self.entry_model.set_document(document)
         self._update_entry_list()
         self._mark_dirty(False)
         self._update_file_actions()
+        self.statusBar().showMessage(f"Loading {file_path}…")
+        self._load_timer.start()
+
+    def _cancel_loading(self) -> None:
+        self._load_timer.stop()
+        if self._loader is not None:
+            self._loader.close()
+            self._loader = None
+
+    def _on_load_progress(self, done: int, total: int) -> None:
+        self._load_progress = (done, total)
+
+    def _pump_loader(self) -> None:
+        """Read a time-boxed batch of streamed entries and expose them to the list view."""
+        loader = self._loader
+        if loader is None or self._document is None:
+            self._load_timer.stop()
+            return
+        deadline = time.perf_counter() + 0.03
+        try:
+            for _entry in loader:
+                if time.perf_counter() >= deadline:
+                    break
+            else:
+                self._finish_loading()
+                return
+        except Exception as exc:  # pragma: no cover - GUI path
+            self._cancel_loading()
+            self._document, self._document_path = self._previous_document
+            self._watch_file(None)
+            self._ids.clear()
+            if self._document is not None:
+                self._ids.track(self._document)
+            self.entry_model.set_document(self._document)
+            self._update_entry_list()
+            self._saved_version = self._document.version if self._document else 0
+            self._mark_dirty(False)
+            self._update_file_actions()
+            self._update_window_title()
+            title = "Failed to reload" if self._loading_reload else "Failed to load"
+            QMessageBox.critical(self, title, f"{exc}")
+            return
+        self.entry_model.sync_rows()
+        if not self.entry_list.currentIndex().isValid() and self.entry_proxy.rowCount():
+            self.entry_list.setCurrentIndex(self.entry_proxy.index(0, 0))
+        done, total = self._load_progress
+        percent = int(done * 100 / total) if total else 0
+        self.statusBar().showMessage(
+            f"Loading {self._document_path}… {len(self._document.entries)} entries ({percent}%)"
+        )
+
+    def _finish_loading(self) -> None:
+        self._cancel_loading()
+        self._previous_document = (None, None)
+        document = self._document
+        if document is None:
+            return
+        self.entry_model.sync_rows()
+        self._saved_version = document.version
+        self._watch_file(disk_sync.DiskState.loaded(document))
+        self._update_entry_list()
         self._refresh_preview()
-        self.statusBar().showMessage(f"Loaded {len(document.entries)} entries from {path}")
+        self.diagnostics_panel.document_changed(document)
+        if self._loading_reload:
+            self.statusBar().showMessage(f"Reloaded {self._document_path}")
+        else:
+            self.statusBar().showMessage(
+                f"Loaded {len(document.entries)} entries from {self._document_path}"
+            )
+
+    def _current_entry(self) -> Optional[AbilityEntry]:
+        return self.entry_proxy.entry_for(self.entry_list.currentIndex())
+
+    def _current_entry_index(self) -> Optional[int]:
+        """Document index of the selected entry (not its row in the filtered view)."""
+        entry = self._current_entry()
+        if entry is None or self._document is None:
+            return None
+        return self._document.index_of(entry)
+
+    def _selected_entry_indexes(self) -> List[int]:
+        """Sorted document indexes of every selected entry."""
+        if not hasattr(self, "entry_list") or self._document is None:
+            return []
+        selection = self.entry_proxy.mapSelectionToSource(self.entry_list.selectionModel().selection())
+        rows: Set[int] = set()
+        for selection_range in selection:
+            rows.update(range(selection_range.top(), selection_range.bottom() + 1))
+        return sorted(rows)
+
+    def _select_entries(self, entries: List[AbilityEntry]) -> None:
+        """Select *entries* (those visible through the filter), making the first one current."""
+        selection = QItemSelection()
+        first: Optional[QModelIndex] = None
+        for entry in entries:
+            row = self.entry_model.row_of(entry)
+            if row is None:
+                continue
+            index = self.entry_proxy.mapFromSource(self.entry_model.index(row, 0))
+            if not index.isValid():
+                continue
+            selection.select(index, index)
+            if first is None:
+                first = index
+        if first is None:
+            return
+        selection_model = self.entry_list.selectionModel()
+        selection_model.setCurrentIndex(first, selection_model.SelectionFlag.NoUpdate)
+        selection_model.select(selection, selection_model.SelectionFlag.ClearAndSelect)
+        self.entry_list.scrollTo(first)
+
+    def _select_entry(self, entry: AbilityEntry) -> bool:
+        row = self.entry_model.row_of(entry)
+        if row is None:
+            return False
+        index = self.entry_proxy.mapFromSource(self.entry_model.index(row, 0))
+        if not index.isValid():
+            return False
+        self.entry_list.setCurrentIndex(index)
+        self.entry_list.scrollTo(index)
+        return True
 
     def _update_entry_list(
         self,
@@ -606,50 +896,18 @@ class MainWindow(QMainWindow):
         select_entry: Optional[AbilityEntry] = None,
         select_row: Optional[int] = None,
     ) -> None:
-        self.entry_list.blockSignals(True)
-        target_entry = select_entry
-        target_header: Optional[str] = None
-        if target_entry is None and select_row is None:
-            current_item = self.entry_list.currentItem()
-            if current_item:
-                current_entry: Optional[AbilityEntry] = current_item.data(Qt.UserRole)
-                if current_entry:
-                    target_entry = current_entry
-                    target_header = current_entry.header
-                else:
-                    target_header = current_item.text()
-        elif target_entry is not None:
-            target_header = target_entry.header
-
-        self.entry_list.clear()
-        chosen_row: Optional[int] = None
-        if not self._document:
-            self.entry_list.blockSignals(False)
-            self._update_entry_actions()
-            return
-
-        filter_text = self.entry_filter.text().lower()
-        for entry in self._document.entries:
-            haystack = " ".join([entry.header, *entry.body_lines]).lower()
-            if filter_text and filter_text not in haystack:
-                continue
-            item = QListWidgetItem(entry.header)
-            item.setData(Qt.UserRole, entry)
-            self.entry_list.addItem(item)
-            if target_entry is entry:
-                chosen_row = self.entry_list.count() - 1
-            elif chosen_row is None and target_entry is None and target_header and entry.header == target_header:
-                chosen_row = self.entry_list.count() - 1
-
-        self.entry_list.blockSignals(False)
-
-        if select_row is not None and 0 <= select_row < self.entry_list.count():
-            self.entry_list.setCurrentRow(select_row)
-        elif chosen_row is not None and 0 <= chosen_row < self.entry_list.count():
-            self.entry_list.setCurrentRow(chosen_row)
-        elif self.entry_list.count():
-            self.entry_list.setCurrentRow(0)
+        """Settle the list selection after the model changed.
 
+        ``select_row`` is a row of the (filtered) view. Without a target the
+        current selection is kept, falling back to the first visible row.
+        """
+        visible = self.entry_proxy.rowCount()
+        if select_entry is not None and self._select_entry(select_entry):
+            pass
+        elif select_row is not None and 0 <= select_row < visible:
+            self.entry_list.setCurrentIndex(self.entry_proxy.index(select_row, 0))
+        elif not self.entry_list.currentIndex().isValid() and visible:
+            self.entry_list.setCurrentIndex(self.entry_proxy.index(0, 0))
         self._update_entry_actions()
 
     # ---------------------------------------------------------------- Menu actions
@@ -682,11 +940,47 @@ class MainWindow(QMainWindow):
         file_menu.addAction(exit_action)
 
         edit_menu = self.menuBar().addMenu("Edit")
+        self.undo_action = QAction("Undo", self)
+        self.undo_action.setShortcut(QKeySequence.Undo)
+        self.undo_action.triggered.connect(self._undo)
+        edit_menu.addAction(self.undo_action)
+        self.redo_action = QAction("Redo", self)
+        self.redo_action.setShortcut(QKeySequence.Redo)
+        self.redo_action.triggered.connect(self._redo)
+        edit_menu.addAction(self.redo_action)
+        self._update_history_actions()
+        edit_menu.addSeparator()
+        goto_action = QAction("Go to entry…", self)
+        goto_action.setShortcut(QKeySequence("Ctrl+P"))
+        goto_action.triggered.connect(self._show_entry_palette)
+        edit_menu.addAction(goto_action)
+        usages_action = QAction("Find usages…", self)
+        usages_action.setShortcut(QKeySequence("Ctrl+Shift+U"))
+        usages_action.setToolTip("List the entries that mention an ID, status, scope or keyword.")
+        usages_action.triggered.connect(self._show_usages)
+        edit_menu.addAction(usages_action)
+        sort_action = QAction("Sort entries by ID", self)
+        sort_action.setToolTip("Sorts the selected entries, or every entry when at most one is selected.")
+        sort_action.triggered.connect(self._sort_entries_by_id)
+        edit_menu.addAction(sort_action)
+        edit_menu.addSeparator()
+
         preferences_action = QAction("Preferences…", self)
         preferences_action.triggered.connect(self._open_preferences)
         edit_menu.addAction(preferences_action)
 
         self.tools_menu = self.menuBar().addMenu("Tools")
+        validate_action = QAction("Validate formulas…", self)
+        validate_action.triggered.connect(self._validate_formulas)
+        self.tools_menu.addAction(validate_action)
+        self.merge_action = QAction("Merge mod files…", self)
+        self.merge_action.triggered.connect(self._merge_mod_files)
+        self.tools_menu.addAction(self.merge_action)
+        overlay_action = QAction("Effective features across mods…", self)
+        overlay_action.triggered.connect(self._show_overlay)
+        self.tools_menu.addAction(overlay_action)
+        self.tools_menu.addSeparator()
+
         templates_menu = self.tools_menu.addMenu("Templates")
 
         import_templates_action = QAction("Import template file…", self)
@@ -745,6 +1039,10 @@ class MainWindow(QMainWindow):
         if not self._document_path:
             QMessageBox.information(self, "No file", "Open a document before reloading.")
             return
+        if not self._dirty and self._disk_state is not None and self._loader is None:
+            # Nothing to discard: read just the entries that changed.
+            self._read_disk_changes()
+            return
         if self._dirty:
             confirm = QMessageBox.question(
                 self,
@@ -755,27 +1053,176 @@ class MainWindow(QMainWindow):
             )
             if confirm != QMessageBox.Yes:
                 return
-        try:
-            document = AbilityDocument.load(self._document_path)
-        except Exception as exc:
-            QMessageBox.critical(self, "Failed to reload", f"{exc}")
-            return
-        self._document = document
-        self.entry_filter.blockSignals(True)
-        self.entry_filter.clear()
-        self.entry_filter.blockSignals(False)
-        self._update_entry_list()
-        self._mark_dirty(False)
-        self._refresh_preview()
-        self.statusBar().showMessage(f"Reloaded {self._document_path}")
+        self._start_loading(self._document_path, reload=True)
 
     def _perform_save(self, path: Path) -> None:
         assert self._document is not None
-        text = self._document.to_text().rstrip() + "\n"
-        path.write_text(text, encoding="utf-8")
+        document = self._document
+        chunks = list(document.iter_bytes())
+        try:
+            try:
+                result = storage.save_atomic(path, chunks, expected=document.fingerprint)
+            except storage.ExternalChangeError:
+                confirm = QMessageBox.question(
+                    self,
+                    "File changed on disk",
+                    f"{path.name} was modified outside the editor since it was loaded.\n"
+                    "Overwrite it with the current document?",
+                    QMessageBox.Yes | QMessageBox.No,
+                    QMessageBox.No,
+                )
+                if confirm != QMessageBox.Yes:
+                    self.statusBar().showMessage("Save cancelled.", 5000)
+                    return
+                result = storage.save_atomic(path, chunks, force=True)
+        except OSError as exc:
+            QMessageBox.critical(self, "Failed to save", f"{exc}")
+            return
+        document.fingerprint = result.fingerprint
+        self._saved_version = document.version
+        self._watch_file(disk_sync.DiskState.saved(document, b"".join(chunks), result.fingerprint))
         self._mark_dirty(False)
         self._refresh_preview()
-        self.statusBar().showMessage(f"Saved {path}")
+        elapsed_ms = result.elapsed * 1000
+        if result.skipped:
+            self.statusBar().showMessage(f"No changes to write to {path} (checked in {elapsed_ms:.0f} ms)")
+        else:
+            self.statusBar().showMessage(
+                f"Saved {path} ({storage.format_size(result.bytes_written)} in {elapsed_ms:.0f} ms)"
+            )
+
+    # ---------------------------------------------------------------- Outside changes
+    def _watch_file(self, state: Optional[disk_sync.DiskState]) -> None:
+        """Watch the document's file, merging outside changes into *state*'s entries."""
+        self._disk_state = state
+        self._disk_timer.stop()
+        watched = self._disk_watcher.files()
+        if watched:
+            self._disk_watcher.removePaths(watched)
+        if self._document_path is not None and self._document_path.exists():
+            self._disk_watcher.addPath(str(self._document_path))
+
+    def _on_disk_file_changed(self, path: str) -> None:
+        # Editors often save by replacing the file, which drops it from the watcher.
+        if Path(path).exists() and path not in self._disk_watcher.files():
+            self._disk_watcher.addPath(path)
+        self._disk_timer.start()
+
+    def _check_disk(self) -> None:
+        if self._disk_merging:
+            self._disk_recheck = True
+            return
+        document, path = self._document, self._document_path
+        if document is None or path is None or self._loader is not None:
+            return
+        try:
+            stat = path.stat()
+        except OSError:
+            self.statusBar().showMessage(f"{path.name} was removed from disk.", 5000)
+            return
+        if document.fingerprint is not None and document.fingerprint.matches_stat(stat):
+            return  # our own save, or already merged
+        if self._disk_state is None:
+            self.statusBar().showMessage(f"{path.name} changed on disk; use File → Reload to load it.")
+            return
+        self._read_disk_changes()
+
+    def _read_disk_changes(self) -> None:
+        if self._disk_future is not None or self._disk_merging:
+            self._disk_recheck = True
+            return
+        assert self._disk_state is not None and self._document_path is not None
+        if self._disk_executor is None:
+            self._disk_executor = ThreadPoolExecutor(max_workers=1)
+        self._disk_future = self._disk_executor.submit(
+            disk_sync.read_changes, self._disk_state, self._document_path
+        )
+        self._disk_poll_timer.start()
+        self.statusBar().showMessage(f"Reading changes to {self._document_path.name}…")
+
+    def _poll_disk(self) -> None:
+        future = self._disk_future
+        if future is None or not future.done():
+            return
+        self._disk_poll_timer.stop()
+        self._disk_future = None
+        try:
+            change = future.result()
+        except (OSError, UnicodeDecodeError) as exc:
+            self.statusBar().showMessage(f"Could not read the changes: {exc}", 5000)
+            change = None
+        document = self._document
+        if change is not None and document is not None and change.previous is self._disk_state and self._loader is None:
+            self._disk_merging = True
+            try:
+                self._merge_disk_change(document, change)
+            finally:
+                self._disk_merging = False
+        elif change is not None:
+            self._disk_recheck = True  # loaded or saved in the meantime
+        if self._disk_recheck:
+            self._disk_recheck = False
+            self._check_disk()
+
+    def _merge_disk_change(self, document: AbilityDocument, change: disk_sync.DiskChange) -> None:
+        plan = disk_sync.plan_sync(document, change)
+        if plan.conflicts:
+            self._resolve_disk_conflicts(plan.conflicts)
+        was_clean = document.version == self._saved_version
+        current = self._current_entry()
+        if not plan.is_empty:
+            self._record_change("Reload changes from disk")
+        disk_sync.apply_sync(document, plan)
+        self._disk_state = change.state
+        if was_clean:
+            self._saved_version = document.version
+        if current is not None and document.index_of(current) is None:
+            current = plan.successor(current)
+        self.entry_model.set_document(document)
+        if current is not None and document.index_of(current) is not None:
+            self._update_entry_list(select_entry=current)
+        else:
+            self._update_entry_list()
+        self._mark_dirty(document.version != self._saved_version)
+        self._refresh_preview()
+        assert self._document_path is not None
+        self.statusBar().showMessage(f"Updated from {self._document_path.name}: {plan.summary()}.", 10000)
+
+    def _resolve_disk_conflicts(self, conflicts: List[disk_sync.SyncConflict]) -> None:
+        """Ask, entry by entry, whether the local edit or the file's version stays."""
+        name = self._document_path.name if self._document_path else "the file"
+        for position, conflict in enumerate(conflicts):
+            if conflict.theirs is None:
+                text = f"{conflict.header} was edited here but removed from {name}."
+            elif conflict.ours is None:
+                text = f"{conflict.header} was changed in {name} but removed here."
+            else:
+                text = f"{conflict.header} was edited both here and in {name}."
+            box = QMessageBox(self)
+            box.setIcon(QMessageBox.Warning)
+            box.setWindowTitle(f"Conflicting edit ({position + 1} of {len(conflicts)})")
+            box.setText(text)
+            box.setDetailedText(
+                "Yours:\n"
+                + (conflict.ours.to_text() if conflict.ours is not None else "(removed)")
+                + f"\n\n{name}:\n"
+                + (conflict.theirs.to_text() if conflict.theirs is not None else "(removed)")
+            )
+            keep = box.addButton("Keep mine", QMessageBox.AcceptRole)
+            take = box.addButton("Use file's version", QMessageBox.DestructiveRole)
+            keep_all = take_all = None
+            if position + 1 < len(conflicts):
+                keep_all = box.addButton("Keep all mine", QMessageBox.AcceptRole)
+                take_all = box.addButton("Use all from file", QMessageBox.DestructiveRole)
+            box.setDefaultButton(keep)
+            box.setEscapeButton(keep)
+            box.exec()
+            clicked = box.clickedButton()
+            if clicked is keep_all or clicked is take_all:
+                for rest in conflicts[position:]:
+                    rest.take_disk = clicked is take_all
+                return
+            conflict.take_disk = clicked is take
 
     def _update_file_actions(self) -> None:
         has_document = self._document is not None
@@ -795,6 +1242,108 @@ class MainWindow(QMainWindow):
             state = "enabled" if self.require_confirmations else "disabled"
             self.statusBar().showMessage(f"Delete confirmations {state}.")
 
+    def _show_entry_palette(self) -> None:
+        if not self._document or not self._document.entries:
+            QMessageBox.information(self, "No document", "Open a file first.")
+            return
+        dialog = EntryPaletteDialog(self._document, self)
+        if dialog.exec() == QDialog.Accepted and dialog.selected_entry is not None:
+            self._reveal_entry(dialog.selected_entry)
+
+    def _show_usages(self) -> None:
+        if not self._document or not self._document.entries:
+            QMessageBox.information(self, "No document", "Open a file first.")
+            return
+        cursor = self.entry_editor.textCursor()
+        if not cursor.hasSelection():
+            cursor.select(QTextCursor.WordUnderCursor)
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            self._document.reference_index()
+        finally:
+            QApplication.restoreOverrideCursor()
+        dialog = UsagesDialog(self._document, cursor.selectedText().strip(), self)
+        if dialog.exec() == QDialog.Accepted and dialog.selected_entry is not None:
+            self._reveal_entry(dialog.selected_entry)
+
+    def _reveal_entry(self, entry: AbilityEntry) -> None:
+        """Select ``entry``, clearing the list filter if it currently hides it."""
+        if self._select_entry(entry):
+            return
+        self.entry_filter.blockSignals(True)
+        self.entry_filter.clear()
+        self.entry_filter.blockSignals(False)
+        self._entry_filter_timer.stop()
+        self.entry_proxy.set_filter_text("")
+        self._select_entry(entry)
+
+    def _validate_formulas(self) -> None:
+        if not self._document:
+            QMessageBox.information(self, "No document", "Open a file first.")
+            return
+        started = time.perf_counter()
+        diagnostics = ncalc.validate_document(self._document)
+        elapsed = (time.perf_counter() - started) * 1000
+        counts = ncalc.summarize(diagnostics)
+        self.statusBar().showMessage(
+            f"Checked {len(self._document.entries)} entries in {elapsed:.0f} ms: "
+            f"{counts[ncalc.ERROR]} errors, {counts[ncalc.WARNING]} warnings."
+        )
+        if not diagnostics:
+            QMessageBox.information(self, "Validate formulas", "No problems found in [code=...] blocks.")
+            return
+        dialog = ValidationReportDialog(self._document, diagnostics, self)
+        if dialog.exec() == QDialog.Accepted and dialog.selected_entry is not None:
+            self._reveal_entry(dialog.selected_entry)
+
+    def _merge_mod_files(self) -> None:
+        dialog = MergeDialog(self)
+        if dialog.exec() != QDialog.Accepted or dialog.merge_result is None:
+            return
+        if self._dirty:
+            confirm = QMessageBox.question(
+                self,
+                "Discard changes",
+                "Opening the merged document will discard unsaved changes. Continue?",
+                QMessageBox.Yes | QMessageBox.No,
+                QMessageBox.No,
+            )
+            if confirm != QMessageBox.Yes:
+                return
+        result = dialog.merge_result
+        self._adopt_document(result.document)
+        self.statusBar().showMessage(result.summary() + ". Save it to keep the merged file.")
+
+    def _show_overlay(self) -> None:
+        # Kept between uses so the layers stay loaded and watched.
+        if self._overlay_dialog is None:
+            self._overlay_dialog = OverlayDialog(self)
+        self._overlay_dialog.show()
+        self._overlay_dialog.raise_()
+        self._overlay_dialog.activateWindow()
+
+    def _adopt_document(self, document: AbilityDocument) -> None:
+        """Show an in-memory *document* that has no file yet (it starts out unsaved)."""
+        self._cancel_loading()
+        self._previous_document = (None, None)
+        self._document = document
+        self._document_path = None
+        self._watch_file(None)
+        self._history.clear()
+        self._ids.clear()
+        self._ids.track(document)
+        self.entry_filter.blockSignals(True)
+        self.entry_filter.clear()
+        self.entry_filter.blockSignals(False)
+        self._entry_filter_timer.stop()
+        self.entry_proxy.set_filter_text("")
+        document.search_index()
+        self.entry_model.set_document(document)
+        self._saved_version = -1
+        self._update_entry_list()
+        self._mark_dirty(True)
+        self._refresh_preview()
+
     def _show_feature_types_help(self) -> None:
         dialog = FeatureTypesDialog(self)
         dialog.exec()
@@ -824,6 +1373,58 @@ class MainWindow(QMainWindow):
         self._dirty = dirty
         self._update_window_title()
         self._update_file_actions()
+        self._update_history_actions()
+        self._update_id_status()
+        # Entries streaming in from a file are checked once loading finishes.
+        self.diagnostics_panel.document_changed(self._document if self._loader is None else None)
+
+    # ---------------------------------------------------------------- Undo / redo
+    def _record_change(self, label: str) -> None:
+        """Remember the document state before an edit so it can be undone."""
+        if self._document is not None:
+            self._history.record(self._document, label)
+
+    def _discard_change(self) -> None:
+        """Take back a ``_record_change`` whose edit turned out to change nothing."""
+        if self._document is not None:
+            self._history.discard_last(self._document)
+        self._update_history_actions()
+
+    def _update_history_actions(self) -> None:
+        if not hasattr(self, "undo_action"):
+            return
+        history = self._history
+        available = self._document is not None and self._loader is None
+        undo_label = history.undo_label()
+        redo_label = history.redo_label()
+        self.undo_action.setEnabled(available and undo_label is not None)
+        self.undo_action.setText(f"Undo {undo_label}" if undo_label else "Undo")
+        self.redo_action.setEnabled(available and redo_label is not None)
+        self.redo_action.setText(f"Redo {redo_label}" if redo_label else "Redo")
+
+    def _undo(self) -> None:
+        self._step_history(undo=True)
+
+    def _redo(self) -> None:
+        self._step_history(undo=False)
+
+    def _step_history(self, *, undo: bool) -> None:
+        document = self._document
+        if document is None or self._loader is not None:
+            return
+        current = self._current_entry()
+        label = self._history.undo(document) if undo else self._history.redo(document)
+        if label is None:
+            return
+        self.entry_model.set_document(document)
+        if current is not None and document.index_of(current) is not None:
+            self._update_entry_list(select_entry=current)
+        else:
+            self.entry_editor.clear()
+            self._update_entry_list()
+        self._mark_dirty(document.version != self._saved_version)
+        self._refresh_preview()
+        self.statusBar().showMessage(f"{'Undid' if undo else 'Redid'} {label.lower()}.", 5000)
 
 
     # ---------------------------------------------------------------- Callbacks
@@ -890,12 +1491,12 @@ class MainWindow(QMainWindow):
 
         self.template_preview.setPlainText("\n".join(parts))
 
-    def _on_entry_selected(self, current: QListWidgetItem, previous: Optional[QListWidgetItem]) -> None:
+    def _on_entry_selected(self, current: QModelIndex, previous: QModelIndex) -> None:
         self._update_entry_actions()
-        if not current:
+        entry = self.entry_proxy.entry_for(current)
+        if entry is None:
             self.entry_editor.clear()
             return
-        entry: AbilityEntry = current.data(Qt.UserRole)
         self.entry_editor.setPlainText(self._entry_text_for_editing(entry))
 
     # ---------------------------------------------------------------- Editing helpers
@@ -910,6 +1511,114 @@ class MainWindow(QMainWindow):
         self.entry_editor.insertPlainText(template.body)
         self.statusBar().showMessage("Template inserted. Fill in the placeholders before saving.")
 
+    def _generate_from_csv(self) -> None:
+        if not self._document:
+            QMessageBox.information(self, "No document", "Open a file first.")
+            return
+        template_item = self.template_list.currentItem()
+        template = template_item.data(Qt.UserRole) if template_item else None
+        if not template:
+            QMessageBox.information(self, "No template", "Select a template first.")
+            return
+        path, _ = QFileDialog.getOpenFileName(
+            self,
+            "Generate entries from CSV",
+            str(self._document_path.parent if self._document_path else Path.cwd()),
+            "CSV sheets (*.csv *.tsv *.txt);;All files (*)",
+        )
+        if not path:
+            return
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            result = batch.generate_from_csv(template, Path(path))
+        except (OSError, UnicodeDecodeError, batch.BatchError) as exc:
+            QApplication.restoreOverrideCursor()
+            QMessageBox.warning(self, "Cannot generate entries", f"{exc}")
+            return
+        QApplication.restoreOverrideCursor()
+        if not result.entries:
+            QMessageBox.information(self, "Generate entries", "The sheet has no data rows.")
+            return
+        self._ids.sync()
+        clashes = self._ids.collisions(result.entries)
+        if clashes:
+            shown = ", ".join(f"{space} {ability_id}" for space, ability_id in clashes[:10])
+            more = f" and {len(clashes) - 10} more" if len(clashes) > 10 else ""
+            spaces = sorted({space for space, _ in clashes})
+            free = "\n".join(f"Free {space} IDs: {self._ids.describe_free(space)}" for space in spaces)
+            reply = QMessageBox.question(
+                self,
+                "IDs already in use",
+                f"{len(clashes)} generated IDs are already used or repeat within the sheet: "
+                f"{shown}{more}.\n\n{free}\n\nInsert the entries anyway?",
+                QMessageBox.Yes | QMessageBox.No,
+                QMessageBox.No,
+            )
+            if reply != QMessageBox.Yes:
+                return
+        insert_index = len(self._document.entries)
+        current_index = self._current_entry_index()
+        if current_index is not None:
+            insert_index = current_index + 1
+        self._record_change("Generate entries from CSV")
+        self.entry_model.insert_entries(insert_index, result.entries)
+        self._update_entry_list(select_entry=result.entries[0])
+        self._mark_dirty()
+        self._refresh_preview()
+        self.statusBar().showMessage(f"{result.summary()}.")
+
+    def _editor_header_block(self) -> QTextBlock:
+        """First non-blank line of the entry editor (invalid when it is empty)."""
+        block = self.entry_editor.document().firstBlock()
+        while block.isValid() and not block.text().strip():
+            block = block.next()
+        return block
+
+    def _update_id_status(self) -> None:
+        if not hasattr(self, "id_status_label"):
+            return
+        key = parse_header(self._editor_header_block().text())
+        if self._document is None or key is None:
+            self.id_status_label.clear()
+            self.next_id_btn.setEnabled(False)
+            return
+        self._ids.sync()
+        space = key[0].split("_", 1)[0]
+        ability_id = key[1]
+        free = f"Free {space} IDs: {self._ids.describe_free(space)}"
+        if ability_id is None:
+            text = free
+        elif ability_id > MAX_ABILITY_ID:
+            text = f"{space} {ability_id} is out of range (IDs go up to {MAX_ABILITY_ID}). {free}"
+        else:
+            current = self._current_entry()
+            others = [entry for entry in self._ids.used_by(space, ability_id) if entry is not current]
+            if others:
+                headers = "; ".join(entry.header.strip() for entry in others[:3])
+                more = "; …" if len(others) > 3 else ""
+                text = f"{space} {ability_id} is also used by {headers}{more}. {free}"
+            else:
+                text = f"{space} {ability_id} is not used by any other entry. {free}"
+        self.id_status_label.setText(text)
+        self.next_id_btn.setEnabled(key[0] == space)
+
+    def _use_next_free_id(self) -> None:
+        block = self._editor_header_block()
+        header = block.text()
+        key = parse_header(header)
+        if key is None:
+            return
+        self._ids.sync()
+        space = key[0].split("_", 1)[0]
+        ability_id = self._ids.next_free(space, key[1] or 0)
+        updated = with_id(header, ability_id)
+        if updated == header:
+            return
+        cursor = QTextCursor(block)
+        cursor.movePosition(QTextCursor.EndOfBlock, QTextCursor.KeepAnchor)
+        cursor.insertText(updated)
+        self.statusBar().showMessage(f"Using free ID {space} {ability_id}.")
+
     def _save_entry_as_template(self) -> None:
         raw = self.entry_editor.toPlainText()
         result = self._parse_entry_text(raw, require_type=True)
@@ -918,8 +1627,7 @@ class MainWindow(QMainWindow):
         parsed_entry, type_key = result
         type_key = type_key or ""
 
-        current_item = self.entry_list.currentItem()
-        current_entry: Optional[AbilityEntry] = current_item.data(Qt.UserRole) if current_item else None
+        current_entry = self._current_entry()
 
         header_line = parsed_entry.header
         suggested_label = self._suggest_template_label(header_line)
@@ -1000,20 +1708,72 @@ class MainWindow(QMainWindow):
         if not self._document:
             QMessageBox.information(self, "No document", "Open a file before reordering entries.")
             return
-        row = self.entry_list.currentRow()
-        if row < 0:
+        rows = self._selected_entry_indexes()
+        if not rows:
             QMessageBox.information(self, "No entry selected", "Choose an entry to move.")
             return
-        new_row = row + delta
-        if new_row < 0 or new_row >= len(self._document.entries):
+        if len(rows) == 1:
+            row = rows[0]
+            new_row = row + delta
+            if new_row < 0 or new_row >= len(self._document.entries):
+                return
+            entry = self._document.entries[row]
+            self._record_change("Move entry")
+            if not self.entry_model.move_entry(row, new_row):
+                self._discard_change()
+                return
+            self._update_entry_list(select_entry=entry)
+        else:
+            self._record_change("Move entries")
+            if not self.entry_model.shift_entries(rows, delta):
+                self._discard_change()
+                return
+        self._mark_dirty()
+        self._refresh_preview()
+        self._update_entry_actions()
+        direction = "up" if delta < 0 else "down"
+        noun = "entry" if len(rows) == 1 else f"{len(rows)} entries"
+        self.statusBar().showMessage(f"Moved {noun} {direction}.", 5000)
+
+    def _on_entries_dropped(self, view_row: int) -> None:
+        if not self._document:
+            return
+        rows = self._selected_entry_indexes()
+        if not rows:
             return
-        if not self._document.move(row, new_row):
+        if view_row < self.entry_proxy.rowCount():
+            destination = self.entry_proxy.mapToSource(self.entry_proxy.index(view_row, 0)).row()
+        elif self.entry_proxy.rowCount():
+            last = self.entry_proxy.index(self.entry_proxy.rowCount() - 1, 0)
+            destination = self.entry_proxy.mapToSource(last).row() + 1
+        else:
+            destination = len(self._document.entries)
+        self._record_change("Move entry" if len(rows) == 1 else "Move entries")
+        if not self.entry_model.move_entries(rows, destination):
+            self._discard_change()
             return
-        self._update_entry_list(select_row=new_row)
         self._mark_dirty()
         self._refresh_preview()
-        direction = "up" if delta < 0 else "down"
-        self.statusBar().showMessage(f"Moved entry {direction}.", 5000)
+        self._update_entry_actions()
+        noun = "entry" if len(rows) == 1 else f"{len(rows)} entries"
+        self.statusBar().showMessage(f"Moved {noun}.", 5000)
+
+    def _sort_entries_by_id(self) -> None:
+        if not self._document:
+            QMessageBox.information(self, "No document", "Open a file first.")
+            return
+        rows = self._selected_entry_indexes()
+        selected_only = len(rows) > 1
+        self._record_change("Sort by ID")
+        if not self.entry_model.sort_entries(rows if selected_only else None):
+            self._discard_change()
+            self.statusBar().showMessage("Entries are already sorted by ID.", 5000)
+            return
+        self._mark_dirty()
+        self._refresh_preview()
+        self._update_entry_actions()
+        scope = f"{len(rows)} selected entries" if selected_only else "all entries"
+        self.statusBar().showMessage(f"Sorted {scope} by ID.", 5000)
 
     def _delete_selected_template(self) -> None:
         item = self.template_list.currentItem()
@@ -1049,24 +1809,7 @@ class MainWindow(QMainWindow):
         for line in text.splitlines():
             stripped = line.strip()
             if stripped:
-                first_line = stripped
-                break
-        else:
-            return None
-        if not first_line.startswith(">"):
-            return None
-        header = re.sub(r"\s+", " ", first_line[1:].strip())
-        patterns = [
-            (r"^SA\s+GLOBALENEMY\+", "SA_GLOBAL_ENEMY"),
-            (r"^SA\s+GLOBALLAST\+", "SA_GLOBAL_LAST"),
-            (r"^SA\s+GLOBAL\+", "SA_GLOBAL"),
-            (r"^SA\b", "SA"),
-            (r"^AA\s+GLOBAL\+", "AA_GLOBAL"),
-            (r"^AA\b", "AA"),
-        ]
-        for pattern, type_key in patterns:
-            if re.match(pattern, header, flags=re.IGNORECASE):
-                return type_key
+                return detect_entry_type(stripped)
         return None
 
     def _suggest_template_label(self, header_line: str) -> str:
@@ -1096,15 +1839,8 @@ class MainWindow(QMainWindow):
         return comments
 
     def _detect_block_sequence(self, text: str) -> List[str]:
-        ordered: List[str] = []
-        for line in text.splitlines():
-            match = re.search(r"\[code=([A-Za-z0-9_]+)", line)
-            if not match:
-                continue
-            key = match.group(1)
-            if key in ability_data.FEATURE_BLOCKS and key not in ordered:
-                ordered.append(key)
-        return ordered
+        names = parse_body(text.splitlines()).block_names
+        return [key for key in names if key in ability_data.FEATURE_BLOCKS]
 
     def _generate_template_id(self, name: str) -> str:
         base = re.sub(r"[^a-z0-9]+", "_", name.lower()).strip("_") or "custom"
@@ -1125,8 +1861,8 @@ class MainWindow(QMainWindow):
         if not self._document:
             QMessageBox.information(self, "No document", "Open a file first.")
             return
-        item = self.entry_list.currentItem()
-        if not item:
+        current_entry = self._current_entry()
+        if current_entry is None:
             QMessageBox.information(self, "No entry selected", "Choose an entry to replace.")
             return
         raw = self.entry_editor.toPlainText().strip()
@@ -1137,12 +1873,16 @@ class MainWindow(QMainWindow):
         if not parsed:
             return
         new_entry, _ = parsed
-        replaced = self._document.replace(item.text(), new_entry)
-        if not replaced:
+        index = self._document.index_of(current_entry)
+        if index is None:
             QMessageBox.warning(self, "Header mismatch", "Could not find matching entry in document.")
             return
-        item.setText(new_entry.header)
-        item.setData(Qt.UserRole, new_entry)
+        if new_entry.rendered() == current_entry.rendered():
+            self.statusBar().showMessage("Entry unchanged; nothing to replace.", 5000)
+            return
+        self._record_change("Replace entry")
+        self.entry_model.replace_entry(index, new_entry)
+        self._update_entry_list(select_entry=new_entry)
         self._mark_dirty()
         self._refresh_preview()
         self.statusBar().showMessage("Entry replaced.")
@@ -1160,10 +1900,11 @@ class MainWindow(QMainWindow):
             return
         new_entry, _ = parsed
         insert_index = len(self._document.entries)
-        current_row = self.entry_list.currentRow()
-        if current_row >= 0:
-            insert_index = current_row + 1
-        self._document.insert(insert_index, new_entry)
+        current_index = self._current_entry_index()
+        if current_index is not None:
+            insert_index = current_index + 1
+        self._record_change("Append entry")
+        self.entry_model.insert_entry(insert_index, new_entry)
         self._update_entry_list(select_entry=new_entry)
         self._mark_dirty()
         self._refresh_preview()
@@ -1174,63 +1915,68 @@ class MainWindow(QMainWindow):
         if not self._document:
             QMessageBox.information(self, "No document", "Open a file first.")
             return
-        row = self.entry_list.currentRow()
-        if row < 0 or row >= len(self._document.entries):
+        rows = self._selected_entry_indexes()
+        if not rows:
             QMessageBox.information(self, "No entry selected", "Choose an entry to duplicate.")
             return
-        source = self._document.entries[row]
-        try:
-            duplicate = AbilityEntry.from_text(source.to_text())
-        except ValueError as exc:
-            QMessageBox.information(self, "Could not duplicate", str(exc))
-            return
-
-        base_header = duplicate.header
-        headers = {entry.header for entry in self._document.entries}
-        if base_header in headers:
-            suffix = " (Copy)"
-            candidate = f"{base_header}{suffix}"
-            counter = 2
-            while candidate in headers:
-                candidate = f"{base_header} (Copy {counter})"
-                counter += 1
-            duplicate.header = candidate
-        self._document.insert(row + 1, duplicate)
-        self._update_entry_list(select_entry=duplicate)
+        duplicates: List[AbilityEntry] = []
+        reserved: Set[str] = set()
+        for row in rows:
+            try:
+                duplicate = AbilityEntry.from_text(self._document.entries[row].to_text())
+            except ValueError as exc:
+                QMessageBox.information(self, "Could not duplicate", str(exc))
+                return
+            duplicate.header = self._document.unique_header(duplicate.header, reserved)
+            reserved.add(duplicate.header)
+            duplicates.append(duplicate)
+
+        # Copies go in as one block after the last selected entry.
+        self._record_change("Duplicate entry" if len(duplicates) == 1 else "Duplicate entries")
+        self.entry_model.insert_entries(rows[-1] + 1, duplicates)
+        self._select_entries(duplicates)
+        self._update_entry_actions()
         self._mark_dirty()
         self._refresh_preview()
-        self.statusBar().showMessage(f"Duplicated entry as {duplicate.header}.", 5000)
+        if len(duplicates) == 1:
+            self.statusBar().showMessage(f"Duplicated entry as {duplicates[0].header}.", 5000)
+        else:
+            self.statusBar().showMessage(f"Duplicated {len(duplicates)} entries.", 5000)
 
     def _delete_entry(self) -> None:
         if not self._document:
             QMessageBox.information(self, "No document", "Open a file first.")
             return
-        item = self.entry_list.currentItem()
-        if not item:
+        rows = self._selected_entry_indexes()
+        if not rows:
             QMessageBox.information(self, "No entry selected", "Choose an entry to delete.")
             return
-        row = self.entry_list.currentRow()
+        view_rows = [index.row() for index in self.entry_list.selectionModel().selectedRows()]
+        view_row = min(view_rows) if view_rows else self.entry_list.currentIndex().row()
         if self.require_confirmations:
+            question = (
+                "Remove the selected entry from the document?"
+                if len(rows) == 1
+                else f"Remove the {len(rows)} selected entries from the document?"
+            )
             confirm = QMessageBox.question(
                 self,
-                "Delete entry",
-                "Remove the selected entry from the document?",
+                "Delete entry" if len(rows) == 1 else "Delete entries",
+                question,
                 QMessageBox.Yes | QMessageBox.No,
                 QMessageBox.No,
             )
             if confirm != QMessageBox.Yes:
                 return
-        try:
-            self._document.entries.pop(row)
-        except IndexError:
-            pass
         self.entry_editor.clear()
+        self._record_change("Delete entry" if len(rows) == 1 else "Delete entries")
+        self.entry_model.remove_entries(rows)
         self._mark_dirty()
         self._refresh_preview()
-        self.statusBar().showMessage("Entry deleted.")
-        if self._document and self._document.entries:
-            next_row = min(row, len(self._document.entries) - 1)
-            self._update_entry_list(select_row=next_row)
+        self.statusBar().showMessage("Entry deleted." if len(rows) == 1 else f"{len(rows)} entries deleted.")
+        visible = self.entry_proxy.rowCount()
+        if visible:
+            self._update_entry_list(select_row=min(max(view_row, 0), visible - 1))
         else:
             self._update_entry_list()
 
@@ -1247,12 +1993,29 @@ class MainWindow(QMainWindow):
         self.statusBar().showMessage("Editing blank entry. Use Append to add it to the document.")
 
     def _on_entry_filter_changed(self, text: str) -> None:
+        self._entry_filter_timer.start()
+
+    def _apply_entry_filter(self) -> None:
+        current = self._current_entry()
+        self.entry_proxy.set_filter_text(self.entry_filter.text())
+        if current is not None:
+            self._select_entry(current)
+
+    def _on_entry_filter_finished(self) -> None:
         self._update_entry_list()
+        if self.entry_filter.text() and self._document is not None:
+            self.statusBar().showMessage(
+                f"{self.entry_proxy.rowCount()} of {len(self._document.entries)} entries match the filter.",
+                5000,
+            )
 
     def _show_entry_context_menu(self, point) -> None:
         menu = QMenu(self)
         clear_action = menu.addAction("Clear selection")
         delete_action = menu.addAction("Delete entry")
+        duplicate_action = menu.addAction("Duplicate entry")
+        sort_action = menu.addAction("Sort selection by ID")
+        sort_action.setEnabled(len(self._selected_entry_indexes()) > 1)
         copy_action = menu.addAction("Copy entry to editor")
         action = menu.exec(QCursor.pos())
         if action == clear_action:
@@ -1260,10 +2023,13 @@ class MainWindow(QMainWindow):
             self.entry_editor.clear()
         elif action == delete_action:
             self._delete_entry()
+        elif action == duplicate_action:
+            self._duplicate_entry()
+        elif action == sort_action:
+            self._sort_entries_by_id()
         elif action == copy_action:
-            current = self.entry_list.currentItem()
-            if current:
-                entry: AbilityEntry = current.data(Qt.UserRole)
+            entry = self._current_entry()
+            if entry is not None:
                 self.entry_editor.setPlainText(self._entry_text_for_editing(entry))
 
     def _on_template_clicked(self, item: QListWidgetItem) -> None:
@@ -1296,12 +2062,19 @@ class MainWindow(QMainWindow):
 
         window = QMainWindow(self)
         window.setWindowTitle("Document preview")
-        preview = QPlainTextEdit()
-        preview.setReadOnly(True)
+        preview = DocumentPreviewEdit()
 
         self._preview_window = window
         self._preview_editor = preview
 
+        toolbar = window.addToolBar("Compare")
+        toolbar.setMovable(False)
+        compare_disk_action = toolbar.addAction("Compare with file on disk")
+        compare_disk_action.setEnabled(self._document_path is not None)
+        compare_disk_action.triggered.connect(self._compare_with_disk)
+        compare_file_action = toolbar.addAction("Compare with other file…")
+        compare_file_action.triggered.connect(self._compare_with_file)
+
         container = QWidget(window)
         layout = QVBoxLayout(container)
         layout.setContentsMargins(0, 0, 0, 0)
@@ -1318,11 +2091,48 @@ class MainWindow(QMainWindow):
         self._refresh_preview()
         window.show()
 
+    def _compare_with_disk(self) -> None:
+        if not self._document or self._document_path is None:
+            QMessageBox.information(self, "No file", "The document has not been saved to a file yet.")
+            return
+        self._compare_documents(self._document_path, "On disk")
+
+    def _compare_with_file(self) -> None:
+        if not self._document:
+            QMessageBox.information(self, "No document", "Open a file first.")
+            return
+        path, _ = QFileDialog.getOpenFileName(
+            self,
+            "Compare with AbilityFeatures file",
+            str(self._document_path or Path.cwd()),
+            "AbilityFeatures (*.txt);;All files (*)",
+        )
+        if not path:
+            return
+        self._compare_documents(Path(path), Path(path).name)
+
+    def _compare_documents(self, path: Path, label: str) -> None:
+        assert self._document is not None
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            other = AbilityDocument.load(path)
+            diff = document_diff.diff_documents(other, self._document)
+        except (OSError, UnicodeDecodeError) as exc:
+            QMessageBox.critical(self, "Compare failed", f"{exc}")
+            return
+        finally:
+            QApplication.restoreOverrideCursor()
+        if diff.is_empty:
+            QMessageBox.information(self, "Compare documents", f"The current document matches {label}.")
+            return
+        dialog = DocumentDiffDialog(diff, label, "Current document", self)
+        if dialog.exec() == QDialog.Accepted and dialog.selected_entry is not None:
+            self._reveal_entry(dialog.selected_entry)
+
     def _refresh_preview(self) -> None:
         if not self._preview_editor:
             return
-        text = self._document.to_text() if self._document else ""
-        self._preview_editor.setPlainText(text)
+        self._preview_editor.show_document(self._document)
 
     def _clear_preview_window(self, obj: Optional[object] = None) -> None:
         self._preview_window = None
@@ -1330,6 +2140,10 @@ class MainWindow(QMainWindow):
         self._preview_find_bar = None
         self._preview_find_input = None
         self._preview_find_status = None
+        self._preview_find_regex = None
+        self._preview_find_word = None
+        self._preview_find_case = None
+        self._pending_preview_find = None
         self._preview_shortcuts = []
 
     def _ensure_preview_find_bar(self, editor: QPlainTextEdit) -> QWidget:
@@ -1360,6 +2174,18 @@ class MainWindow(QMainWindow):
         next_button.setToolTip("Find next (F3)")
         layout.addWidget(next_button)
 
+        option_boxes = []
+        for label, tooltip in (
+            ("Regex", "Treat the text as a regular expression"),
+            ("Whole word", "Only match whole words"),
+            ("Match case", "Match upper and lower case exactly"),
+        ):
+            box = QCheckBox(label)
+            box.setToolTip(tooltip)
+            box.toggled.connect(lambda _checked: self._on_preview_find_text_changed(input_field.text()))
+            layout.addWidget(box)
+            option_boxes.append(box)
+
         status_label = QLabel()
         status_label.setObjectName("previewFindStatus")
         status_label.setMinimumWidth(90)
@@ -1381,9 +2207,13 @@ class MainWindow(QMainWindow):
         esc_shortcut.activated.connect(self._hide_preview_find)
         bar._esc_shortcut = esc_shortcut  # type: ignore[attr-defined]
 
+        if isinstance(editor, DocumentPreviewEdit):
+            editor.matches_changed.connect(self._on_preview_matches_changed)
+
         self._preview_find_bar = bar
         self._preview_find_input = input_field
         self._preview_find_status = status_label
+        self._preview_find_regex, self._preview_find_word, self._preview_find_case = option_boxes
 
         return bar
 
@@ -1422,6 +2252,9 @@ class MainWindow(QMainWindow):
             self._preview_find_input.setText(selected_text)
         elif not self._preview_find_input.text() and self._last_preview_find:
             self._preview_find_input.setText(self._last_preview_find)
+        query = self._preview_find_query()
+        if isinstance(editor, DocumentPreviewEdit) and query != editor.find_query and self._apply_preview_find_query():
+            self._update_preview_find_status()
 
         self._preview_find_input.selectAll()
         self._preview_find_input.setFocus(Qt.ShortcutFocusReason)
@@ -1431,6 +2264,7 @@ class MainWindow(QMainWindow):
             self._preview_find_bar.setVisible(False)
             self._set_preview_find_status("")
         if self._preview_editor:
+            self._preview_editor.set_find_query(None)
             self._preview_editor.setFocus(Qt.ShortcutFocusReason)
 
     def _handle_preview_escape(self) -> None:
@@ -1438,78 +2272,84 @@ class MainWindow(QMainWindow):
             self._hide_preview_find()
 
     def _on_preview_find_text_changed(self, text: str) -> None:
-        if not text:
-            self._set_preview_find_status("")
-            return
-        self._last_preview_find = text
-        self._find_next_in_preview(from_start=True, wrap=False)
+        if text:
+            self._last_preview_find = text
+        if self._apply_preview_find_query():
+            self._find_in_preview(include_current=True)
 
-    def _find_next_in_preview(self, from_start: bool = False, wrap: bool = True) -> bool:
-        editor = self._preview_editor
+    def _preview_find_query(self) -> Optional[FindQuery]:
         field = self._preview_find_input
-        if not editor or not field:
+        if not field or not field.text():
+            return None
+        return FindQuery(
+            field.text(),
+            regex=bool(self._preview_find_regex and self._preview_find_regex.isChecked()),
+            whole_word=bool(self._preview_find_word and self._preview_find_word.isChecked()),
+            case_sensitive=bool(self._preview_find_case and self._preview_find_case.isChecked()),
+        )
+
+    def _apply_preview_find_query(self) -> bool:
+        """Hand the find bar's query to the preview; False if it is invalid."""
+        editor = self._preview_editor
+        if not editor:
             return False
-        text = field.text()
-        if not text:
-            self._set_preview_find_status("")
+        try:
+            editor.set_find_query(self._preview_find_query())
+        except FindError as exc:
+            editor.set_find_query(None)
+            self._set_preview_find_status(str(exc))
             return False
+        return True
 
-        self._last_preview_find = text
-        cursor = editor.textCursor()
-        original_position = cursor.position()
-
-        if from_start:
-            cursor.movePosition(QTextCursor.Start)
-            editor.setTextCursor(cursor)
-
-        if editor.find(text):
-            self._set_preview_find_status("")
-            return True
-
-        if wrap and not from_start:
-            cursor = editor.textCursor()
-            cursor.movePosition(QTextCursor.Start)
-            editor.setTextCursor(cursor)
-            if editor.find(text):
-                self._set_preview_find_status("Wrapped")
-                return True
-
-        cursor = editor.textCursor()
-        cursor.setPosition(original_position)
-        editor.setTextCursor(cursor)
-        self._set_preview_find_status("No matches")
-        return False
+    def _find_next_in_preview(self) -> bool:
+        return self._find_in_preview()
 
     def _find_prev_in_preview(self) -> bool:
+        return self._find_in_preview(backward=True)
+
+    def _find_in_preview(self, backward: bool = False, include_current: bool = False) -> bool:
         editor = self._preview_editor
-        field = self._preview_find_input
-        if not editor or not field:
+        if not editor or not self._preview_find_input:
             return False
-        text = field.text()
-        if not text:
+        query = self._preview_find_query()
+        if query is None:
             self._set_preview_find_status("")
             return False
+        self._last_preview_find = query.text
+        if query != editor.find_query and not self._apply_preview_find_query():
+            return False
+        # While a large document is still being searched, the jump is made
+        # when the matches arrive.
+        self._pending_preview_find = (backward, include_current) if editor.searching else None
+        index = editor.find_match(backward=backward, include_current=include_current)
+        self._update_preview_find_status()
+        return index is not None
+
+    def _on_preview_matches_changed(self) -> None:
+        editor = self._preview_editor
+        pending = self._pending_preview_find
+        if editor and pending is not None and editor.matches is not None:
+            self._pending_preview_find = None
+            editor.find_match(*pending)
+        self._update_preview_find_status()
 
-        self._last_preview_find = text
-        cursor = editor.textCursor()
-        original_position = cursor.position()
-
-        if editor.find(text, QTextDocument.FindBackward):
-            self._set_preview_find_status("")
-            return True
-
-        cursor = editor.textCursor()
-        cursor.movePosition(QTextCursor.End)
-        editor.setTextCursor(cursor)
-        if editor.find(text, QTextDocument.FindBackward):
-            self._set_preview_find_status("Wrapped")
-            return True
-
-        cursor = editor.textCursor()
-        cursor.setPosition(original_position)
-        editor.setTextCursor(cursor)
-        self._set_preview_find_status("No matches")
-        return False
+    def _update_preview_find_status(self) -> None:
+        editor = self._preview_editor
+        if not editor or editor.find_query is None:
+            if self._preview_find_input and not self._preview_find_input.text():
+                self._set_preview_find_status("")
+            return
+        matches = editor.matches
+        if matches is None:
+            self._set_preview_find_status("Searching…")
+        elif not matches:
+            self._set_preview_find_status("No matches")
+        else:
+            current = editor.current_match()
+            if current is None:
+                self._set_preview_find_status(f"{len(matches)} matches")
+            else:
+                self._set_preview_find_status(f"{current + 1} of {len(matches)}")
 
     def _set_preview_find_status(self, message: str) -> None:
         if not self._preview_find_status:
@@ -1517,6 +2357,46 @@ class MainWindow(QMainWindow):
         self._preview_find_status.setText(message)
 
 
+class EntryListView(QListView):
+    """Entry list with multi-selection and drag-and-drop reordering.
+
+    Drops are reported through ``rows_dropped`` (the view row the selection
+    should land before) so the move happens as one batch on the model, rather
+    than Qt's default of inserting copies and removing the originals.
+    """
+
+    rows_dropped = Signal(int)
+
+    def __init__(self, parent: Optional[QWidget] = None) -> None:
+        super().__init__(parent)
+        self.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.setDragEnabled(True)
+        self.setAcceptDrops(True)
+        self.setDropIndicatorShown(True)
+        self.setDragDropMode(QAbstractItemView.InternalMove)
+        self.setDefaultDropAction(Qt.MoveAction)
+
+    def dropEvent(self, event) -> None:  # noqa: N802
+        if event.source() is not self:
+            event.ignore()
+            return
+        index = self.indexAt(event.position().toPoint())
+        model = self.model()
+        if not index.isValid() or self.dropIndicatorPosition() == QAbstractItemView.OnViewport:
+            row = model.rowCount() if model is not None else 0
+        else:
+            row = index.row()
+            if self.dropIndicatorPosition() == QAbstractItemView.BelowItem:
+                row += 1
+        # Report a copy so the drag source does not remove the "moved" rows afterwards.
+        event.setDropAction(Qt.CopyAction)
+        event.accept()
+        self.stopAutoScroll()
+        self.setState(QAbstractItemView.NoState)
+        self.viewport().update()
+        self.rows_dropped.emit(row)
+
+
 class TemplateDetailsDialog(QDialog):
     def __init__(
         self,
@@ -1699,3 +2579,823 @@ class FeatureTypesDialog(QDialog):
         buttons.rejected.connect(self.reject)
         buttons.accepted.connect(self.accept)
         layout.addWidget(buttons)
+
+
+class EntryPaletteDialog(QDialog):
+    """Quick jump to any entry using the same query syntax as the filter box."""
+
+    MAX_RESULTS = 200
+
+    def __init__(self, document: AbilityDocument, parent: Optional[QWidget] = None) -> None:
+        super().__init__(parent)
+        self.setWindowTitle("Go to entry")
+        self.resize(640, 420)
+        self._document = document
+        self.selected_entry: Optional[AbilityEntry] = None
+
+        layout = QVBoxLayout(self)
+        self.query_edit = QLineEdit()
+        self.query_edit.setPlaceholderText("Search headers and bodies (type:SA id:12 scope:Ability block:Patch)")
+        self.query_edit.textChanged.connect(self._update_results)
+        self.query_edit.returnPressed.connect(self._accept_current)
+        layout.addWidget(self.query_edit)
+
+        self.result_list = QListWidget()
+        self.result_list.itemActivated.connect(lambda _item: self._accept_current())
+        layout.addWidget(self.result_list)
+
+        self.status_label = QLabel()
+        layout.addWidget(self.status_label)
+
+        self._update_results("")
+
+    def keyPressEvent(self, event) -> None:  # noqa: N802
+        if event.key() in (Qt.Key_Up, Qt.Key_Down) and self.result_list.count():
+            step = -1 if event.key() == Qt.Key_Up else 1
+            row = max(0, min(self.result_list.currentRow() + step, self.result_list.count() - 1))
+            self.result_list.setCurrentRow(row)
+            return
+        super().keyPressEvent(event)
+
+    def _update_results(self, text: str) -> None:
+        started = time.perf_counter()
+        matches = self._document.search(text)
+        terms = [term for term in text.lower().split() if ":" not in term]
+        if terms:
+            # Entries whose header mentions every word come first.
+            matches.sort(key=lambda entry: not all(term in entry.header.lower() for term in terms))
+        elapsed = (time.perf_counter() - started) * 1000
+
+        self.result_list.clear()
+        for entry in matches[: self.MAX_RESULTS]:
+            item = QListWidgetItem(entry.header)
+            item.setData(Qt.UserRole, entry)
+            self.result_list.addItem(item)
+        if self.result_list.count():
+            self.result_list.setCurrentRow(0)
+        shown = min(len(matches), self.MAX_RESULTS)
+        self.status_label.setText(f"{len(matches)} matches ({elapsed:.0f} ms), showing {shown}")
+
+    def _accept_current(self) -> None:
+        item = self.result_list.currentItem()
+        if item is None:
+            return
+        self.selected_entry = item.data(Qt.UserRole)
+        self.accept()
+
+
+class UsagesDialog(QDialog):
+    """Entries that mention an ID, status, scope, keyword, block or constant."""
+
+    MAX_RESULTS = 5000
+
+    def __init__(self, document: AbilityDocument, word: str = "", parent: Optional[QWidget] = None) -> None:
+        super().__init__(parent)
+        self.setWindowTitle("Find usages")
+        self.resize(820, 480)
+        self._document = document
+        self._index = document.reference_index()
+        self.selected_entry: Optional[AbilityEntry] = None
+
+        layout = QVBoxLayout(self)
+        query_row = QHBoxLayout()
+        self.kind_combo = QComboBox()
+        for kind in references.REFERENCE_KINDS:
+            self.kind_combo.addItem(references.KIND_LABELS[kind], kind)
+        self.kind_combo.currentIndexChanged.connect(self._on_kind_changed)
+        query_row.addWidget(self.kind_combo)
+        self.name_combo = QComboBox()
+        self.name_combo.setEditable(True)
+        self.name_combo.setInsertPolicy(QComboBox.NoInsert)
+        self.name_combo.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
+        self.name_combo.lineEdit().setPlaceholderText("AbilityId 44, SA 12, Trance, StatusInit, AsTarget …")
+        self.name_combo.editTextChanged.connect(self._update_results)
+        self.name_combo.lineEdit().returnPressed.connect(self._accept_current)
+        query_row.addWidget(self.name_combo, 1)
+        layout.addLayout(query_row)
+
+        self.result_list = QListWidget()
+        self.result_list.itemActivated.connect(lambda _item: self._accept_current())
+        layout.addWidget(self.result_list)
+
+        self.status_label = QLabel()
+        layout.addWidget(self.status_label)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Close)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+
+        kind, name = self._guess(word)
+        self.kind_combo.blockSignals(True)
+        self.kind_combo.setCurrentIndex(references.REFERENCE_KINDS.index(kind))
+        self.kind_combo.blockSignals(False)
+        self._fill_names()
+        self.name_combo.setEditText(name)
+        self._update_results(name)
+        self.name_combo.setFocus()
+
+    def _guess(self, word: str) -> Tuple[str, str]:
+        """Kind and name to start with for the word under the editor cursor."""
+        for candidate in (word, word.split("_", 1)[-1]):
+            kinds = self._index.kinds_of(candidate) if candidate else []
+            if kinds:
+                return kinds[0], candidate
+        return "id", word if word.isdigit() else ""
+
+    @property
+    def _kind(self) -> str:
+        return self.kind_combo.currentData()
+
+    def _fill_names(self) -> None:
+        names = [name for name, _count in self._index.names(self._kind)]
+        self.name_combo.blockSignals(True)
+        self.name_combo.clear()
+        self.name_combo.addItems(names)
+        self.name_combo.blockSignals(False)
+        completer = QCompleter(names, self.name_combo)
+        completer.setCaseSensitivity(Qt.CaseInsensitive)
+        completer.setFilterMode(Qt.MatchContains)
+        self.name_combo.setCompleter(completer)
+
+    def _on_kind_changed(self, _index: int) -> None:
+        text = self.name_combo.currentText()
+        self._fill_names()
+        self.name_combo.setEditText(text)
+        self._update_results(text)
+
+    def _matching_names(self, text: str) -> List[str]:
+        text = text.strip()
+        if not text:
+            return []
+        if self._kind == "id" and text.isdigit():
+            # A bare number matches that ID under every name (AbilityId 44, SA 44 …).
+            return [name for name, _count in self._index.names("id") if name.rsplit(" ", 1)[-1] == str(int(text))]
+        return [text]
+
+    def _update_results(self, text: str) -> None:
+        started = time.perf_counter()
+        kind = self._kind
+        names = self._matching_names(text)
+        hits: Dict[int, Tuple[AbilityEntry, str]] = {}
+        for name in names:
+            for entry in self._document.usages(kind, name):
+                if id(entry) not in hits:
+                    hits[id(entry)] = (entry, name)
+        matches = list(hits.values())
+        if len(names) > 1:
+            matches.sort(key=lambda hit: self._document.index_of(hit[0]))
+        elapsed = (time.perf_counter() - started) * 1000
+
+        self.result_list.clear()
+        for entry, name in matches[: self.MAX_RESULTS]:
+            reference = self._index.reference_in(entry, kind, name)
+            line = entry.body_lines[reference.line].strip() if reference.line < len(entry.body_lines) else ""
+            item = QListWidgetItem(f"{entry.header.strip()}    line {reference.line + 2}: {line}")
+            item.setToolTip(entry.rendered())
+            item.setData(Qt.UserRole, entry)
+            self.result_list.addItem(item)
+        if self.result_list.count():
+            self.result_list.setCurrentRow(0)
+        shown = min(len(matches), self.MAX_RESULTS)
+        if not names:
+            self.status_label.setText(f"Type or pick a name ({references.KIND_LABELS[kind]}).")
+        else:
+            self.status_label.setText(
+                f"{len(matches)} entries ({elapsed:.0f} ms), showing {shown}. Double-click to open the entry."
+            )
+
+    def _accept_current(self) -> None:
+        item = self.result_list.currentItem()
+        if item is None:
+            return
+        self.selected_entry = item.data(Qt.UserRole)
+        self.accept()
+
+
+class ValidationReportDialog(QDialog):
+    """Lists formula problems; activating one jumps to the entry."""
+
+    def __init__(
+        self,
+        document: AbilityDocument,
+        diagnostics: List[ncalc.Diagnostic],
+        parent: Optional[QWidget] = None,
+    ) -> None:
+        super().__init__(parent)
+        self.setWindowTitle("Formula problems")
+        self.resize(820, 480)
+        self.selected_entry: Optional[AbilityEntry] = None
+
+        layout = QVBoxLayout(self)
+        counts = ncalc.summarize(diagnostics)
+        layout.addWidget(
+            QLabel(f"{counts[ncalc.ERROR]} errors, {counts[ncalc.WARNING]} warnings. Double-click to open the entry.")
+        )
+        self.result_list = QListWidget()
+        for diagnostic in diagnostics:
+            item = QListWidgetItem(ncalc.format_diagnostic(diagnostic))
+            if 0 <= diagnostic.entry_index < len(document.entries):
+                item.setData(Qt.UserRole, document.entries[diagnostic.entry_index])
+            self.result_list.addItem(item)
+        self.result_list.itemActivated.connect(self._open_item)
+        layout.addWidget(self.result_list)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Close)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+
+    def _open_item(self, item: QListWidgetItem) -> None:
+        entry = item.data(Qt.UserRole)
+        if entry is None:
+            return
+        self.selected_entry = entry
+        self.accept()
+
+
+class MergeDialog(QDialog):
+    """Pick mod files in priority order, merge them and review the conflicts."""
+
+    MAX_LISTED = 5000
+
+    def __init__(self, parent: Optional[QWidget] = None) -> None:
+        super().__init__(parent)
+        self.setWindowTitle("Merge mod files")
+        self.resize(980, 680)
+        self.merge_result: Optional[merge.MergeResult] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._future: Optional[Future] = None
+        self._progress = (0, 0)
+        self._poll_timer = QTimer(self)
+        self._poll_timer.setInterval(100)
+        self._poll_timer.timeout.connect(self._poll_merge)
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel("Files lower in the list override the ones above them."))
+        files_row = QHBoxLayout()
+        self.file_list = QListWidget()
+        self.file_list.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.file_list.setMaximumHeight(160)
+        files_row.addWidget(self.file_list, 1)
+        file_buttons = QVBoxLayout()
+        for label, slot in (
+            ("Add files…", self._add_files),
+            ("Remove", self._remove_files),
+            ("Move up", partial(self._move_file, -1)),
+            ("Move down", partial(self._move_file, 1)),
+        ):
+            button = QPushButton(label)
+            button.clicked.connect(slot)
+            file_buttons.addWidget(button)
+        file_buttons.addStretch(1)
+        self.merge_button = QPushButton("Merge")
+        self.merge_button.setDefault(True)
+        self.merge_button.clicked.connect(self._start_merge)
+        file_buttons.addWidget(self.merge_button)
+        files_row.addLayout(file_buttons)
+        layout.addLayout(files_row)
+
+        self.summary_label = QLabel("Add two or more AbilityFeatures files.")
+        self.summary_label.setWordWrap(True)
+        layout.addWidget(self.summary_label)
+        self.identical_check = QCheckBox("Show identical overlaps")
+        self.identical_check.toggled.connect(self._populate_conflicts)
+        layout.addWidget(self.identical_check)
+
+        splitter = QSplitter(orientation=Qt.Horizontal)
+        self.conflict_list = QListWidget()
+        self.conflict_list.currentItemChanged.connect(self._show_conflict)
+        splitter.addWidget(self.conflict_list)
+        self.detail_view = QPlainTextEdit()
+        self.detail_view.setReadOnly(True)
+        self.detail_view.setLineWrapMode(QPlainTextEdit.NoWrap)
+        self.detail_view.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+        splitter.addWidget(self.detail_view)
+        splitter.setStretchFactor(1, 1)
+        layout.addWidget(splitter, 1)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Close)
+        self.report_button = buttons.addButton("Save report…", QDialogButtonBox.ActionRole)
+        self.report_button.clicked.connect(self._save_report)
+        self.open_button = buttons.addButton("Open merged document", QDialogButtonBox.AcceptRole)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+        self._update_buttons()
+
+    def _paths(self) -> List[Path]:
+        return [Path(self.file_list.item(row).data(Qt.UserRole)) for row in range(self.file_list.count())]
+
+    def _add_files(self) -> None:
+        paths, _ = QFileDialog.getOpenFileNames(
+            self,
+            "Add AbilityFeatures files",
+            str(Path.cwd()),
+            "AbilityFeatures (*.txt);;All files (*)",
+        )
+        known = set(self._paths())
+        for path in map(Path, paths):
+            if path not in known:
+                item = QListWidgetItem(str(path))
+                item.setData(Qt.UserRole, str(path))
+                self.file_list.addItem(item)
+        self._update_buttons()
+
+    def _remove_files(self) -> None:
+        for item in self.file_list.selectedItems():
+            self.file_list.takeItem(self.file_list.row(item))
+        self._update_buttons()
+
+    def _move_file(self, delta: int) -> None:
+        row = self.file_list.currentRow()
+        target = row + delta
+        if row < 0 or not 0 <= target < self.file_list.count():
+            return
+        item = self.file_list.takeItem(row)
+        self.file_list.insertItem(target, item)
+        self.file_list.setCurrentRow(target)
+
+    def _update_buttons(self) -> None:
+        running = self._future is not None
+        self.merge_button.setEnabled(not running and self.file_list.count() >= 2)
+        self.report_button.setEnabled(not running and self.merge_result is not None)
+        self.open_button.setEnabled(not running and self.merge_result is not None)
+
+    def _start_merge(self) -> None:
+        paths = self._paths()
+        if len(paths) < 2 or self._future is not None:
+            return
+        self.merge_result = None
+        self._progress = (0, len(paths))
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._future = self._executor.submit(self._run_merge, paths)
+        self.summary_label.setText(f"Loading {len(paths)} files…")
+        self._update_buttons()
+        self._poll_timer.start()
+
+    def _run_merge(self, paths: List[Path]) -> merge.MergeResult:
+        sources = merge.load_sources(paths, progress=self._on_progress)
+        return merge.merge_documents(sources)
+
+    def _on_progress(self, done: int, total: int) -> None:
+        # Called from the worker thread; the poll timer picks it up.
+        self._progress = (done, total)
+
+    def _poll_merge(self) -> None:
+        future = self._future
+        if future is None:
+            self._poll_timer.stop()
+            return
+        if not future.done():
+            done, total = self._progress
+            self.summary_label.setText(f"Loaded {done} of {total} files…")
+            return
+        self._poll_timer.stop()
+        self._future = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        try:
+            result = future.result()
+        except merge.MergeError as exc:
+            self.summary_label.setText("Merge failed.")
+            self._update_buttons()
+            QMessageBox.critical(self, "Merge failed", f"{exc}")
+            return
+        self.merge_result = result
+        self.summary_label.setText(f"{result.summary()} (merged in {result.elapsed * 1000:.0f} ms).")
+        self._populate_conflicts()
+        self._update_buttons()
+
+    def _populate_conflicts(self) -> None:
+        self.conflict_list.clear()
+        self.detail_view.clear()
+        result = self.merge_result
+        if result is None:
+            return
+        show_identical = self.identical_check.isChecked()
+        conflicts = [conflict for conflict in result.conflicts if show_identical or not conflict.identical]
+        for conflict in conflicts[: self.MAX_LISTED]:
+            marker = "=" if conflict.identical else "!"
+            winner = result.sources[conflict.winner].name
+            item = QListWidgetItem(f"{marker} {conflict.label} → {winner}")
+            item.setData(Qt.UserRole, conflict)
+            self.conflict_list.addItem(item)
+        if len(conflicts) > self.MAX_LISTED:
+            more = QListWidgetItem(f"… {len(conflicts) - self.MAX_LISTED} more")
+            more.setFlags(Qt.NoItemFlags)
+            self.conflict_list.addItem(more)
+        if self.conflict_list.count():
+            self.conflict_list.setCurrentRow(0)
+
+    def _show_conflict(self, current: Optional[QListWidgetItem], previous: Optional[QListWidgetItem]) -> None:
+        conflict = current.data(Qt.UserRole) if current is not None else None
+        if conflict is None or self.merge_result is None:
+            self.detail_view.clear()
+            return
+        sections: List[str] = []
+        for source_index, entries in conflict.definitions:
+            name = self.merge_result.sources[source_index].name
+            state = "wins" if source_index == conflict.winner else "overridden"
+            body = "\n\n".join(entry.rendered() for entry in entries)
+            sections.append(f"## {name} ({state})\n{body}")
+        self.detail_view.setPlainText("\n\n".join(sections))
+
+    def _save_report(self) -> None:
+        if self.merge_result is None:
+            return
+        path, _ = QFileDialog.getSaveFileName(
+            self,
+            "Save merge report",
+            str(Path.cwd() / "merge-report.txt"),
+            "Text files (*.txt);;All files (*)",
+        )
+        if not path:
+            return
+        try:
+            Path(path).write_text(self.merge_result.report(), encoding="utf-8")
+        except OSError as exc:
+            QMessageBox.critical(self, "Failed to save", f"{exc}")
+
+    def reject(self) -> None:
+        if self._future is not None:
+            # Let the worker finish in the background; its result is dropped.
+            self._poll_timer.stop()
+            self._future = None
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+        super().reject()
+
+
+class OverlayDialog(QDialog):
+    """Which mod layer's entries take effect for each SA/AA ID.
+
+    Layer files are watched: when one changes on disk it is reloaded on a
+    worker thread and only the IDs whose entries changed are re-resolved.
+    """
+
+    MAX_LISTED = 5000
+    RELOAD_DELAY_MS = 300
+
+    def __init__(self, parent: Optional[QWidget] = None) -> None:
+        super().__init__(parent)
+        self.setWindowTitle("Effective features across mods")
+        self.resize(980, 680)
+        self.overlay = overlay.Overlay()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._future: Optional[Future] = None
+        self._reload_pending = False
+        self._rows: Dict[overlay.IdKey, int] = {}
+        self._poll_timer = QTimer(self)
+        self._poll_timer.setInterval(100)
+        self._poll_timer.timeout.connect(self._poll_job)
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.fileChanged.connect(self._on_file_changed)
+        self._reload_timer = QTimer(self)
+        self._reload_timer.setSingleShot(True)
+        self._reload_timer.setInterval(self.RELOAD_DELAY_MS)
+        self._reload_timer.timeout.connect(self._reload_stale)
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel("Layers lower in the list override the ones above them, as Memoria applies mods."))
+        files_row = QHBoxLayout()
+        self.layer_list = QListWidget()
+        self.layer_list.setMaximumHeight(160)
+        files_row.addWidget(self.layer_list, 1)
+        file_buttons = QVBoxLayout()
+        self._layer_buttons: List[QPushButton] = []
+        for label, slot in (
+            ("Add files…", self._add_files),
+            ("Remove", self._remove_layer),
+            ("Move up", partial(self._move_layer, -1)),
+            ("Move down", partial(self._move_layer, 1)),
+        ):
+            button = QPushButton(label)
+            button.clicked.connect(slot)
+            file_buttons.addWidget(button)
+            self._layer_buttons.append(button)
+        file_buttons.addStretch(1)
+        files_row.addLayout(file_buttons)
+        layout.addLayout(files_row)
+
+        self.summary_label = QLabel("Add the AbilityFeatures files of your mods, lowest priority first.")
+        self.summary_label.setWordWrap(True)
+        layout.addWidget(self.summary_label)
+        query_row = QHBoxLayout()
+        self.query_edit = QLineEdit()
+        self.query_edit.setPlaceholderText("Look up an ID, e.g. SA 37 or AA 12")
+        self.query_edit.setClearButtonEnabled(True)
+        self.query_edit.textChanged.connect(self._look_up)
+        query_row.addWidget(self.query_edit, 1)
+        self.overridden_check = QCheckBox("Only IDs defined by several layers")
+        self.overridden_check.toggled.connect(self._populate_ids)
+        query_row.addWidget(self.overridden_check)
+        layout.addLayout(query_row)
+
+        splitter = QSplitter(orientation=Qt.Horizontal)
+        self.id_list = QListWidget()
+        self.id_list.setUniformItemSizes(True)
+        self.id_list.currentItemChanged.connect(self._on_current_id)
+        splitter.addWidget(self.id_list)
+        self.detail_view = QPlainTextEdit()
+        self.detail_view.setReadOnly(True)
+        self.detail_view.setLineWrapMode(QPlainTextEdit.NoWrap)
+        self.detail_view.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+        splitter.addWidget(self.detail_view)
+        splitter.setStretchFactor(1, 1)
+        layout.addWidget(splitter, 1)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Close)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+
+    # ------------------------------------------------------------------ layers
+    def _add_files(self) -> None:
+        paths, _ = QFileDialog.getOpenFileNames(
+            self,
+            "Add AbilityFeatures files",
+            str(Path.cwd()),
+            "AbilityFeatures (*.txt);;All files (*)",
+        )
+        known = {layer.path for layer in self.overlay.layers}
+        paths = [path for path in map(Path, paths) if path not in known]
+        if paths:
+            self._start_job(f"Loading {len(paths)} files…", self._load_layers, paths)
+
+    def _load_layers(self, paths: List[Path]) -> List[Tuple[Optional[int], overlay.OverlayLayer]]:
+        return [(None, layer) for layer in overlay.layers_from_sources(merge.load_sources(paths))]
+
+    def _remove_layer(self) -> None:
+        row = self.layer_list.currentRow()
+        if row < 0 or self._future is not None:
+            return
+        layer = self.overlay.layers[row]
+        change = self.overlay.remove_layer(row)
+        if layer.path is not None:
+            self._watcher.removePath(str(layer.path))
+        self._layers_changed(change, f"Removed {layer.name}")
+
+    def _move_layer(self, delta: int) -> None:
+        row = self.layer_list.currentRow()
+        target = row + delta
+        if row < 0 or self._future is not None or not 0 <= target < len(self.overlay.layers):
+            return
+        layer = self.overlay.layers[row]
+        change = self.overlay.move_layer(row, target)
+        self._layers_changed(change, f"Moved {layer.name}")
+        self.layer_list.setCurrentRow(target)
+
+    def _on_file_changed(self, path: str) -> None:
+        # Editors often save by replacing the file, which drops it from the watcher.
+        if Path(path).exists() and path not in self._watcher.files():
+            self._watcher.addPath(path)
+        self._reload_timer.start()
+
+    def _reload_stale(self) -> None:
+        if self._future is not None:
+            self._reload_pending = True
+            return
+        stale = [(index, self.overlay.layers[index]) for index in self.overlay.stale_layers()]
+        stale = [(index, layer) for index, layer in stale if layer.path is not None and layer.path.exists()]
+        if stale:
+            names = ", ".join(layer.name for _, layer in stale)
+            self._start_job(f"Reloading {names}…", self._reload_layers, stale)
+
+    def _reload_layers(
+        self, stale: List[Tuple[int, overlay.OverlayLayer]]
+    ) -> List[Tuple[Optional[int], overlay.OverlayLayer]]:
+        return [(index, overlay.OverlayLayer.load(layer.name, layer.path)) for index, layer in stale]
+
+    # ------------------------------------------------------------------ jobs
+    def _start_job(self, message: str, function, *args) -> None:  # noqa: ANN001
+        if self._future is not None:
+            return
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1)
+        self._future = self._executor.submit(function, *args)
+        self.summary_label.setText(message)
+        for button in self._layer_buttons:
+            button.setEnabled(False)
+        self._poll_timer.start()
+
+    def _poll_job(self) -> None:
+        future = self._future
+        if future is None or not future.done():
+            return
+        self._poll_timer.stop()
+        self._future = None
+        for button in self._layer_buttons:
+            button.setEnabled(True)
+        try:
+            loaded = future.result()
+        except (merge.MergeError, OSError, UnicodeDecodeError) as exc:
+            self._update_summary()
+            QMessageBox.critical(self, "Failed to load", f"{exc}")
+            loaded = []
+        if loaded:
+            changed: Set[overlay.IdKey] = set()
+            elapsed = 0.0
+            names = []
+            for index, layer in loaded:
+                if index is None:
+                    change = self.overlay.append_layer(layer)
+                    if layer.path is not None:
+                        self._watcher.addPath(str(layer.path))
+                    verb = "Added"
+                else:
+                    change = self.overlay.replace_layer(index, layer)
+                    verb = "Reloaded"
+                changed |= change.ids
+                elapsed += change.elapsed
+                names.append(layer.name)
+            self._layers_changed(overlay.OverlayChange(changed, elapsed), f"{verb} {', '.join(names)}")
+        if self._reload_pending:
+            self._reload_pending = False
+            self._reload_stale()
+
+    # ------------------------------------------------------------------ views
+    def _layers_changed(self, change: overlay.OverlayChange, action: str) -> None:
+        layers = self.overlay.layers
+        paths = [layer.path for layer in layers]
+        if all(path is not None for path in paths):
+            for layer, name in zip(layers, merge.source_names(paths)):
+                layer.name = name
+        current = self.layer_list.currentRow()
+        self.layer_list.clear()
+        for layer in layers:
+            item = QListWidgetItem(f"{layer.name} — {layer.entry_count} entries, {len(layer.groups)} IDs")
+            item.setToolTip(str(layer.path) if layer.path is not None else layer.name)
+            self.layer_list.addItem(item)
+        if layers:
+            self.layer_list.setCurrentRow(min(max(current, 0), len(layers) - 1))
+        self._update_summary(
+            f"{action}: {len(change.ids)} IDs re-resolved in {change.elapsed * 1000:.1f} ms."
+        )
+        self._populate_ids()
+
+    def _update_summary(self, detail: str = "") -> None:
+        if not self.overlay.layers:
+            self.summary_label.setText("Add the AbilityFeatures files of your mods, lowest priority first.")
+            return
+        overridden = len(self.overlay.ids(overridden_only=True))
+        text = f"{len(self.overlay.layers)} layers, {len(self.overlay)} IDs, {overridden} defined by several layers."
+        self.summary_label.setText(f"{text} {detail}" if detail else text)
+
+    def _populate_ids(self) -> None:
+        current = self.id_list.currentItem()
+        selected = current.data(Qt.UserRole) if current is not None else None
+        self.id_list.blockSignals(True)
+        self.id_list.clear()
+        self._rows = {}
+        keys = self.overlay.ids(overridden_only=self.overridden_check.isChecked())
+        for key in keys[: self.MAX_LISTED]:
+            resolved = self.overlay.lookup(key)
+            assert resolved is not None
+            winners = sorted({feature.winner.name for feature in resolved.features})
+            marker = "!" if resolved.overridden else " "
+            item = QListWidgetItem(f"{marker} {resolved.label} → {', '.join(winners)}")
+            item.setData(Qt.UserRole, key)
+            self._rows[key] = self.id_list.count()
+            self.id_list.addItem(item)
+        if len(keys) > self.MAX_LISTED:
+            more = QListWidgetItem(f"… {len(keys) - self.MAX_LISTED} more; look them up by ID")
+            more.setFlags(Qt.NoItemFlags)
+            self.id_list.addItem(more)
+        self.id_list.blockSignals(False)
+        row = self._rows.get(selected) if selected is not None else None
+        if row is not None:
+            self.id_list.setCurrentRow(row)
+        else:
+            self._show_id(self._queried_key() or selected)
+
+    def _queried_key(self) -> Optional[overlay.IdKey]:
+        return overlay.parse_id_query(self.query_edit.text())
+
+    def _look_up(self) -> None:
+        key = self._queried_key()
+        if key is None:
+            return
+        row = self._rows.get(key)
+        if row is not None:
+            self.id_list.setCurrentRow(row)
+            self.id_list.scrollToItem(self.id_list.item(row), QAbstractItemView.PositionAtCenter)
+        self._show_id(key)
+
+    def _on_current_id(self, current: Optional[QListWidgetItem], previous: Optional[QListWidgetItem]) -> None:
+        key = current.data(Qt.UserRole) if current is not None else None
+        if key is not None:
+            self._show_id(key)
+
+    def _show_id(self, key: Optional[overlay.IdKey]) -> None:
+        if key is None:
+            self.detail_view.clear()
+            return
+        resolved = self.overlay.lookup(key)
+        if resolved is None:
+            self.detail_view.setPlainText(f"No layer defines {overlay.format_id(key)}.")
+            return
+        sections: List[str] = []
+        for feature in resolved.features:
+            state = "identical in every layer" if feature.overridden and feature.identical else (
+                f"{len(feature.definitions)} layers" if feature.overridden else "one layer"
+            )
+            sections.append(f"# {feature.label} — {feature.winner.name} wins ({state})")
+            for layer, entries in reversed(feature.definitions):
+                role = "wins" if layer is feature.winner else "overridden"
+                body = "\n\n".join(entry.rendered() for entry in entries)
+                sections.append(f"## {layer.name} ({role})\n{body}")
+        self.detail_view.setPlainText("\n\n".join(sections))
+
+
+class DocumentDiffDialog(QDialog):
+    """Entry-level differences between two documents; activating one jumps to the entry."""
+
+    MAX_LISTED = 5000
+    _SYMBOLS = {
+        document_diff.ADDED: "+",
+        document_diff.REMOVED: "−",
+        document_diff.MODIFIED: "~",
+        document_diff.MOVED: "↕",
+    }
+
+    def __init__(
+        self,
+        diff: document_diff.DocumentDiff,
+        before_label: str,
+        after_label: str,
+        parent: Optional[QWidget] = None,
+    ) -> None:
+        super().__init__(parent)
+        self.setWindowTitle(f"Compare: {before_label} → {after_label}")
+        self.resize(980, 640)
+        self.selected_entry: Optional[AbilityEntry] = None
+        self._diff = diff
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel(f"{diff.summary()} (compared in {diff.elapsed * 1000:.0f} ms)."))
+
+        self.kind_combo = QComboBox()
+        self.kind_combo.addItem("All changes", None)
+        for kind in document_diff.CHANGE_KINDS:
+            self.kind_combo.addItem(kind.capitalize(), kind)
+        self.kind_combo.currentIndexChanged.connect(self._populate)
+        layout.addWidget(self.kind_combo)
+
+        splitter = QSplitter(orientation=Qt.Horizontal)
+        self.change_list = QListWidget()
+        self.change_list.currentItemChanged.connect(self._show_change)
+        self.change_list.itemActivated.connect(self._open_item)
+        splitter.addWidget(self.change_list)
+        self.diff_view = QPlainTextEdit()
+        self.diff_view.setReadOnly(True)
+        self.diff_view.setLineWrapMode(QPlainTextEdit.NoWrap)
+        self.diff_view.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+        splitter.addWidget(self.diff_view)
+        splitter.setStretchFactor(1, 1)
+        layout.addWidget(splitter, 1)
+
+        hint = QLabel("Double-click a change to open the entry in the current document.")
+        layout.addWidget(hint)
+        buttons = QDialogButtonBox(QDialogButtonBox.Close)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+        self._populate()
+
+    def _populate(self) -> None:
+        kind = self.kind_combo.currentData()
+        changes = [change for change in self._diff.changes if kind is None or change.kind == kind]
+        self.change_list.clear()
+        for change in changes[: self.MAX_LISTED]:
+            item = QListWidgetItem(f"{self._SYMBOLS[change.kind]} {change.header}")
+            item.setToolTip(change.describe())
+            item.setData(Qt.UserRole, change)
+            self.change_list.addItem(item)
+        if len(changes) > self.MAX_LISTED:
+            more = QListWidgetItem(f"… {len(changes) - self.MAX_LISTED} more")
+            more.setFlags(Qt.NoItemFlags)
+            self.change_list.addItem(more)
+        if self.change_list.count():
+            self.change_list.setCurrentRow(0)
+        else:
+            self.diff_view.clear()
+
+    def _show_change(self, current: Optional[QListWidgetItem], previous: Optional[QListWidgetItem]) -> None:
+        change = current.data(Qt.UserRole) if current is not None else None
+        if change is None:
+            self.diff_view.clear()
+            return
+        lines: List[str] = []
+        if change.old_index is not None and change.new_index is not None and change.moved:
+            lines.append(f"Moved from entry #{change.old_index + 1} to #{change.new_index + 1}.")
+        if change.kind == document_diff.MOVED:
+            lines.append("Content unchanged.")
+        else:
+            lines.extend(change.line_diff())
+        self.diff_view.setPlainText("\n".join(lines))
+
+    def _open_item(self, item: QListWidgetItem) -> None:
+        change = item.data(Qt.UserRole)
+        if change is None or change.new is None:
+            return
+        self.selected_entry = change.new
+        self.accept()
@@ -0,0 +1,281 @@
+"""Merge the AbilityFeatures files of several mods into one document.
+
+Entries are joined on ``(type, ability ID, scopes)``: two mods that both
+define ``>SA 12`` for the ``Ability`` scope collide, while a ``StatusInit``
+entry for the same SA does not. Global entries (``>SA Global+ …``) carry no
+ID and are additive in Memoria, so they are also told apart by their header.
+
+Sources are given in priority order, lowest first: a later mod overrides the
+entries of the mods before it, as if each one were applied on top of the
+previous ones. Merging is a single hash-join pass over all entries; files are
+loaded concurrently with :func:`load_sources`. Nothing here imports Qt.
+"""
+
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import os
+import time
+
+from .models import AbilityDocument, AbilityEntry, gc_paused, parse_header
+from .storage import SaveResult, save_atomic
+
+
+# (type_key, ability_id, scope keywords, header for ID-less entries)
+MergeKey = Tuple[Optional[str], Optional[int], Tuple[str, ...], Optional[str]]
+
+# Picklable form of a loaded source, for process pools: (newline, preamble,
+# [(header, body_lines)], keys). Loaded documents keep memoryviews into their
+# file buffer and cannot cross a process boundary themselves.
+SourceParts = Tuple[str, List[str], List[Tuple[str, List[str]]], List[MergeKey]]
+
+MAX_LOAD_WORKERS = 8
+
+
+class MergeError(Exception):
+    """Raised when one of the files to merge cannot be read."""
+
+
+def merge_key(entry: AbilityEntry) -> MergeKey:
+    key = parse_header(entry.header)
+    if key is None:
+        return None, None, (), entry.header.strip()
+    type_key, ability_id = key
+    scopes = tuple(sorted(entry.parsed().scope_keywords))
+    return type_key, ability_id, scopes, entry.header.strip() if ability_id is None else None
+
+
+def format_key(key: MergeKey) -> str:
+    type_key, ability_id, scopes, header = key
+    if type_key is None or header is not None:
+        label = header or ""
+    else:
+        label = f"{type_key} {ability_id}"
+    return f"{label} [{', '.join(scopes)}]" if scopes else label
+
+
+@dataclass
+class MergeSource:
+    """One input document; ``name`` identifies it in the conflict report."""
+
+    name: str
+    document: AbilityDocument
+    path: Optional[Path] = None
+    _keys: Optional[List[MergeKey]] = field(default=None, init=False, repr=False, compare=False)
+
+    def keys(self) -> List[MergeKey]:
+        """Merge key of every entry, in document order (computed once)."""
+        if self._keys is None or len(self._keys) != len(self.document.entries):
+            self._keys = [merge_key(entry) for entry in self.document.entries]
+        return self._keys
+
+
+@dataclass
+class MergeConflict:
+    """A key defined by several sources; ``definitions`` is in priority order."""
+
+    key: MergeKey
+    definitions: List[Tuple[int, List[AbilityEntry]]]
+    identical: bool
+
+    @property
+    def winner(self) -> int:
+        return self.definitions[-1][0]
+
+    @property
+    def label(self) -> str:
+        return format_key(self.key)
+
+
+@dataclass
+class MergeResult:
+    document: AbilityDocument
+    sources: List[MergeSource]
+    conflicts: List[MergeConflict] = field(default_factory=list)
+    entries_read: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def differing(self) -> List[MergeConflict]:
+        """Conflicts where the overridden definitions differ from the winner."""
+        return [conflict for conflict in self.conflicts if not conflict.identical]
+
+    def summary(self) -> str:
+        differing = len(self.differing)
+        return (
+            f"Merged {self.entries_read} entries from {len(self.sources)} files into "
+            f"{len(self.document.entries)}: {differing} conflicts, "
+            f"{len(self.conflicts) - differing} identical overlaps"
+        )
+
+    def report(self) -> str:
+        """Plain-text conflict report: one block per overlapping key."""
+        lines = [self.summary() + ".", "", "Priority (lowest first):"]
+        lines.extend(f"  {index + 1}. {source.name}" for index, source in enumerate(self.sources))
+        for conflict in self.conflicts:
+            state = "identical" if conflict.identical else "conflict"
+            lines.append("")
+            lines.append(f"{conflict.label} ({state})")
+            for source_index, entries in conflict.definitions:
+                marker = "*" if source_index == conflict.winner else " "
+                headers = "; ".join(entry.header.strip() for entry in entries)
+                lines.append(f"  {marker} {self.sources[source_index].name}: {headers}")
+        return "\n".join(lines) + "\n"
+
+
+def merge_documents(sources: Sequence[MergeSource]) -> MergeResult:
+    """Join *sources* on their merge keys; the last source defining a key wins.
+
+    Keys keep the position of their first appearance (in the first source that
+    defines them), and the winner's entries replace every other definition.
+    Entries are shared with the sources rather than copied whenever their
+    line endings match the merged document.
+    """
+    started = time.perf_counter()
+    with gc_paused():
+        definitions: Dict[MergeKey, List[Tuple[int, List[AbilityEntry]]]] = {}
+        entries_read = 0
+        for source_index, source in enumerate(sources):
+            grouped: Dict[MergeKey, List[AbilityEntry]] = {}
+            for key, entry in zip(source.keys(), source.document.entries):
+                grouped.setdefault(key, []).append(entry)
+            entries_read += len(source.document.entries)
+            for key, entries in grouped.items():
+                definitions.setdefault(key, []).append((source_index, entries))
+
+        newline = sources[0].document.newline if sources else "\n"
+        preamble = next((list(source.document.preamble) for source in sources if source.document.preamble), [])
+        merged: List[AbilityEntry] = []
+        conflicts: List[MergeConflict] = []
+        for key, defined in definitions.items():
+            winner_index, winner = defined[-1]
+            if len(defined) > 1:
+                expected = [entry.rendered() for entry in winner]
+                identical = all([entry.rendered() for entry in entries] == expected for _, entries in defined[:-1])
+                conflicts.append(MergeConflict(key, defined, identical))
+            if sources[winner_index].document.newline == newline:
+                merged.extend(winner)
+            else:
+                merged.extend(AbilityEntry(entry.header, list(entry.body_lines)) for entry in winner)
+        document = AbilityDocument(entries=merged, preamble=preamble, newline=newline)
+
+    return MergeResult(
+        document=document,
+        sources=list(sources),
+        conflicts=conflicts,
+        entries_read=entries_read,
+        elapsed=time.perf_counter() - started,
+    )
+
+
+def source_names(paths: Sequence[Path]) -> List[str]:
+    """Short labels for *paths*: the file name, or the path below their common folder."""
+    names = [path.name for path in paths]
+    if len(set(names)) == len(names):
+        return names
+    try:
+        common = Path(os.path.commonpath([str(path.resolve()) for path in paths]))
+    except ValueError:
+        return [str(path) for path in paths]
+    names = [str(path.resolve().relative_to(common)) for path in paths]
+    return names if len(set(names)) == len(names) else [str(path) for path in paths]
+
+
+def load_sources(
+    paths: Sequence[Path],
+    *,
+    max_workers: Optional[int] = None,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> List[MergeSource]:
+    """Load *paths* concurrently and compute their merge keys.
+
+    ``progress`` receives ``(files_done, total)`` from the calling thread.
+    Raises :class:`MergeError` naming the first file that failed.
+    """
+    paths = [Path(path) for path in paths]
+    names = source_names(paths)
+    workers = max_workers or min(MAX_LOAD_WORKERS, len(paths)) or 1
+    sources: List[MergeSource] = []
+    with gc_paused(), ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_load_source, name, path) for name, path in zip(names, paths)]
+        for done, (path, future) in enumerate(zip(paths, futures), start=1):
+            try:
+                sources.append(future.result())
+            except (OSError, UnicodeDecodeError) as exc:
+                for pending in futures:
+                    pending.cancel()
+                raise MergeError(f"{path}: {exc}") from exc
+            if progress is not None:
+                progress(done, len(paths))
+    return sources
+
+
+def _load_source(name: str, path: Path) -> MergeSource:
+    source = MergeSource(name, AbilityDocument.load(path), path)
+    source.keys()
+    return source
+
+
+def read_source_parts(path: str) -> SourceParts:
+    """Load *path* and reduce it to plain tuples (runs in worker processes)."""
+    document = AbilityDocument.load(Path(path))
+    entries = list(document.entries)
+    return (
+        document.newline,
+        list(document.preamble),
+        [(entry.header, entry.body_lines) for entry in entries],
+        [merge_key(entry) for entry in entries],
+    )
+
+
+def source_from_parts(name: str, path: Optional[Path], parts: SourceParts) -> MergeSource:
+    newline, preamble, entries, keys = parts
+    document = AbilityDocument(
+        entries=[AbilityEntry(header, body_lines) for header, body_lines in entries],
+        preamble=preamble,
+        newline=newline,
+    )
+    source = MergeSource(name, document, path)
+    source._keys = keys
+    return source
+
+
+def merge_files(
+    paths: Sequence[Path],
+    output: Optional[Path] = None,
+    *,
+    max_workers: Optional[int] = None,
+    processes: int = 0,
+) -> Tuple[MergeResult, Optional[SaveResult]]:
+    """Headless merge: load *paths*, merge them and optionally write *output*.
+
+    With ``processes`` above one the files are parsed in that many worker
+    processes (as the command line does); otherwise on threads. Raises
+    :class:`MergeError` naming the first file that failed.
+    """
+    paths = [Path(path) for path in paths]
+    if processes > 1 and len(paths) > 1:
+        sources = _load_sources_in_processes(paths, processes)
+    else:
+        sources = load_sources(paths, max_workers=max_workers)
+    result = merge_documents(sources)
+    saved = save_atomic(output, result.document.iter_bytes(), force=True) if output is not None else None
+    return result, saved
+
+
+def _load_sources_in_processes(paths: List[Path], processes: int) -> List[MergeSource]:
+    sources: List[MergeSource] = []
+    with ProcessPoolExecutor(max_workers=min(processes, len(paths))) as pool:
+        futures = [pool.submit(read_source_parts, str(path)) for path in paths]
+        for name, path, future in zip(source_names(paths), paths, futures):
+            try:
+                parts = future.result()
+            except (OSError, UnicodeDecodeError) as exc:
+                for pending in futures:
+                    pending.cancel()
+                raise MergeError(f"{path}: {exc}") from exc
+            sources.append(source_from_parts(name, path, parts))
+    return sources
@@ -2,9 +2,97 @@
 
 from __future__ import annotations
 
+from bisect import bisect_left, insort
+from contextlib import contextmanager
+from itertools import count, islice
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Iterable, List, Optional
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Collection,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
+import gc
+import os
+import re
+
+from .entry_parser import ParsedBody, parse_body
+from .persistent import ChunkedList, PersistentVector
+from .storage import FileFingerprint, new_hasher
+
+if TYPE_CHECKING:
+    from .references import ReferenceIndex
+    from .search_index import SearchIndex, SearchQuery
+
+
+READ_CHUNK_SIZE = 1 << 20
+
+ProgressCallback = Callable[[int, int], None]
+EntryKey = Tuple[str, Optional[int]]
+
+# Document versions are unique across documents and restores, so a version
+# recorded at save time identifies that exact state later on.
+_VERSIONS = count(1)
+
+
+@contextmanager
+def gc_paused() -> Iterator[None]:
+    """Suspend cyclic garbage collection while building many long-lived objects.
+
+    Loading, merging and indexing allocate millions of objects that stay alive;
+    collector passes over them find nothing to free and can cost more than the
+    work itself.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+_TYPE_PATTERNS = [
+    (re.compile(r"SA\s+GLOBALENEMY\+", re.IGNORECASE), "SA_GLOBAL_ENEMY"),
+    (re.compile(r"SA\s+GLOBALLAST\+", re.IGNORECASE), "SA_GLOBAL_LAST"),
+    (re.compile(r"SA\s+GLOBAL\+", re.IGNORECASE), "SA_GLOBAL"),
+    (re.compile(r"SA\b", re.IGNORECASE), "SA"),
+    (re.compile(r"AA\s+GLOBAL\+", re.IGNORECASE), "AA_GLOBAL"),
+    (re.compile(r"AA\b", re.IGNORECASE), "AA"),
+]
+_HEADER_ID_PATTERN = re.compile(r"\s*(\d+)\b")
+
+
+def parse_header(header: str) -> Optional[EntryKey]:
+    """Return ``(type_key, ability_id)`` for an entry header such as ``>SA 12 ...``.
+
+    Global headers (``>SA Global+``) usually carry no ID, in which case the ID is
+    ``None``. Headers without a recognised ability type return ``None``.
+    """
+    stripped = header.strip()
+    if not stripped.startswith(">"):
+        return None
+    text = stripped[1:].lstrip()
+    for pattern, type_key in _TYPE_PATTERNS:
+        match = pattern.match(text)
+        if match:
+            id_match = _HEADER_ID_PATTERN.match(text, match.end())
+            return type_key, int(id_match.group(1)) if id_match else None
+    return None
+
+
+def detect_entry_type(header: str) -> Optional[str]:
+    key = parse_header(header)
+    return key[0] if key else None
 
 
 @dataclass
@@ -13,10 +101,59 @@ class AbilityEntry:
 
     header: str
     body_lines: List[str] = field(default_factory=list)
+    _rendered: Optional[str] = field(default=None, init=False, repr=False, compare=False)
+    _search_text: Optional[str] = field(default=None, init=False, repr=False, compare=False)
+    _parsed: Optional[ParsedBody] = field(default=None, init=False, repr=False, compare=False)
+    _source: Optional[memoryview] = field(default=None, init=False, repr=False, compare=False)
+    _source_content: int = field(default=0, init=False, repr=False, compare=False)
+
+    def __setattr__(self, name: str, value: object) -> None:
+        object.__setattr__(self, name, value)
+        if name in ("header", "body_lines"):
+            self.invalidate()
+
+    @property
+    def is_dirty(self) -> bool:
+        """True when the cached rendered text has to be rebuilt."""
+        return self._rendered is None
+
+    @property
+    def original_bytes(self) -> Optional[memoryview]:
+        """The entry's untouched byte span from the loaded file, if it was not edited."""
+        return self._source
+
+    def invalidate(self) -> None:
+        """Drop cached renderings after editing ``body_lines`` in place."""
+        object.__setattr__(self, "_rendered", None)
+        object.__setattr__(self, "_search_text", None)
+        object.__setattr__(self, "_parsed", None)
+        object.__setattr__(self, "_source", None)
+
+    def _attach_source(self, span: memoryview, content_length: int) -> None:
+        object.__setattr__(self, "_source", span)
+        object.__setattr__(self, "_source_content", content_length)
 
     def to_text(self) -> str:
         return "\n".join([self.header, *self.body_lines])
 
+    def rendered(self) -> str:
+        """Entry text as it appears in the serialized document (trailing space stripped)."""
+        if self._rendered is None:
+            object.__setattr__(self, "_rendered", self.to_text().rstrip())
+        return self._rendered
+
+    def search_text(self) -> str:
+        """Lower-cased header and body used for substring filtering."""
+        if self._search_text is None:
+            object.__setattr__(self, "_search_text", " ".join([self.header, *self.body_lines]).lower())
+        return self._search_text
+
+    def parsed(self) -> ParsedBody:
+        """Scopes and ``[code=...]`` blocks of the body, parsed once per edit."""
+        if self._parsed is None:
+            object.__setattr__(self, "_parsed", parse_body(self.body_lines))
+        return self._parsed
+
     @classmethod
     def from_text(cls, text: str) -> "AbilityEntry":
         lines = text.splitlines()
@@ -30,45 +167,202 @@ class AbilityEntry:
 
 @dataclass
 class AbilityDocument:
-    entries: List[AbilityEntry] = field(default_factory=list)
+    """Ordered entries plus lookup indexes kept in step with every mutation.
+
+    Mutate the document through its methods (``append``, ``insert``, ``move``,
+    ``replace``, ``remove``) rather than editing ``entries`` in place so the
+    header, ``(type, ID)`` and type indexes stay valid. Entries are treated as
+    immutable once added; swap in a new entry with ``replace`` instead of editing
+    one that is already part of the document.
+
+    ``to_text`` keeps the assembled output cached and each mutation splices the
+    affected entry's rendered text into it instead of re-joining everything.
+
+    Documents loaded from disk also remember every entry's original byte span
+    (blank lines and line endings included). ``iter_bytes`` replays those spans
+    untouched and only encodes entries that were added or replaced.
+
+    ``entries`` is a :class:`ChunkedList`, so ``snapshot`` is O(1): it captures
+    the current ``version`` in a :class:`DocumentSnapshot` that shares storage
+    with the live document and can be read from other threads or handed back
+    to ``restore`` (undo/redo).
+    """
+
+    entries: ChunkedList = field(default_factory=ChunkedList)
     preamble: List[str] = field(default_factory=list)
+    newline: str = "\n"
+    fingerprint: Optional[FileFingerprint] = field(default=None, compare=False)
+    _preamble_source: Optional[memoryview] = field(default=None, init=False, repr=False, compare=False)
+    _preamble_content: int = field(default=0, init=False, repr=False, compare=False)
+    _preamble_loaded: List[str] = field(default_factory=list, init=False, repr=False, compare=False)
+    _loaded_view: Optional[memoryview] = field(default=None, init=False, repr=False, compare=False)
+    _indexed: Dict[int, Tuple[str, Optional[EntryKey]]] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
+    _by_header: Dict[str, Dict[int, AbilityEntry]] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
+    _by_key: Dict[EntryKey, Dict[int, AbilityEntry]] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
+    _by_type: Dict[str, Dict[int, AbilityEntry]] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
+    _sorted_headers: List[str] = field(default_factory=list, init=False, repr=False, compare=False)
+    _positions: Dict[int, int] = field(default_factory=dict, init=False, repr=False, compare=False)
+    _positions_valid: int = field(default=0, init=False, repr=False, compare=False)
+    _text: Optional[str] = field(default=None, init=False, repr=False, compare=False)
+    _text_preamble: List[str] = field(default_factory=list, init=False, repr=False, compare=False)
+    _offsets: List[int] = field(default_factory=list, init=False, repr=False, compare=False)
+    _search: Optional["SearchIndex"] = field(default=None, init=False, repr=False, compare=False)
+    _references: Optional["ReferenceIndex"] = field(default=None, init=False, repr=False, compare=False)
+    version: int = field(default=0, init=False, compare=False)
+
+    def __post_init__(self) -> None:
+        if not isinstance(self.entries, ChunkedList):
+            self.entries = ChunkedList(self.entries)
+        for entry in self.entries:
+            self._index_entry(entry)
+        self._touch()
 
     @classmethod
-    def load(cls, path: Path) -> "AbilityDocument":
-        text = path.read_text(encoding="utf-8")
-        lines = text.splitlines()
-        preamble: List[str] = []
-        entries: List[AbilityEntry] = []
-        current: Optional[AbilityEntry] = None
+    def load(cls, path: Path, *, progress: Optional[ProgressCallback] = None) -> "AbilityDocument":
+        document = cls()
+        for _ in document.iter_load(path, progress=progress):
+            pass
+        return document
 
-        for line in lines:
-            if line.startswith(">"):
+    def iter_load(
+        self,
+        path: Path,
+        *,
+        chunk_size: int = READ_CHUNK_SIZE,
+        progress: Optional[ProgressCallback] = None,
+    ) -> Iterator[AbilityEntry]:
+        """Stream entries from *path* into this document, yielding each one once complete.
+
+        The file is read in ``chunk_size`` pieces into a single buffer that the
+        entries keep zero-copy views of, so untouched entries can be written
+        back byte-for-byte. ``progress`` receives ``(bytes_read, total)``.
+        """
+        scanner = _SourceScanner(path, chunk_size, progress)
+        current: Optional[AbilityEntry] = None
+        span_start = 0
+        content_end = 0
+        for line_start, line_end, text in scanner:
+            if text.startswith(">"):
                 if current:
-                    entries.append(current)
-                current = AbilityEntry(header=line, body_lines=[])
+                    current._attach_source(scanner.view[span_start:line_start], content_end - span_start)
+                    self.append(current)
+                    yield current
+                else:
+                    self._attach_preamble(scanner.view[:line_start], content_end)
+                current = AbilityEntry(header=text, body_lines=[])
+                span_start = line_start
+                content_end = line_end
             else:
                 if current is None:
-                    preamble.append(line)
+                    self.preamble.append(text)
                 else:
-                    current.body_lines.append(line)
+                    current.body_lines.append(text)
+                if text.strip():
+                    content_end = line_end
+        self.newline = scanner.newline or self.newline
+        self.fingerprint = scanner.fingerprint
+        self._loaded_view = scanner.view
         if current:
-            entries.append(current)
-        return cls(entries=entries, preamble=preamble)
+            current._attach_source(scanner.view[span_start:], content_end - span_start)
+            self.append(current)
+            yield current
+        elif scanner.view is not None:
+            self._attach_preamble(scanner.view, content_end)
 
-    def to_text(self) -> str:
-        sections: List[str] = []
-        if self.preamble:
-            sections.append("\n".join(self.preamble).rstrip())
+    @property
+    def loaded_bytes(self) -> Optional[memoryview]:
+        """The whole file as read by the last ``iter_load``, if it has finished."""
+        return self._loaded_view
+
+    def set_preamble(self, lines: Sequence[str]) -> None:
+        self.preamble[:] = lines
+        self._touch()
+
+    def _attach_preamble(self, span: memoryview, content_length: int) -> None:
+        self._preamble_source = span
+        self._preamble_content = content_length
+        self._preamble_loaded = list(self.preamble)
+
+    def iter_bytes(self) -> Iterator[bytes]:
+        """Yield the encoded document, reusing the loaded bytes of untouched sections.
+
+        Unchanged entries (and the preamble) are yielded as slices of the original
+        buffer with their own blank lines and line endings; added or replaced
+        entries are rendered with the document's ``newline``. A section that ends
+        up followed by another one always keeps at least a line break before it.
+        """
+        newline = self.newline.encode("utf-8")
+        sections: List[Tuple[bytes, Optional[bytes]]] = []
+        source = self._preamble_source
+        if source is not None and len(source) and self._preamble_loaded == self.preamble:
+            sections.append((source[: self._preamble_content], source[self._preamble_content:]))
+        elif self.preamble:
+            sections.append((self._encode(self._preamble_text()), None))
         for entry in self.entries:
-            sections.append(entry.to_text().rstrip())
-        return "\n\n".join(sections)
+            source = entry._source
+            if source is not None:
+                sections.append((source[: entry._source_content], source[entry._source_content:]))
+            else:
+                sections.append((self._encode(entry.rendered()), None))
+        last = len(sections) - 1
+        for idx, (content, trailing) in enumerate(sections):
+            yield content
+            if idx == last:
+                yield newline if trailing is None else trailing
+                continue
+            if trailing is None:
+                trailing = newline + newline
+            else:
+                breaks = _count_line_breaks(trailing)
+                if not breaks:
+                    trailing = bytes(trailing) + newline + newline
+                elif breaks == 1 and sections[idx + 1][1] is None:
+                    trailing = bytes(trailing) + newline
+            yield trailing
+
+    def to_bytes(self) -> bytes:
+        return b"".join(self.iter_bytes())
+
+    def _encode(self, text: str) -> bytes:
+        if self.newline != "\n":
+            text = text.replace("\n", self.newline)
+        return text.encode("utf-8")
+
+    def to_text(self) -> str:
+        if self._text is None or self._text_preamble != self.preamble:
+            self._text_preamble = list(self.preamble)
+            self._offsets = []
+            sections: List[str] = []
+            if self.preamble:
+                sections.append(self._preamble_text())
+            sections.extend(entry.rendered() for entry in self.entries)
+            self._text = "\n\n".join(sections)
+        return self._text
 
     def append(self, entry: AbilityEntry) -> None:
         self.entries.append(entry)
+        self._touch()
+        self._index_entry(entry)
+        if self._positions_valid == len(self.entries) - 1:
+            self._positions[id(entry)] = self._positions_valid
+            self._positions_valid += 1
+        self._splice_insert(len(self.entries) - 1, entry)
 
     def insert(self, index: int, entry: AbilityEntry) -> None:
         index = max(0, min(index, len(self.entries)))
         self.entries.insert(index, entry)
+        self._touch()
+        self._index_entry(entry)
+        self._invalidate_positions(index)
+        self._splice_insert(index, entry)
 
     def move(self, old_index: int, new_index: int) -> bool:
         if not self.entries:
@@ -78,18 +372,521 @@ class AbilityDocument:
         new_index = max(0, min(new_index, len(self.entries) - 1))
         if old_index == new_index:
             return False
+        self._splice_remove(old_index)
         entry = self.entries.pop(old_index)
         self.entries.insert(new_index, entry)
+        self._touch()
+        self._invalidate_positions(min(old_index, new_index))
+        self._splice_insert(new_index, entry)
         return True
 
     def replace(self, header: str, new_entry: AbilityEntry) -> bool:
-        for idx, existing in enumerate(self.entries):
-            if existing.header == header:
-                self.entries[idx] = new_entry
-                return True
-        return False
+        existing = self.find(header)
+        if existing is None:
+            return False
+        index = self.index_of(existing)
+        if index is None:
+            return False
+        self.replace_at(index, new_entry)
+        return True
+
+    def replace_at(self, index: int, new_entry: AbilityEntry) -> AbilityEntry:
+        existing = self.entries[index]
+        if self._text is not None:
+            start = self._entry_offset(index)
+            old_length = len(existing.rendered())
+            self._splice(start, old_length, new_entry.rendered())
+            del self._offsets[index + 1:]
+        self._unindex_entry(existing)
+        self.entries[index] = new_entry
+        self._touch()
+        self._index_entry(new_entry)
+        if index < self._positions_valid:
+            self._positions[id(new_entry)] = index
+        return existing
+
+    def remove(self, index: int) -> AbilityEntry:
+        if index < 0:
+            index += len(self.entries)
+        if index < 0 or index >= len(self.entries):
+            raise IndexError("entry index out of range")
+        self._splice_remove(index)
+        entry = self.entries.pop(index)
+        self._touch()
+        self._unindex_entry(entry)
+        self._invalidate_positions(index)
+        return entry
+
+    # ------------------------------------------------------------------ batch edits
+    # Each batch edit is one pass over ``entries``; the text cache is dropped
+    # and rebuilt by the next ``to_text`` call instead of being spliced per entry.
+    def reorder(self, order: Sequence[int]) -> bool:
+        """Rearrange entries so position ``i`` holds the entry previously at ``order[i]``."""
+        count = len(self.entries)
+        if len(order) != count or len(set(order)) != count or (count and not 0 <= min(order) <= max(order) < count):
+            raise ValueError("order must be a permutation of the entry indexes")
+        if all(position == index for position, index in enumerate(order)):
+            return False
+        entries = list(self.entries)
+        self.entries[:] = [entries[index] for index in order]
+        self._reset_layout()
+        return True
+
+    def move_many(self, indexes: Iterable[int], destination: int) -> bool:
+        """Move the entries at *indexes*, keeping their order, to just before *destination*.
+
+        *destination* is an index into the current order; ``len(entries)``
+        moves them to the end.
+        """
+        count = len(self.entries)
+        selected = sorted({index for index in indexes if 0 <= index < count})
+        if not selected:
+            return False
+        chosen = set(selected)
+        destination = max(0, min(destination, count))
+        before = [index for index in range(destination) if index not in chosen]
+        after = [index for index in range(destination, count) if index not in chosen]
+        return self.reorder(before + selected + after)
+
+    def shift_many(self, indexes: Iterable[int], delta: int) -> bool:
+        """Move each entry at *indexes* one place up (``delta < 0``) or down.
+
+        Selected entries that are already packed against the start (or end)
+        stay put, the others step past their unselected neighbour.
+        """
+        count = len(self.entries)
+        chosen = {index for index in indexes if 0 <= index < count}
+        order = list(range(count))
+        if delta < 0:
+            limit = 0
+            for index in sorted(chosen):
+                if index > limit:
+                    order[index - 1], order[index] = order[index], order[index - 1]
+                else:
+                    limit = index + 1
+        else:
+            limit = count - 1
+            for index in sorted(chosen, reverse=True):
+                if index < limit:
+                    order[index + 1], order[index] = order[index], order[index + 1]
+                else:
+                    limit = index - 1
+        return self.reorder(order)
+
+    def sort_by_id(self, indexes: Optional[Iterable[int]] = None) -> bool:
+        """Sort entries by ability ID within each type (all entries, or just *indexes*).
+
+        Every type keeps the positions it already occupies, so SA and AA blocks
+        do not trade places; entries without a parsable header stay where they are.
+        """
+        entries = list(self.entries)
+        selected = range(len(entries)) if indexes is None else sorted({i for i in indexes if 0 <= i < len(entries)})
+        # Per type: (no ID, ID, index) for every entry, in document order.
+        groups: Dict[str, List[Tuple[bool, int, int]]] = {}
+        for index in selected:
+            key = self._indexed.get(id(entries[index]), (None, None))[1]
+            if key is not None:
+                groups.setdefault(key[0], []).append((key[1] is None, key[1] or 0, index))
+        order = list(range(len(entries)))
+        for members in groups.values():
+            for (_, _, slot), (_, _, index) in zip(members, sorted(members)):
+                order[slot] = index
+        return self.reorder(order)
+
+    def insert_many(self, index: int, new_entries: Sequence[AbilityEntry]) -> int:
+        """Insert *new_entries* as a block before *index*; returns the clamped index."""
+        index = max(0, min(index, len(self.entries)))
+        if not new_entries:
+            return index
+        self.entries[index:index] = new_entries
+        self._touch()
+        for entry in new_entries:
+            self._index_entry(entry)
+        self._invalidate_positions(index)
+        self._text = None
+        self._offsets = []
+        return index
+
+    def remove_many(self, indexes: Collection[int]) -> List[AbilityEntry]:
+        """Remove the entries at *indexes* and return them in document order."""
+        chosen = {index for index in indexes if 0 <= index < len(self.entries)}
+        if not chosen:
+            return []
+        kept: List[AbilityEntry] = []
+        removed: List[AbilityEntry] = []
+        for index, entry in enumerate(self.entries):
+            (removed if index in chosen else kept).append(entry)
+        for entry in removed:
+            self._unindex_entry(entry)
+        self.entries[:] = kept
+        self._reset_layout()
+        return removed
+
+    def _reset_layout(self) -> None:
+        self._touch()
+        self._positions = {id(entry): index for index, entry in enumerate(self.entries)}
+        self._positions_valid = len(self.entries)
+        self._text = None
+        self._offsets = []
+
+    def _touch(self) -> None:
+        self.version = next(_VERSIONS)
+
+    # ------------------------------------------------------------------ snapshots
+    def snapshot(self) -> "DocumentSnapshot":
+        """Freeze the current state in O(1); later edits copy only what they touch."""
+        return DocumentSnapshot(
+            entries=self.entries.snapshot(),
+            preamble=tuple(self.preamble),
+            newline=self.newline,
+            version=self.version,
+        )
+
+    def restore(self, snapshot: "DocumentSnapshot") -> None:
+        """Return to the state in *snapshot*, re-indexing only the entries that differ.
+
+        Chunks shared between the live entries and the snapshot hold the same
+        entries, so only the chunks unique to either side are compared.
+        """
+        current_chunks = {id(chunk) for chunk in self.entries.chunks}
+        target_chunks = {id(chunk) for chunk in snapshot.entries.chunks}
+        leaving = {
+            id(entry): entry
+            for chunk in self.entries.chunks
+            if id(chunk) not in target_chunks
+            for entry in chunk
+        }
+        arriving = {
+            id(entry): entry
+            for chunk in snapshot.entries.chunks
+            if id(chunk) not in current_chunks
+            for entry in chunk
+        }
+        for entry_id, entry in leaving.items():
+            if entry_id not in arriving:
+                self._unindex_entry(entry)
+        self.entries = ChunkedList.from_vector(snapshot.entries)
+        for entry_id, entry in arriving.items():
+            if entry_id not in leaving:
+                self._index_entry(entry)
+        self.preamble[:] = snapshot.preamble
+        self.newline = snapshot.newline
+        self._positions_valid = 0
+        self._text = None
+        self._offsets = []
+        self.version = snapshot.version
+
+    # ------------------------------------------------------------------ text cache
+    def _preamble_text(self) -> str:
+        return "\n".join(self.preamble).rstrip()
+
+    def _entry_offset(self, index: int) -> int:
+        """Start of entry ``index`` inside the cached text (offsets are filled lazily)."""
+        offsets = self._offsets
+        if index < len(offsets):
+            return offsets[index]
+        entries = self.entries
+        if offsets:
+            position = offsets[-1] + len(entries[len(offsets) - 1].rendered()) + 2
+        else:
+            position = len(self._preamble_text()) + 2 if self.preamble else 0
+        for entry in islice(entries.iter_from(len(offsets)), index + 1 - len(offsets)):
+            offsets.append(position)
+            position += len(entry.rendered()) + 2
+        return offsets[index]
+
+    def _splice(self, start: int, length: int, replacement: str) -> None:
+        text = self._text
+        assert text is not None
+        self._text = text[:start] + replacement + text[start + length:]
+
+    def _splice_insert(self, index: int, entry: AbilityEntry) -> None:
+        """Account for ``entry`` having just been inserted at ``index``."""
+        del self._offsets[index:]
+        if self._text is None:
+            return
+        rendered = entry.rendered()
+        if index + 1 < len(self.entries):
+            self._splice(self._entry_offset(index), 0, rendered + "\n\n")
+        elif index > 0 or self.preamble:
+            self._splice(len(self._text), 0, "\n\n" + rendered)
+        else:
+            self._text = rendered
+        del self._offsets[index:]
+
+    def _splice_remove(self, index: int) -> None:
+        """Drop entry ``index`` from the cached text before it leaves ``entries``."""
+        if self._text is None:
+            del self._offsets[index:]
+            return
+        start = self._entry_offset(index)
+        length = len(self.entries[index].rendered())
+        if index + 1 < len(self.entries):
+            self._splice(start, length + 2, "")
+        elif index > 0 or self.preamble:
+            self._splice(start - 2, length + 2, "")
+        else:
+            self._text = ""
+        del self._offsets[index:]
+
+    # ------------------------------------------------------------------ lookups
+    def find(self, header: str) -> Optional[AbilityEntry]:
+        """Return the first entry (in document order) whose header matches exactly."""
+        matches = self._by_header.get(header)
+        if not matches:
+            return None
+        if len(matches) == 1:
+            return next(iter(matches.values()))
+        return min(matches.values(), key=self._position_key)
+
+    def has_header(self, header: str) -> bool:
+        return header in self._by_header
+
+    def index_of(self, entry: AbilityEntry) -> Optional[int]:
+        position = self._positions.get(id(entry))
+        if position is None or position >= self._positions_valid:
+            self._refresh_positions()
+            position = self._positions.get(id(entry))
+        if position is None or position >= len(self.entries) or self.entries[position] is not entry:
+            return None
+        return position
+
+    def entries_for(self, type_key: str, ability_id: Optional[int]) -> List[AbilityEntry]:
+        """Entries whose header parses to ``(type_key, ability_id)``, in document order."""
+        matches = self._by_key.get((type_key, ability_id))
+        if not matches:
+            return []
+        return sorted(matches.values(), key=self._position_key)
+
+    def iter_by_type(self, type_key: str) -> Iterable[AbilityEntry]:
+        matches = self._by_type.get(type_key)
+        if matches:
+            yield from sorted(matches.values(), key=self._position_key)
 
     def iter_by_prefix(self, prefix: str) -> Iterable[AbilityEntry]:
-        for entry in self.entries:
-            if entry.header.startswith(prefix):
-                yield entry
+        headers = self._sorted_headers
+        matches: List[AbilityEntry] = []
+        for idx in range(bisect_left(headers, prefix), len(headers)):
+            header = headers[idx]
+            if not header.startswith(prefix):
+                break
+            matches.extend(self._by_header[header].values())
+        matches.sort(key=self._position_key)
+        yield from matches
+
+    def unique_header(self, header: str, reserved: Collection[str] = ()) -> str:
+        """Return ``header`` or the first ``(Copy N)`` variant not used in the document.
+
+        Headers in *reserved* count as used too (e.g. copies about to be inserted).
+        """
+        if header not in self._by_header and header not in reserved:
+            return header
+        candidate = f"{header} (Copy)"
+        counter = 2
+        while candidate in self._by_header or candidate in reserved:
+            candidate = f"{header} (Copy {counter})"
+            counter += 1
+        return candidate
+
+    def search_index(self) -> "SearchIndex":
+        """Full-text and field index, built on first use and kept in step afterwards."""
+        if self._search is None:
+            from .search_index import SearchIndex
+
+            self._search = SearchIndex(self.entries)
+        return self._search
+
+    def search(self, query: Union[str, "SearchQuery"]) -> List[AbilityEntry]:
+        """Entries matching a search query (see :class:`SearchQuery`), in document order."""
+        index = self.search_index()
+        matches = [index.entry(entry_id) for entry_id in index.match(query)]
+        matches.sort(key=self._position_key)
+        return matches
+
+    def search_ids(self, query: Union[str, "SearchQuery"]) -> Set[int]:
+        """``id()`` of every entry matching *query*; cheaper than :meth:`search` for membership tests."""
+        return self.search_index().match(query)
+
+    def reference_index(self) -> "ReferenceIndex":
+        """Which entries mention which IDs, statuses, scopes …; built on first use."""
+        if self._references is None:
+            from .references import ReferenceIndex
+
+            with gc_paused():
+                self._references = ReferenceIndex(self.entries)
+        return self._references
+
+    def usages(self, kind: str, name: str) -> List[AbilityEntry]:
+        """Entries referring to *name* as a *kind* (see :mod:`references`), in document order."""
+        index = self.reference_index()
+        matches = [index.entry(entry_id) for entry_id in index.usages(kind, name)]
+        matches.sort(key=self._position_key)
+        return matches
+
+    # ------------------------------------------------------------------ index upkeep
+    def _index_entry(self, entry: AbilityEntry) -> None:
+        entry_id = id(entry)
+        header = entry.header
+        key = parse_header(header)
+        self._indexed[entry_id] = (header, key)
+        bucket = self._by_header.get(header)
+        if bucket is None:
+            bucket = self._by_header[header] = {}
+            insort(self._sorted_headers, header)
+        bucket[entry_id] = entry
+        if key is not None:
+            self._by_key.setdefault(key, {})[entry_id] = entry
+            self._by_type.setdefault(key[0], {})[entry_id] = entry
+        if self._search is not None:
+            self._search.add(entry)
+        if self._references is not None:
+            self._references.add(entry)
+
+    def _unindex_entry(self, entry: AbilityEntry) -> None:
+        entry_id = id(entry)
+        header, key = self._indexed.pop(entry_id, (entry.header, None))
+        self._positions.pop(entry_id, None)
+        if self._search is not None:
+            self._search.discard(entry)
+        if self._references is not None:
+            self._references.discard(entry)
+        bucket = self._by_header.get(header)
+        if bucket is not None:
+            bucket.pop(entry_id, None)
+            if not bucket:
+                del self._by_header[header]
+                idx = bisect_left(self._sorted_headers, header)
+                if idx < len(self._sorted_headers) and self._sorted_headers[idx] == header:
+                    del self._sorted_headers[idx]
+        if key is not None:
+            for index, index_key in ((self._by_key, key), (self._by_type, key[0])):
+                members = index.get(index_key)
+                if members is not None:
+                    members.pop(entry_id, None)
+                    if not members:
+                        del index[index_key]
+
+    def _invalidate_positions(self, start: int) -> None:
+        self._positions_valid = min(self._positions_valid, start)
+
+    def _refresh_positions(self) -> None:
+        positions = self._positions
+        entries = self.entries
+        for idx, entry in enumerate(entries.iter_from(self._positions_valid), self._positions_valid):
+            positions[id(entry)] = idx
+        self._positions_valid = len(entries)
+
+    def _position_key(self, entry: AbilityEntry) -> int:
+        index = self.index_of(entry)
+        return len(self.entries) if index is None else index
+
+
+@dataclass(frozen=True)
+class DocumentSnapshot:
+    """Read-only state of an :class:`AbilityDocument` at one ``version``.
+
+    Entries are shared with the document, never copied; a snapshot stays
+    valid (and safe to read from a worker thread) however the document
+    changes afterwards.
+    """
+
+    entries: PersistentVector
+    preamble: Tuple[str, ...]
+    newline: str
+    version: int
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+_LINE_BREAK = re.compile(rb"\r\n?|\n")
+
+
+class _SourceScanner:
+    """Reads a file chunk by chunk into one buffer and yields its lines with byte offsets."""
+
+    def __init__(self, path: Path, chunk_size: int, progress: Optional[ProgressCallback]) -> None:
+        self.path = path
+        self.chunk_size = max(1, chunk_size)
+        self.progress = progress
+        self.view: Optional[memoryview] = None
+        self.newline: Optional[str] = None
+        self.fingerprint: Optional[FileFingerprint] = None
+
+    def __iter__(self) -> Iterator[Tuple[int, int, str]]:
+        """Yield ``(line_start, line_end, text)``; ``line_end`` excludes the line break."""
+        with self.path.open("rb") as handle:
+            stat = os.fstat(handle.fileno())
+            total = stat.st_size
+            hasher = new_hasher()
+            buffer = bytearray(total)
+            writable = memoryview(buffer)
+            self.view = writable.toreadonly()
+            filled = 0
+            position = 0
+            while filled < total:
+                count = handle.readinto(writable[filled: filled + self.chunk_size])
+                if not count:
+                    break
+                hasher.update(writable[filled: filled + count])
+                filled += count
+                final = filled >= total
+                for match in _LINE_BREAK.finditer(buffer, position, filled):
+                    if not final and match.end() == filled and match.group() == b"\r":
+                        break  # may be the first half of a "\r\n" split across chunks
+                    if self.newline is None:
+                        self.newline = match.group().decode("ascii")
+                    yield position, match.start(), str(self.view[position: match.start()], "utf-8")
+                    position = match.end()
+                if self.progress:
+                    self.progress(filled, total)
+            if handle.read(1):
+                raise OSError(f"{self.path} changed while it was being read")
+        self.view = self.view[:filled]
+        self.fingerprint = FileFingerprint(self.path, filled, stat.st_mtime_ns, hasher.hexdigest())
+        if position < filled:
+            yield position, filled, str(self.view[position:filled], "utf-8")
+
+
+def parse_source(view: memoryview) -> Tuple[List[str], List[AbilityEntry]]:
+    """Preamble lines and entries of *view*, a run of whole lines from a file.
+
+    Entries keep zero-copy views of their byte spans, as with ``iter_load``;
+    the last one runs to the end of *view*.
+    """
+    preamble: List[str] = []
+    entries: List[AbilityEntry] = []
+    current: Optional[AbilityEntry] = None
+    span_start = 0
+    content_end = 0
+    position = 0
+    # (end of line, start of the next line) for every line.
+    lines: List[Tuple[int, int]] = [(match.start(), match.end()) for match in _LINE_BREAK.finditer(view)]
+    if (lines[-1][1] if lines else 0) < len(view):
+        lines.append((len(view), len(view)))
+    for line_end, next_start in lines:
+        text = str(view[position:line_end], "utf-8")
+        if text.startswith(">"):
+            if current:
+                current._attach_source(view[span_start:position], content_end - span_start)
+                entries.append(current)
+            current = AbilityEntry(header=text, body_lines=[])
+            span_start = position
+            content_end = line_end
+        else:
+            if current is None:
+                preamble.append(text)
+            else:
+                current.body_lines.append(text)
+            if text.strip():
+                content_end = line_end
+        position = next_start
+    if current:
+        current._attach_source(view[span_start:], content_end - span_start)
+        entries.append(current)
+    return preamble, entries
+
+
+def _count_line_breaks(data: bytes) -> int:
+    data = bytes(data)
+    return data.count(b"\n") + data.count(b"\r") - data.count(b"\r\n")
@@ -0,0 +1,488 @@
+"""NCalc formula compiler and validator for ``[code=...]`` blocks.
+
+``compile_expression`` tokenizes and parses a formula into a small AST and
+infers its result kind (``number``, ``bool``, ``string`` or ``any``). Results
+are cached by expression text, so validating a document compiles each
+distinct formula once no matter how many entries repeat it.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import re
+
+from . import ability_data
+from .entry_parser import CodeBlock
+from .models import AbilityDocument, AbilityEntry
+
+
+NUMBER = "number"
+BOOL = "bool"
+STRING = "string"
+ANY = "any"
+
+ERROR = "error"
+WARNING = "warning"
+
+COMPILE_CACHE_SIZE = 1 << 16
+
+_TOKEN_PATTERN = re.compile(
+    r"""
+    (?P<space>\s+)
+  | (?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<string>'(?:[^'\\]|\\.)*')
+  | (?P<date>\#[^#]*\#)
+  | (?P<param>\[[^\]]*\])
+  | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+  | (?P<op>&&|\|\||==|!=|<>|<=|>=|<<|>>|[-+*/%()<>=!~&|^?:,])
+    """,
+    re.VERBOSE,
+)
+_WORD_OPERATORS = {"and": "&&", "or": "||", "not": "!"}
+_CONSTANTS = {"true": BOOL, "false": BOOL}
+
+# Binary operators from loosest to tightest binding (NCalc grammar order).
+_BINARY_LEVELS: Tuple[Tuple[str, ...], ...] = (
+    ("||",),
+    ("&&",),
+    ("|",),
+    ("^",),
+    ("&",),
+    ("==", "!=", "<>", "="),
+    ("<", "<=", ">", ">="),
+    ("<<", ">>"),
+    ("+", "-"),
+    ("*", "/", "%"),
+)
+_UNARY = ("!", "-", "~")
+
+
+class NCalcSyntaxError(Exception):
+    def __init__(self, message: str, column: int) -> None:
+        super().__init__(message)
+        self.column = column
+
+
+# ---------------------------------------------------------------------- AST
+@dataclass
+class Node:
+    column: int
+
+
+@dataclass
+class Literal(Node):
+    value: object
+    kind: str
+
+
+@dataclass
+class Identifier(Node):
+    name: str
+
+
+@dataclass
+class Unary(Node):
+    op: str
+    operand: Node
+
+
+@dataclass
+class Binary(Node):
+    op: str
+    left: Node
+    right: Node
+
+
+@dataclass
+class Ternary(Node):
+    condition: Node
+    if_true: Node
+    if_false: Node
+
+
+@dataclass
+class Call(Node):
+    name: str
+    args: List[Node]
+
+
+@dataclass(frozen=True)
+class ExpressionIssue:
+    severity: str
+    message: str
+    column: int
+
+
+@dataclass
+class CompiledExpression:
+    """Parse result for one formula; ``ast`` is ``None`` when it has syntax errors."""
+
+    text: str
+    ast: Optional[Node]
+    kind: str
+    identifiers: Dict[str, int] = field(default_factory=dict)
+    issues: List[ExpressionIssue] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not any(issue.severity == ERROR for issue in self.issues)
+
+
+@dataclass(frozen=True)
+class Diagnostic:
+    severity: str
+    message: str
+    entry_index: int
+    header: str
+    line: int
+    column: int
+    block: str
+
+    def location(self) -> str:
+        """``line:column`` inside the entry; the header is line 1."""
+        return f"{self.line}:{self.column}"
+
+
+# ---------------------------------------------------------------------- tables
+@lru_cache(maxsize=1)
+def _identifier_kinds() -> Dict[str, str]:
+    return ability_data.ncalc_identifiers()
+
+
+def identifier_kind(name: str) -> Optional[str]:
+    """Kind of a known identifier, or ``None`` when the name is not recognised."""
+    kind = _identifier_kinds().get(name)
+    if kind is not None:
+        return kind
+    if name.startswith(ability_data.NCALC_CONSTANT_PREFIXES):
+        return NUMBER
+    return None
+
+
+# ---------------------------------------------------------------------- parsing
+class _Parser:
+    def __init__(self, text: str) -> None:
+        self.tokens = _tokenize(text)
+        self.position = 0
+        self.end = len(text)
+
+    def peek(self) -> Optional[Tuple[str, str, int]]:
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return None
+
+    def take(self) -> Tuple[str, str, int]:
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def expect(self, value: str, opened_at: int) -> None:
+        token = self.peek()
+        if token is None or token[1] != value:
+            column = token[2] if token else self.end
+            if value == ")":
+                raise NCalcSyntaxError(f"Unbalanced parentheses: '(' at column {opened_at + 1} is never closed", column)
+            raise NCalcSyntaxError(f"Expected '{value}'", column)
+        self.position += 1
+
+    def parse(self) -> Node:
+        if not self.tokens:
+            raise NCalcSyntaxError("Empty formula", 0)
+        node = self.expression()
+        token = self.peek()
+        if token is not None:
+            if token[1] == ")":
+                raise NCalcSyntaxError("Unbalanced parentheses: unexpected ')'", token[2])
+            raise NCalcSyntaxError(f"Unexpected '{token[1]}'", token[2])
+        return node
+
+    def expression(self) -> Node:
+        condition = self.binary(0)
+        token = self.peek()
+        if token is not None and token[1] == "?":
+            self.take()
+            if_true = self.expression()
+            self.expect(":", token[2])
+            if_false = self.expression()
+            return Ternary(token[2], condition, if_true, if_false)
+        return condition
+
+    def binary(self, level: int) -> Node:
+        if level == len(_BINARY_LEVELS):
+            return self.unary()
+        node = self.binary(level + 1)
+        operators = _BINARY_LEVELS[level]
+        while True:
+            token = self.peek()
+            if token is None or token[0] != "op" or token[1] not in operators:
+                return node
+            self.take()
+            node = Binary(token[2], token[1], node, self.binary(level + 1))
+
+    def unary(self) -> Node:
+        token = self.peek()
+        if token is not None and token[0] == "op" and token[1] in _UNARY:
+            self.take()
+            return Unary(token[2], token[1], self.unary())
+        return self.primary()
+
+    def primary(self) -> Node:
+        token = self.peek()
+        if token is None:
+            raise NCalcSyntaxError("Formula ends unexpectedly", self.end)
+        kind, value, column = self.take()
+        if kind == "number":
+            return Literal(column, float(value) if any(c in value for c in ".eE") else int(value), NUMBER)
+        if kind == "string":
+            return Literal(column, value[1:-1], STRING)
+        if kind == "date":
+            return Literal(column, value[1:-1], ANY)
+        if kind == "param":
+            return Identifier(column, value[1:-1])
+        if kind == "name":
+            if value.lower() in _CONSTANTS:
+                return Literal(column, value.lower() == "true", BOOL)
+            following = self.peek()
+            if following is not None and following[1] == "(":
+                self.take()
+                return Call(column, value, self.arguments(following[2]))
+            return Identifier(column, value)
+        if value == "(":
+            node = self.expression()
+            self.expect(")", column)
+            return node
+        if value == ")":
+            raise NCalcSyntaxError("Unbalanced parentheses: unexpected ')'", column)
+        raise NCalcSyntaxError(f"Unexpected '{value}'", column)
+
+    def arguments(self, opened_at: int) -> List[Node]:
+        args: List[Node] = []
+        token = self.peek()
+        if token is not None and token[1] == ")":
+            self.take()
+            return args
+        while True:
+            args.append(self.expression())
+            token = self.peek()
+            if token is not None and token[1] == ",":
+                self.take()
+                continue
+            self.expect(")", opened_at)
+            return args
+
+
+def _tokenize(text: str) -> List[Tuple[str, str, int]]:
+    tokens: List[Tuple[str, str, int]] = []
+    position = 0
+    length = len(text)
+    depth = 0
+    while position < length:
+        match = _TOKEN_PATTERN.match(text, position)
+        if match is None:
+            raise NCalcSyntaxError(f"Unexpected character '{text[position]}'", position)
+        kind = match.lastgroup or ""
+        value = match.group()
+        if kind == "name" and value.lower() in _WORD_OPERATORS:
+            kind, value = "op", _WORD_OPERATORS[value.lower()]
+        if kind != "space":
+            if value == "(":
+                depth += 1
+            elif value == ")":
+                depth -= 1
+            tokens.append((kind, value, position))
+        position = match.end()
+    if depth > 0:
+        # Report the innermost unclosed parenthesis before parsing trips over it.
+        opened: List[int] = []
+        for kind, value, column in tokens:
+            if value == "(":
+                opened.append(column)
+            elif value == ")" and opened:
+                opened.pop()
+        raise NCalcSyntaxError(f"Unbalanced parentheses: '(' at column {opened[-1] + 1} is never closed", opened[-1])
+    return tokens
+
+
+# ---------------------------------------------------------------------- typing
+class _Checker:
+    def __init__(self, compiled: CompiledExpression) -> None:
+        self.compiled = compiled
+
+    def issue(self, severity: str, message: str, column: int) -> None:
+        self.compiled.issues.append(ExpressionIssue(severity, message, column))
+
+    def kind_of(self, node: Node) -> str:
+        if isinstance(node, Literal):
+            return node.kind
+        if isinstance(node, Identifier):
+            self.compiled.identifiers.setdefault(node.name, node.column)
+            return identifier_kind(node.name) or ANY
+        if isinstance(node, Unary):
+            operand = self.kind_of(node.operand)
+            if node.op == "!":
+                if operand in (NUMBER, STRING):
+                    self.issue(WARNING, f"'!' applied to a {operand} value", node.column)
+                return BOOL
+            if operand in (BOOL, STRING):
+                self.issue(ERROR, f"'{node.op}' applied to a {operand} value", node.column)
+            return NUMBER
+        if isinstance(node, Binary):
+            return self.binary_kind(node)
+        if isinstance(node, Ternary):
+            condition = self.kind_of(node.condition)
+            if condition in (NUMBER, STRING):
+                self.issue(WARNING, f"Condition of '?' is a {condition} value", node.column)
+            if_true = self.kind_of(node.if_true)
+            if_false = self.kind_of(node.if_false)
+            return if_true if if_true == if_false else ANY
+        if isinstance(node, Call):
+            return self.call_kind(node)
+        return ANY
+
+    def binary_kind(self, node: Binary) -> str:
+        left = self.kind_of(node.left)
+        right = self.kind_of(node.right)
+        op = node.op
+        kinds = (left, right)
+        if op in ("&&", "||"):
+            if STRING in kinds:
+                self.issue(ERROR, f"'{op}' needs true/false operands, got a string", node.column)
+            elif NUMBER in kinds:
+                self.issue(WARNING, f"'{op}' applied to a number; compare it explicitly (e.g. != 0)", node.column)
+            return BOOL
+        if op in ("==", "!=", "<>", "="):
+            if BOOL in kinds and (NUMBER in kinds or STRING in kinds):
+                self.issue(WARNING, f"'{op}' compares a boolean with a {right if left == BOOL else left}", node.column)
+            return BOOL
+        if op in ("<", "<=", ">", ">="):
+            if BOOL in kinds:
+                self.issue(ERROR, f"'{op}' cannot order boolean values", node.column)
+            return BOOL
+        if op in ("&", "|", "^", "<<", ">>"):
+            if BOOL in kinds and op in ("&", "|"):
+                self.issue(WARNING, f"Bitwise '{op}' applied to a boolean; did you mean '{op * 2}'?", node.column)
+            elif BOOL in kinds or STRING in kinds:
+                self.issue(ERROR, f"Bitwise '{op}' needs numeric operands", node.column)
+            return NUMBER
+        # Arithmetic
+        if op == "+" and STRING in kinds:
+            return STRING
+        if BOOL in kinds:
+            self.issue(ERROR, f"Arithmetic '{op}' applied to a boolean value", node.column)
+        elif STRING in kinds:
+            self.issue(ERROR, f"Arithmetic '{op}' applied to a string", node.column)
+        return NUMBER if ANY not in kinds else ANY
+
+    def call_kind(self, node: Call) -> str:
+        arg_kinds = [self.kind_of(arg) for arg in node.args]
+        signature = ability_data.NCALC_FUNCTIONS.get(node.name)
+        if signature is None:
+            self.issue(WARNING, f"Unknown function '{node.name}'", node.column)
+            return ANY
+        minimum, maximum, kind = signature
+        count = len(node.args)
+        if count < minimum or (maximum is not None and count > maximum):
+            if maximum is None:
+                expected = f"at least {minimum}"
+            elif minimum == maximum:
+                expected = str(minimum)
+            else:
+                expected = f"{minimum} to {maximum}"
+            self.issue(ERROR, f"{node.name}() takes {expected} argument(s), got {count}", node.column)
+        if node.name == "if" and count == 3:
+            return arg_kinds[1] if arg_kinds[1] == arg_kinds[2] else ANY
+        return kind
+
+
+@lru_cache(maxsize=COMPILE_CACHE_SIZE)
+def compile_expression(text: str) -> CompiledExpression:
+    """Parse and type-check *text*; the result is shared, treat it as read-only."""
+    try:
+        ast = _Parser(text).parse()
+    except NCalcSyntaxError as exc:
+        compiled = CompiledExpression(text=text, ast=None, kind=ANY)
+        compiled.issues.append(ExpressionIssue(ERROR, str(exc), exc.column))
+        return compiled
+    compiled = CompiledExpression(text=text, ast=ast, kind=ANY)
+    compiled.kind = _Checker(compiled).kind_of(ast)
+    return compiled
+
+
+# ---------------------------------------------------------------------- validation
+@lru_cache(maxsize=COMPILE_CACHE_SIZE)
+def check_block(name: str, expression: str) -> Tuple[ExpressionIssue, ...]:
+    """All issues for *expression* used as the body of a ``[code=name]`` block."""
+    compiled = compile_expression(expression)
+    issues = list(compiled.issues)
+    if compiled.ast is None:
+        return tuple(issues)
+    for identifier, column in compiled.identifiers.items():
+        if identifier != name and identifier_kind(identifier) is None:
+            issues.append(ExpressionIssue(WARNING, f"Unknown identifier '{identifier}'", column))
+    expected = ability_data.NCALC_BLOCK_RESULTS.get(name) or identifier_kind(name)
+    actual = compiled.kind
+    if expected == BOOL and actual in (NUMBER, STRING):
+        issues.append(ExpressionIssue(ERROR, f"[code={name}] must evaluate to true/false, not a {actual}", 0))
+    elif expected == NUMBER and actual in (BOOL, STRING):
+        issues.append(ExpressionIssue(ERROR, f"[code={name}] must evaluate to a number, not a {actual}", 0))
+    return tuple(issues)
+
+
+def validate_entry(entry: AbilityEntry, entry_index: int = 0) -> List[Diagnostic]:
+    diagnostics: List[Diagnostic] = []
+    body = entry.body_lines
+    for block in entry.parsed().blocks:
+        if not block.closed:
+            diagnostics.append(
+                Diagnostic(ERROR, f"[code={block.name}] is missing its [/code]", entry_index, entry.header,
+                           block.line + 2, block.column + 1, block.name)
+            )
+        issues = check_block(block.name, block.expression)
+        if not issues:
+            continue
+        base = _expression_column(body, block)
+        for issue in issues:
+            column = base + issue.column if block.line == block.end_line else block.column
+            diagnostics.append(
+                Diagnostic(issue.severity, issue.message, entry_index, entry.header, block.line + 2, column + 1, block.name)
+            )
+    return diagnostics
+
+
+def validate_entries(entries: Iterable[Tuple[int, AbilityEntry]]) -> List[Diagnostic]:
+    diagnostics: List[Diagnostic] = []
+    for index, entry in entries:
+        diagnostics.extend(validate_entry(entry, index))
+    return diagnostics
+
+
+def validate_document(document: AbilityDocument) -> List[Diagnostic]:
+    """Check every ``[code=...]`` block in *document*; each distinct formula is compiled once."""
+    return validate_entries(enumerate(document.entries))
+
+
+def _expression_column(body: Sequence[str], block: CodeBlock) -> int:
+    if block.line >= len(body):
+        return block.column
+    line = body[block.line]
+    start = line.find("]", block.column) + 1
+    while start < len(line) and line[start].isspace():
+        start += 1
+    return start
+
+
+def format_diagnostic(diagnostic: Diagnostic) -> str:
+    return (
+        f"{diagnostic.severity}: {diagnostic.header.strip()} (line {diagnostic.line}, column {diagnostic.column}): "
+        f"{diagnostic.message}"
+    )
+
+
+def summarize(diagnostics: Sequence[Diagnostic]) -> Dict[str, int]:
+    counts = {ERROR: 0, WARNING: 0}
+    for diagnostic in diagnostics:
+        counts[diagnostic.severity] = counts.get(diagnostic.severity, 0) + 1
+    return counts
+
@@ -0,0 +1,259 @@
+"""Vectorized evaluation of compiled NCalc formulas over grids of input stats.
+
+``sweep`` walks the AST produced by :func:`ncalc.compile_expression` once and
+applies each node as a NumPy operation, so a formula is evaluated for every
+point of a cartesian grid in a single batch. Swept inputs are broadcast as
+open (sparse) grids; the full grid only materialises in the result array.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Mapping, Sequence, Tuple, Union
+import time
+
+import numpy as np
+
+from . import ncalc
+
+
+Value = Union[np.ndarray, np.generic, int, float, bool]
+
+MAX_POINTS = 20_000_000
+
+
+class SweepError(Exception):
+    """Raised when a formula cannot be evaluated over a grid."""
+
+
+@dataclass(frozen=True)
+class SweepAxis:
+    name: str
+    start: float
+    stop: float
+    steps: int
+
+    def values(self) -> np.ndarray:
+        if self.steps <= 1:
+            return np.array([self.start])
+        values = np.linspace(self.start, self.stop, self.steps)
+        # Stats are integers; keep them that way when the steps land on whole numbers.
+        if np.array_equal(values, np.round(values)):
+            return values.astype(np.int64)
+        return values
+
+
+@dataclass
+class SweepResult:
+    expression: str
+    axes: List[Tuple[str, np.ndarray]]
+    values: np.ndarray
+    elapsed: float
+    notes: List[str] = field(default_factory=list)
+
+    @property
+    def points(self) -> int:
+        return int(self.values.size)
+
+    @property
+    def is_boolean(self) -> bool:
+        return self.values.dtype == np.bool_
+
+    def summary(self) -> str:
+        values = self.values
+        if self.is_boolean:
+            share = float(values.mean()) * 100 if values.size else 0.0
+            return f"true for {share:.1f}% of {values.size:,} points"
+        finite = values[np.isfinite(values)] if values.dtype.kind == "f" else values
+        if not finite.size:
+            return f"no finite values over {values.size:,} points"
+        return (
+            f"min {finite.min():g}, max {finite.max():g}, mean {finite.mean():g} "
+            f"over {values.size:,} points"
+        )
+
+
+def sweep(
+    expression: str,
+    axes: Sequence[SweepAxis],
+    constants: Mapping[str, float],
+) -> SweepResult:
+    """Evaluate *expression* for every combination of the *axes* values.
+
+    Identifiers that are not swept are looked up in *constants*. The result
+    array has one dimension per axis, in the order given.
+    """
+    compiled = ncalc.compile_expression(expression)
+    if compiled.ast is None:
+        issue = compiled.issues[0]
+        raise SweepError(f"{issue.message} (column {issue.column + 1})")
+
+    grids = np.meshgrid(*[axis.values() for axis in axes], indexing="ij", sparse=True) if axes else []
+    shape = tuple(grid.shape[index] for index, grid in enumerate(grids))
+    points = int(np.prod(shape)) if shape else 1
+    if points > MAX_POINTS:
+        raise SweepError(f"{points:,} points requested; the limit is {MAX_POINTS:,}.")
+
+    variables: Dict[str, Value] = {name: value for name, value in constants.items()}
+    for axis, grid in zip(axes, grids):
+        variables[axis.name] = grid
+    missing = sorted(name for name in compiled.identifiers if name not in variables)
+    if missing:
+        raise SweepError("No value given for " + ", ".join(missing))
+
+    started = time.perf_counter()
+    evaluator = _Evaluator(variables)
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        result = np.asarray(evaluator.evaluate(compiled.ast))
+    values = np.broadcast_to(result, shape).copy() if shape else result.reshape(())
+    elapsed = time.perf_counter() - started
+    return SweepResult(
+        expression=expression,
+        axes=[(axis.name, axis.values()) for axis in axes],
+        values=values,
+        elapsed=elapsed,
+        notes=sorted(evaluator.notes),
+    )
+
+
+def _truth(value: Value) -> np.ndarray:
+    array = np.asarray(value)
+    return array if array.dtype == np.bool_ else array != 0
+
+
+def _divide(left: Value, right: Value) -> Value:
+    # NCalc divides in floating point even when both operands are integers.
+    return np.true_divide(left, right)
+
+
+def _modulo(left: Value, right: Value) -> Value:
+    return np.where(np.asarray(right) == 0, np.nan, np.fmod(left, np.where(np.asarray(right) == 0, 1, right)))
+
+
+def _as_int(value: Value) -> np.ndarray:
+    return np.asarray(value).astype(np.int64)
+
+
+def _scalar(value: Value, what: str) -> float:
+    """*value* as a plain number; arguments such as Round's digits cannot vary over the grid."""
+    if np.ndim(value) != 0:
+        raise SweepError(f"{what} must not depend on a swept input")
+    return float(value)
+
+
+_BINARY: Dict[str, Callable[[Value, Value], Value]] = {
+    "+": np.add,
+    "-": np.subtract,
+    "*": np.multiply,
+    "/": _divide,
+    "%": _modulo,
+    "==": np.equal,
+    "=": np.equal,
+    "!=": np.not_equal,
+    "<>": np.not_equal,
+    "<": np.less,
+    "<=": np.less_equal,
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "&&": lambda a, b: np.logical_and(_truth(a), _truth(b)),
+    "||": lambda a, b: np.logical_or(_truth(a), _truth(b)),
+    "&": lambda a, b: np.bitwise_and(_as_int(a), _as_int(b)),
+    "|": lambda a, b: np.bitwise_or(_as_int(a), _as_int(b)),
+    "^": lambda a, b: np.bitwise_xor(_as_int(a), _as_int(b)),
+    "<<": lambda a, b: np.left_shift(_as_int(a), _as_int(b)),
+    ">>": lambda a, b: np.right_shift(_as_int(a), _as_int(b)),
+}
+
+_UNARY_FUNCTIONS: Dict[str, Callable[[Value], Value]] = {
+    "Abs": np.abs,
+    "Acos": np.arccos,
+    "Asin": np.arcsin,
+    "Atan": np.arctan,
+    "Ceiling": np.ceil,
+    "Cos": np.cos,
+    "Exp": np.exp,
+    "Floor": np.floor,
+    "Log10": np.log10,
+    "Sign": np.sign,
+    "Sin": np.sin,
+    "Sqrt": np.sqrt,
+    "Tan": np.tan,
+    "Truncate": np.trunc,
+}
+
+
+class _Evaluator:
+    def __init__(self, variables: Mapping[str, Value]) -> None:
+        self.variables = variables
+        self.notes: set = set()
+
+    def evaluate(self, node: ncalc.Node) -> Value:
+        if isinstance(node, ncalc.Literal):
+            if node.kind == ncalc.STRING or node.kind == ncalc.ANY:
+                raise SweepError(f"Literal {node.value!r} cannot be swept")
+            return node.value  # type: ignore[return-value]
+        if isinstance(node, ncalc.Identifier):
+            return self.variables[node.name]
+        if isinstance(node, ncalc.Unary):
+            operand = self.evaluate(node.operand)
+            if node.op == "!":
+                return np.logical_not(_truth(operand))
+            if node.op == "~":
+                return np.invert(_as_int(operand))
+            return np.negative(operand)
+        if isinstance(node, ncalc.Binary):
+            return _BINARY[node.op](self.evaluate(node.left), self.evaluate(node.right))
+        if isinstance(node, ncalc.Ternary):
+            return np.where(_truth(self.evaluate(node.condition)), self.evaluate(node.if_true), self.evaluate(node.if_false))
+        if isinstance(node, ncalc.Call):
+            return self.call(node)
+        raise SweepError(f"Unsupported expression node {type(node).__name__}")
+
+    def call(self, node: ncalc.Call) -> Value:
+        name = node.name
+        args = [self.evaluate(arg) for arg in node.args]
+        function = _UNARY_FUNCTIONS.get(name)
+        if function is not None and len(args) == 1:
+            return function(args[0])
+        if name in ("Max", "Min") and len(args) == 2:
+            return (np.maximum if name == "Max" else np.minimum)(args[0], args[1])
+        if name == "Pow" and len(args) == 2:
+            return np.power(np.asarray(args[0], dtype=np.float64), args[1])
+        if name == "Round" and args:
+            # np.round rounds half to even, matching Math.Round's default.
+            return np.round(args[0], int(_scalar(args[1], "Round()'s number of digits")) if len(args) > 1 else 0)
+        if name == "Log" and len(args) == 2:
+            return np.log(args[0]) / np.log(args[1])
+        if name == "IEEERemainder" and len(args) == 2:
+            return np.subtract(args[0], np.multiply(args[1], np.round(np.true_divide(args[0], args[1]))))
+        if name == "if" and len(args) == 3:
+            return np.where(_truth(args[0]), args[1], args[2])
+        if name == "in" and len(args) >= 2:
+            found = np.zeros(np.broadcast(*args).shape, dtype=np.bool_)
+            for candidate in args[1:]:
+                found |= np.equal(args[0], candidate)
+            return found
+        if name == "CheckAnyStatus" and len(args) >= 2:
+            mask = _as_int(args[1])
+            for extra in args[2:]:
+                mask = mask | _as_int(extra)
+            return np.bitwise_and(_as_int(args[0]), mask) != 0
+        if name == "CheckHasStatus" and len(args) >= 2:
+            mask = _as_int(args[1])
+            for extra in args[2:]:
+                mask = mask | _as_int(extra)
+            return np.bitwise_and(_as_int(args[0]), mask) == mask
+        if name == "CombineStatuses" and args:
+            combined = _as_int(args[0])
+            for extra in args[1:]:
+                combined = combined | _as_int(extra)
+            return combined
+        if name == "RemoveStatuses" and args:
+            remaining = _as_int(args[0])
+            for extra in args[1:]:
+                remaining = remaining & ~_as_int(extra)
+            return remaining
+        if name == "GetRandom" and len(args) == 2:
+            self.notes.add("GetRandom(min, max) is evaluated as its expected value.")
+            return np.true_divide(np.add(args[0], args[1]) - 1, 2)
+        raise SweepError(f"{name}() cannot be evaluated over a grid")
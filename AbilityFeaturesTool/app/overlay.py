@@ -0,0 +1,259 @@
+"""The effective features of each SA/AA ID across prioritized mod layers.
+
+Layers are given in priority order, lowest first, as for
+:func:`merge.merge_documents`. Each layer is reduced once to
+``{(space, ID): {merge key: entries}}``, so a layer contributes to an ID
+through every entry that claims it (``>SA 37`` and ``>SA Global+ 37`` alike).
+Within an ID, entries are told apart by their merge key, one per scope set, and
+the last layer defining a key wins it.
+
+:class:`Overlay` keeps the resolved features of every ID, so "what applies to
+SA 37" is one dictionary lookup. Adding, removing or moving a layer re-resolves
+only the IDs that layer contributes to; replacing a layer (after its file
+changed) re-resolves only the IDs whose entries in that layer differ. Entries
+without an ID are not indexed. Nothing here imports Qt.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+import os
+import re
+import time
+
+from .id_index import ID_SPACES, IdKey, id_key
+from .merge import MergeKey, MergeSource, format_key
+from .models import AbilityDocument, AbilityEntry, gc_paused
+from .storage import FileFingerprint
+
+
+IdGroups = Dict[IdKey, Dict[MergeKey, List[AbilityEntry]]]
+
+_ID_QUERY = re.compile(rf"^\s*({'|'.join(ID_SPACES)})?\s*(\d+)\s*$", re.IGNORECASE)
+
+
+def parse_id_query(text: str, default_space: str = "SA") -> Optional[IdKey]:
+    """``"SA 37"``, ``"aa12"`` or a bare ``"37"`` (in *default_space*) as an ID key."""
+    match = _ID_QUERY.match(text)
+    if match is None:
+        return None
+    return (match.group(1) or default_space).upper(), int(match.group(2))
+
+
+def format_id(key: IdKey) -> str:
+    return f"{key[0]} {key[1]}"
+
+
+@dataclass
+class OverlayLayer:
+    """One mod's AbilityFeatures, grouped by the IDs its entries claim."""
+
+    name: str
+    path: Optional[Path] = None
+    groups: IdGroups = field(default_factory=dict)
+    fingerprint: Optional[FileFingerprint] = None
+    entry_count: int = 0
+    # Entries without an SA/AA ID, which the overlay does not index.
+    unindexed: int = 0
+
+    @classmethod
+    def from_source(cls, source: MergeSource) -> "OverlayLayer":
+        document = source.document
+        layer = cls(source.name, source.path, fingerprint=document.fingerprint, entry_count=len(document.entries))
+        groups = layer.groups
+        for key, entry in zip(source.keys(), document.entries):
+            claimed = id_key(entry)
+            if claimed is None:
+                layer.unindexed += 1
+                continue
+            groups.setdefault(claimed, {}).setdefault(key, []).append(entry)
+        return layer
+
+    @classmethod
+    def from_document(cls, name: str, document: AbilityDocument, path: Optional[Path] = None) -> "OverlayLayer":
+        return cls.from_source(MergeSource(name, document, path))
+
+    @classmethod
+    def load(cls, name: str, path: Path) -> "OverlayLayer":
+        return cls.from_document(name, AbilityDocument.load(path), path)
+
+    def is_stale(self) -> bool:
+        """True when the file on disk is no longer the one that was loaded."""
+        if self.path is None:
+            return False
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return self.fingerprint is not None
+        return self.fingerprint is None or not self.fingerprint.matches_stat(stat)
+
+
+@dataclass
+class Feature:
+    """One merge key of an ID; ``definitions`` is in priority order."""
+
+    key: MergeKey
+    definitions: List[Tuple[OverlayLayer, List[AbilityEntry]]]
+
+    @property
+    def winner(self) -> OverlayLayer:
+        return self.definitions[-1][0]
+
+    @property
+    def entries(self) -> List[AbilityEntry]:
+        """The entries that take effect."""
+        return self.definitions[-1][1]
+
+    @property
+    def overridden(self) -> bool:
+        return len(self.definitions) > 1
+
+    @property
+    def identical(self) -> bool:
+        """True when every overridden definition matches the winning one."""
+        expected = [entry.rendered() for entry in self.entries]
+        return all([entry.rendered() for entry in entries] == expected for _, entries in self.definitions[:-1])
+
+    @property
+    def label(self) -> str:
+        return format_key(self.key)
+
+
+@dataclass
+class ResolvedId:
+    key: IdKey
+    features: List[Feature]
+
+    @property
+    def label(self) -> str:
+        return format_id(self.key)
+
+    @property
+    def layers(self) -> List[OverlayLayer]:
+        """Layers contributing to this ID, in priority order."""
+        seen: Dict[int, OverlayLayer] = {}
+        for feature in self.features:
+            for layer, _ in feature.definitions:
+                seen.setdefault(id(layer), layer)
+        return list(seen.values())
+
+    @property
+    def overridden(self) -> bool:
+        return any(feature.overridden for feature in self.features)
+
+    @property
+    def effective_entries(self) -> List[AbilityEntry]:
+        return [entry for feature in self.features for entry in feature.entries]
+
+
+@dataclass
+class OverlayChange:
+    """The IDs re-resolved by one layer operation."""
+
+    ids: Set[IdKey]
+    elapsed: float = 0.0
+
+
+class Overlay:
+    def __init__(self, layers: Iterable[OverlayLayer] = ()) -> None:
+        self.layers: List[OverlayLayer] = list(layers)
+        self._resolved: Dict[IdKey, ResolvedId] = {}
+        keys: Set[IdKey] = set()
+        for layer in self.layers:
+            keys.update(layer.groups)
+        self._resolve(keys)
+
+    def __len__(self) -> int:
+        return len(self._resolved)
+
+    def lookup(self, key: IdKey) -> Optional[ResolvedId]:
+        """What applies to *key*, or None when no layer claims it."""
+        return self._resolved.get(key)
+
+    def ids(self, overridden_only: bool = False) -> List[IdKey]:
+        """Every claimed ID in (space, ID) order."""
+        resolved = self._resolved
+        if overridden_only:
+            return sorted(key for key, value in resolved.items() if value.overridden)
+        return sorted(resolved)
+
+    def stale_layers(self) -> List[int]:
+        """Indexes of the layers whose file changed since it was loaded."""
+        return [index for index, layer in enumerate(self.layers) if layer.is_stale()]
+
+    # ------------------------------------------------------------------ layers
+    def insert_layer(self, index: int, layer: OverlayLayer) -> OverlayChange:
+        started = time.perf_counter()
+        self.layers.insert(index, layer)
+        keys = set(layer.groups)
+        self._resolve(keys)
+        return OverlayChange(keys, time.perf_counter() - started)
+
+    def append_layer(self, layer: OverlayLayer) -> OverlayChange:
+        return self.insert_layer(len(self.layers), layer)
+
+    def remove_layer(self, index: int) -> OverlayChange:
+        started = time.perf_counter()
+        layer = self.layers.pop(index)
+        keys = set(layer.groups)
+        self._resolve(keys)
+        return OverlayChange(keys, time.perf_counter() - started)
+
+    def move_layer(self, index: int, target: int) -> OverlayChange:
+        """Move a layer to a new priority; only the IDs it claims can change winner."""
+        started = time.perf_counter()
+        layer = self.layers.pop(index)
+        self.layers.insert(target, layer)
+        keys = set(layer.groups)
+        self._resolve(keys)
+        return OverlayChange(keys, time.perf_counter() - started)
+
+    def replace_layer(self, index: int, layer: OverlayLayer) -> OverlayChange:
+        """Swap in a reloaded version of layer *index*, keeping its name and place.
+
+        The existing layer object is updated in place, so the features of IDs
+        that did not change still refer to a current layer.
+        """
+        started = time.perf_counter()
+        current = self.layers[index]
+        old, new = current.groups, layer.groups
+        keys = {key for key in old.keys() | new.keys() if old.get(key) != new.get(key)}
+        current.path = layer.path
+        current.groups = new
+        current.fingerprint = layer.fingerprint
+        current.entry_count = layer.entry_count
+        current.unindexed = layer.unindexed
+        self._resolve(keys)
+        return OverlayChange(keys, time.perf_counter() - started)
+
+    # ------------------------------------------------------------------ internals
+    def _resolve(self, keys: Set[IdKey]) -> None:
+        if not keys:
+            return
+        with gc_paused():
+            features: Dict[IdKey, Dict[MergeKey, List[Tuple[OverlayLayer, List[AbilityEntry]]]]] = {}
+            for layer in self.layers:
+                groups = layer.groups
+                # Walk whichever side is smaller: the keys, or this layer's IDs.
+                if len(keys) < len(groups):
+                    contributed = ((key, groups[key]) for key in keys if key in groups)
+                else:
+                    contributed = ((key, group) for key, group in groups.items() if key in keys)
+                for key, group in contributed:
+                    defined = features.setdefault(key, {})
+                    for merge_key, entries in group.items():
+                        defined.setdefault(merge_key, []).append((layer, entries))
+            resolved = self._resolved
+            for key in keys:
+                defined = features.get(key)
+                if defined is None:
+                    resolved.pop(key, None)
+                else:
+                    resolved[key] = ResolvedId(key, [Feature(merge_key, value) for merge_key, value in defined.items()])
+
+
+def layers_from_sources(sources: Sequence[MergeSource]) -> List[OverlayLayer]:
+    """Overlay layers for sources loaded with :func:`merge.load_sources`."""
+    return [OverlayLayer.from_source(source) for source in sources]
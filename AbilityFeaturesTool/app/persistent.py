@@ -0,0 +1,257 @@
+"""Chunked sequences with O(1) snapshots for the document's entry storage.
+
+Items live in immutable tuples ("chunks") of roughly ``CHUNK_SIZE`` items.
+A :class:`ChunkedList` edits its chunk list in place until a snapshot is
+taken; from then on the next edit copies the chunk list (a few hundred
+pointers for tens of thousands of items) and rebuilds only the chunks it
+touches. A :class:`PersistentVector` snapshot therefore shares every untouched
+chunk with the live list and with other snapshots, never changes afterwards,
+and is safe to read from other threads.
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_left, bisect_right
+from itertools import chain, islice
+from typing import Any, Generic, Iterable, Iterator, List, MutableSequence, Optional, Sequence, Tuple, TypeVar, Union, overload
+
+
+T = TypeVar("T")
+
+CHUNK_SIZE = 64
+
+Chunk = Tuple[Any, ...]
+
+
+def _rechunk(items: Sequence[T]) -> List[Chunk]:
+    if len(items) <= CHUNK_SIZE * 2:
+        return [tuple(items)] if items else []
+    return [tuple(items[start:start + CHUNK_SIZE]) for start in range(0, len(items), CHUNK_SIZE)]
+
+
+class _ChunkedBase(Generic[T]):
+    __slots__ = ("_chunks", "_starts", "_length")
+
+    def __init__(self, chunks: List[Chunk], length: int) -> None:
+        self._chunks = chunks
+        self._starts: List[int] = []
+        self._length = length
+
+    @property
+    def chunks(self) -> Sequence[Chunk]:
+        """The underlying chunks; identical chunk objects hold identical items."""
+        return self._chunks
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __iter__(self) -> Iterator[T]:
+        return chain.from_iterable(self._chunks)
+
+    def iter_from(self, start: int) -> Iterator[T]:
+        """Iterate from index *start* without walking the items before it."""
+        if start <= 0:
+            return iter(self)
+        if start >= self._length:
+            return iter(())
+        chunk, offset = self._locate(start)
+        return chain(islice(self._chunks[chunk], offset, None), chain.from_iterable(islice(self._chunks, chunk + 1, None)))
+
+    @overload
+    def __getitem__(self, index: int) -> T: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[T]: ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[T, List[T]]:
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._length)
+            if step != 1:
+                return list(self)[index]
+            return list(islice(self.iter_from(start), max(0, stop - start)))
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("index out of range")
+        chunk, offset = self._locate(index)
+        return self._chunks[chunk][offset]
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, (_ChunkedBase, list, tuple)):
+            return len(self) == len(other) and list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({list(self)!r})"
+
+    def _ensure_starts(self) -> List[int]:
+        starts = self._starts
+        chunks = self._chunks
+        done = len(starts)
+        if done < len(chunks):
+            position = starts[-1] + len(chunks[done - 1]) if done else 0
+            for chunk in islice(chunks, done, None):
+                starts.append(position)
+                position += len(chunk)
+        return starts
+
+    def _locate(self, index: int) -> Tuple[int, int]:
+        """``(chunk, offset)`` of the item at *index* (which must exist)."""
+        starts = self._ensure_starts()
+        chunk = bisect_right(starts, index) - 1
+        return chunk, index - starts[chunk]
+
+
+class PersistentVector(_ChunkedBase[T], Sequence[T]):
+    """Immutable snapshot of a :class:`ChunkedList`."""
+
+    __slots__ = ()
+
+    __hash__ = None  # type: ignore[assignment]
+
+
+class ChunkedList(_ChunkedBase[T], MutableSequence[T]):
+    """List-like sequence whose ``snapshot()`` is O(1) and shares storage.
+
+    Indexing is O(log(n / CHUNK_SIZE)), iteration runs at tuple speed and a
+    single-item edit costs O(CHUNK_SIZE + n / CHUNK_SIZE).
+    """
+
+    __slots__ = ("_shared",)
+
+    def __init__(self, items: Iterable[T] = ()) -> None:
+        items = list(items)
+        super().__init__(_rechunk(items), len(items))
+        self._shared = False
+
+    @classmethod
+    def from_vector(cls, vector: PersistentVector[T]) -> "ChunkedList[T]":
+        """A live list starting from *vector*'s contents, sharing its chunks."""
+        instance = cls()
+        instance._chunks = vector._chunks
+        instance._length = len(vector)
+        instance._shared = True
+        return instance
+
+    def snapshot(self) -> PersistentVector[T]:
+        self._shared = True
+        return PersistentVector(self._chunks, self._length)
+
+    # ------------------------------------------------------------------ edits
+    def __setitem__(self, index: Union[int, slice], value: Any) -> None:
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._length)
+            if step != 1:
+                items = list(self)
+                items[index] = value
+                self._splice(0, self._length, items)
+                return
+            self._splice(start, max(start, stop), list(value))
+            return
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("assignment index out of range")
+        self._splice(index, index + 1, [value])
+
+    def __delitem__(self, index: Union[int, slice]) -> None:
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._length)
+            if step != 1:
+                items = list(self)
+                del items[index]
+                self._splice(0, self._length, items)
+                return
+            self._splice(start, max(start, stop), [])
+            return
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("deletion index out of range")
+        self._splice(index, index + 1, [])
+
+    def insert(self, index: int, value: T) -> None:
+        if index < 0:
+            index = max(0, index + self._length)
+        index = min(index, self._length)
+        self._splice(index, index, [value])
+
+    def append(self, value: T) -> None:
+        chunks = self._chunks
+        if not self._shared and chunks:
+            # Fast path for streaming loads: grow the tail chunk or open a new
+            # one; no existing start offsets move.
+            if len(chunks[-1]) < CHUNK_SIZE:
+                chunks[-1] += (value,)
+            else:
+                chunks.append((value,))
+            self._length += 1
+            return
+        self._splice(self._length, self._length, [value])
+
+    def extend(self, values: Iterable[T]) -> None:
+        self._splice(self._length, self._length, list(values))
+
+    def clear(self) -> None:
+        self._splice(0, self._length, [])
+
+    def _boundary(self, position: int) -> Tuple[int, int]:
+        """Chunk holding the gap before *position*, preferring the earlier chunk at a seam."""
+        starts = self._ensure_starts()
+        chunk = max(0, bisect_left(starts, position) - 1)
+        return chunk, position - starts[chunk]
+
+    def _splice(self, start: int, stop: int, items: List[T]) -> None:
+        """Replace ``self[start:stop]`` with *items*, rebuilding only the affected chunks."""
+        if self._shared:
+            self._chunks = list(self._chunks)
+            self._starts = list(self._starts)
+            self._shared = False
+        chunks = self._chunks
+        if not chunks:
+            chunks[:] = _rechunk(items)
+            self._length = len(items)
+            self._starts = []
+            return
+        first, first_offset = self._boundary(start)
+        last, last_offset = self._boundary(stop)
+        middle = chunks[first][:first_offset] + tuple(items) + chunks[last][last_offset:]
+        # Fold a shrunken chunk into its neighbour so deletions do not fragment the list.
+        if len(middle) < CHUNK_SIZE // 2 and last + 1 < len(chunks):
+            last += 1
+            middle += chunks[last]
+        chunks[first:last + 1] = _rechunk(middle)
+        self._length += len(items) - (stop - start)
+        del self._starts[first:]
+
+
+def changed_span(old: _ChunkedBase[T], new: _ChunkedBase[T]) -> Optional[Tuple[int, int, int]]:
+    """``(start, old_stop, new_stop)`` such that only ``old[start:old_stop]`` became
+    ``new[start:new_stop]``, comparing items by identity; ``None`` if nothing changed.
+
+    Leading and trailing chunks that both sides share are skipped whole, so for
+    a snapshot and a later edit of it the cost follows the edit, not the length.
+    """
+    old_chunks, new_chunks = old.chunks, new.chunks
+    limit = min(len(old), len(new))
+    start = 0
+    for old_chunk, new_chunk in zip(old_chunks, new_chunks):
+        if old_chunk is not new_chunk:
+            break
+        start += len(old_chunk)
+    for old_item, new_item in zip(old.iter_from(start), new.iter_from(start)):
+        if old_item is not new_item:
+            break
+        start += 1
+    if start == len(old) == len(new):
+        return None
+    tail = 0
+    for old_chunk, new_chunk in zip(reversed(old_chunks), reversed(new_chunks)):
+        if old_chunk is not new_chunk or tail + len(old_chunk) > limit - start:
+            break
+        tail += len(old_chunk)
+    old_stop, new_stop = len(old) - tail, len(new) - tail
+    while old_stop > start and new_stop > start and old[old_stop - 1] is new[new_stop - 1]:
+        old_stop -= 1
+        new_stop -= 1
+    return start, old_stop, new_stop
@@ -0,0 +1,364 @@
+"""Read-only view of the whole document that follows edits incrementally.
+
+The preview shows ``AbilityDocument.to_text()``: the preamble and every entry
+as sections separated by one blank line. Instead of replacing the text after
+each edit, :class:`DocumentPreviewEdit` remembers the snapshot it shows, asks
+:func:`persistent.changed_span` which entries differ, and rewrites only those
+sections through one ``QTextCursor`` edit. Untouched blocks keep their layout,
+and the scroll position and selection stay where they were.
+
+The preview also keeps the matches of the find bar's query (see
+:mod:`text_search`). They are found once per query, on a worker thread for
+large documents, and edits only rescan the lines they touch. Only the matches
+inside the viewport are highlighted.
+"""
+
+from __future__ import annotations
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Optional
+
+from PySide6.QtCore import QPoint, QTimer, Signal
+from PySide6.QtGui import QColor, QResizeEvent, QTextCharFormat, QTextCursor
+from PySide6.QtWidgets import QPlainTextEdit, QTextEdit, QWidget
+
+from .highlighter import ViewportHighlighter
+from .models import AbilityDocument, DocumentSnapshot
+from .persistent import changed_span
+from .text_search import FindQuery, MatchSet, scan
+
+
+class DocumentPreviewEdit(QPlainTextEdit):
+    # Changes touching more entries than this share of the document are
+    # applied with one setPlainText, which is cheaper at that size.
+    FULL_RESET_SHARE = 0.5
+    # Texts longer than this (in characters) are searched on a worker thread.
+    BACKGROUND_SEARCH_CHARS = 2_000_000
+    # Edits replacing more characters than this are followed by a new search
+    # rather than a rescan of the edited lines.
+    RESCAN_LIMIT = 200_000
+
+    # Emitted when the matches of the find query change or finish computing.
+    matches_changed = Signal()
+
+    def __init__(self, parent: Optional[QWidget] = None) -> None:
+        super().__init__(parent)
+        self.setReadOnly(True)
+        self.setUndoRedoEnabled(False)
+        self._document: Optional[AbilityDocument] = None
+        self._shown: Optional[DocumentSnapshot] = None
+        # First block number of each shown section (preamble first), filled lazily.
+        self._starts: List[int] = []
+        self._highlighter = ViewportHighlighter(self)
+
+        self._query: Optional[FindQuery] = None
+        self._matches: Optional[MatchSet] = None
+        self._search_executor: Optional[ThreadPoolExecutor] = None
+        self._search_future: Optional[Future] = None
+        # Set when the text changes while a background search is running.
+        self._search_stale = False
+        self._replacing_text = False
+        self._search_timer = QTimer(self)
+        self._search_timer.setInterval(50)
+        self._search_timer.timeout.connect(self._poll_search)
+        self._match_format = QTextCharFormat()
+        self._match_format.setBackground(QColor("#fff59d"))
+        self._current_match_format = QTextCharFormat()
+        self._current_match_format.setBackground(QColor("#ffb74d"))
+        # Scrolling can happen inside setExtraSelections, so highlights follow
+        # the viewport from the event loop rather than from the signal.
+        self._highlight_timer = QTimer(self)
+        self._highlight_timer.setSingleShot(True)
+        self._highlight_timer.setInterval(0)
+        self._highlight_timer.timeout.connect(self._update_match_highlights)
+        self.document().contentsChange.connect(self._on_contents_change)
+        self.verticalScrollBar().valueChanged.connect(self._highlight_timer.start)
+
+    @property
+    def shown(self) -> Optional[DocumentSnapshot]:
+        """The document state currently on screen."""
+        return self._shown
+
+    def show_document(self, document: Optional[AbilityDocument]) -> None:
+        """Bring the text up to date with *document*, rewriting only what changed."""
+        if document is None:
+            self._document = None
+            self._shown = None
+            self._starts = []
+            self._set_text("")
+            return
+        shown = self._shown
+        snapshot = document.snapshot()
+        if shown is None or document is not self._document or shown.preamble != snapshot.preamble:
+            self._reset(document, snapshot)
+            return
+        if shown.version == snapshot.version:
+            return
+        span = changed_span(shown.entries, snapshot.entries)
+        if span is None:
+            self._shown = snapshot
+            return
+        start, old_stop, new_stop = span
+        if (old_stop - start) + (new_stop - start) > len(snapshot.entries) * self.FULL_RESET_SHARE * 2:
+            self._reset(document, snapshot)
+            return
+        self._replace(snapshot, start, old_stop, new_stop)
+
+    # ------------------------------------------------------------------ find
+    @property
+    def find_query(self) -> Optional[FindQuery]:
+        return self._query
+
+    @property
+    def matches(self) -> Optional[MatchSet]:
+        """Matches of the find query, or None while they are being computed."""
+        return self._matches
+
+    @property
+    def searching(self) -> bool:
+        return self._search_future is not None
+
+    def set_find_query(self, query: Optional[FindQuery]) -> None:
+        """Find and highlight every match of *query*; None clears the highlights.
+
+        Raises :class:`text_search.FindError` for an invalid regular expression.
+        """
+        matches = MatchSet(query) if query is not None and query.text else None
+        self._query = matches.query if matches is not None else None
+        self._matches = None
+        self._search_stale = False
+        if matches is not None:
+            text = self._search_text()
+            if len(text) > self.BACKGROUND_SEARCH_CHARS:
+                self._start_search(text)
+            else:
+                self._matches = MatchSet.search(matches.query, text)
+        self._update_match_highlights()
+        self.matches_changed.emit()
+
+    def current_match(self) -> Optional[int]:
+        """Index of the match that is selected, if the selection is exactly one."""
+        if not self._matches:
+            return None
+        cursor = self.textCursor()
+        return self._matches.index_of(cursor.selectionStart(), cursor.selectionEnd())
+
+    def find_match(self, backward: bool = False, include_current: bool = False) -> Optional[int]:
+        """Select the match after (or before) the selection and return its index.
+
+        With *include_current* a match starting where the selection starts is
+        taken too, so refining the query keeps the same place.
+        """
+        matches = self._matches
+        if not matches:
+            return None
+        cursor = self.textCursor()
+        if backward:
+            index = matches.previous_index(cursor.selectionStart())
+        elif include_current:
+            index = matches.next_index(cursor.selectionStart())
+        else:
+            index = matches.next_index(cursor.selectionEnd())
+        assert index is not None
+        start, end = matches.span(index)
+        cursor.setPosition(start)
+        cursor.setPosition(end, QTextCursor.KeepAnchor)
+        self.setTextCursor(cursor)
+        self._update_match_highlights()
+        return index
+
+    def _search_text(self) -> str:
+        # The document's cached text is what is on screen once it is shown.
+        document, shown = self._document, self._shown
+        if document is not None and shown is not None and shown.version == document.version:
+            return document.to_text()
+        return self.toPlainText()
+
+    def _start_search(self, text: str) -> None:
+        assert self._query is not None
+        if self._search_executor is None:
+            self._search_executor = ThreadPoolExecutor(max_workers=1)
+        self._search_stale = False
+        self._search_future = self._search_executor.submit(MatchSet.search, self._query, text)
+        self._search_timer.start()
+
+    def _poll_search(self) -> None:
+        future = self._search_future
+        if future is None or not future.done():
+            return
+        self._search_timer.stop()
+        self._search_future = None
+        if future.cancelled() or self._query is None:
+            return
+        result = future.result()
+        if self._search_stale or result.query != self._query:
+            self._start_search(self._search_text())
+            return
+        self._matches = result
+        self._update_match_highlights()
+        self.matches_changed.emit()
+
+    def _on_contents_change(self, position: int, removed: int, added: int) -> None:
+        if self._query is None or self._replacing_text:
+            return
+        if self._search_future is not None:
+            self._search_stale = True
+            return
+        matches = self._matches
+        if matches is None:
+            return
+        if removed + added > self.RESCAN_LIMIT:
+            self.set_find_query(self._query)
+            return
+        # Rescan the edited lines, widened to any old match they cut into.
+        # Matches that would reach past those lines (multi-line regexes) are
+        # picked up by the next full search.
+        delta = added - removed
+        text_document = self.document()
+        low, high = position, position + added
+        while True:
+            block = text_document.findBlock(low)
+            new_low = block.position()
+            block = text_document.findBlock(high)
+            new_high = block.position() + max(0, block.length() - 1)
+            first, last = matches.overlapping(new_low, new_high - delta)
+            if first < last:
+                new_low = min(new_low, matches.starts[first])
+                end = matches.ends[last - 1]
+                if end > position:
+                    end = end + delta if end >= position + removed else position + added
+                new_high = max(new_high, end)
+            if (new_low, new_high) == (low, high):
+                break
+            low, high = new_low, new_high
+        cursor = QTextCursor(text_document)
+        cursor.setPosition(low)
+        cursor.setPosition(high, QTextCursor.KeepAnchor)
+        starts, ends = scan(matches.pattern, cursor.selectedText().replace("\u2029", "\n"), low)
+        matches.splice(first, last, starts, ends, delta)
+        self._update_match_highlights()
+        self.matches_changed.emit()
+
+    def _update_match_highlights(self) -> None:
+        matches = self._matches
+        selections: List[QTextEdit.ExtraSelection] = []
+        if matches:
+            top = self.firstVisibleBlock().position()
+            viewport = self.viewport()
+            bottom = self.cursorForPosition(QPoint(viewport.width() - 1, viewport.height() - 1)).block()
+            first, last = matches.overlapping(top, bottom.position() + bottom.length())
+            cursor = self.textCursor()
+            current = (cursor.selectionStart(), cursor.selectionEnd())
+            text_document = self.document()
+            for index in range(first, last):
+                start, end = matches.span(index)
+                highlight = QTextCursor(text_document)
+                highlight.setPosition(start)
+                highlight.setPosition(end, QTextCursor.KeepAnchor)
+                selection = QTextEdit.ExtraSelection()
+                selection.cursor = highlight
+                selection.format = self._current_match_format if (start, end) == current else self._match_format
+                selections.append(selection)
+        self.setExtraSelections(selections)
+
+    def resizeEvent(self, event: QResizeEvent) -> None:
+        super().resizeEvent(event)
+        self._highlight_timer.start()
+
+    # ------------------------------------------------------------------ internals
+    def _reset(self, document: AbilityDocument, snapshot: DocumentSnapshot) -> None:
+        scroll = self.verticalScrollBar().value()
+        self._document = document
+        self._shown = snapshot
+        self._starts = []
+        self._set_text(document.to_text())
+        self.verticalScrollBar().setValue(min(scroll, self.verticalScrollBar().maximum()))
+
+    def _set_text(self, text: str) -> None:
+        # contentsChange arrives while setPlainText is still rebuilding the
+        # blocks, so the matches are recomputed once it is done instead.
+        self._replacing_text = True
+        try:
+            self.setPlainText(text)
+        finally:
+            self._replacing_text = False
+        if self._query is not None:
+            self.set_find_query(self._query)
+
+    def _head(self, snapshot: DocumentSnapshot) -> int:
+        return 1 if snapshot.preamble else 0
+
+    def _section(self, snapshot: DocumentSnapshot, index: int) -> str:
+        head = self._head(snapshot)
+        if index < head:
+            return "\n".join(snapshot.preamble).rstrip()
+        return snapshot.entries[index - head].rendered()
+
+    def _block_of(self, index: int) -> int:
+        """First block of shown section *index* (which must exist)."""
+        starts = self._starts
+        shown = self._shown
+        assert shown is not None
+        if not starts:
+            starts.append(0)
+        while len(starts) <= index:
+            previous = len(starts) - 1
+            starts.append(starts[previous] + self._section(shown, previous).count("\n") + 2)
+        return starts[index]
+
+    def _replace(self, snapshot: DocumentSnapshot, start: int, old_stop: int, new_stop: int) -> None:
+        shown = self._shown
+        assert shown is not None
+        head = self._head(snapshot)
+        first, old_last = start + head, old_stop + head
+        old_count = len(shown.entries) + head
+        sections = [entry.rendered() for entry in snapshot.entries[start:new_stop]]
+        text_document = self.document()
+
+        if first < old_count:
+            begin = text_document.findBlockByNumber(self._block_of(first)).position()
+            if old_last < old_count:
+                end = text_document.findBlockByNumber(self._block_of(old_last)).position()
+                text = "".join(section + "\n\n" for section in sections)
+            else:
+                end = text_document.characterCount() - 1
+                text = "\n\n".join(sections)
+                if not sections and first:
+                    begin -= 2  # also drop the blank line that led into the removed tail
+        else:
+            begin = end = text_document.characterCount() - 1
+            text = ("\n\n" if first else "") + "\n\n".join(sections)
+
+        scrollbar = self.verticalScrollBar()
+        top = self.firstVisibleBlock()
+        top_number, top_position = top.blockNumber(), top.position()
+        top_offset = scrollbar.value() - top.firstLineNumber()
+        blocks_before = text_document.blockCount()
+
+        cursor = QTextCursor(text_document)
+        cursor.setPosition(begin)
+        cursor.setPosition(end, QTextCursor.KeepAnchor)
+        cursor.beginEditBlock()
+        cursor.insertText(text)
+        cursor.endEditBlock()
+
+        self._shown = snapshot
+        starts = self._starts
+        if first < len(starts):
+            # Sections after the edit keep their cached starts, shifted by the
+            # change in block count, instead of being recounted later.
+            position = starts[first]
+            replaced = []
+            for section in sections:
+                replaced.append(position)
+                position += section.count("\n") + 2
+            if old_last < len(starts):
+                shift = position - starts[old_last]
+                replaced.extend(start + shift for start in starts[old_last:])
+            starts[first:] = replaced
+        if begin < top_position:
+            # The edit started above the viewport: keep the same text on screen.
+            shifted = top_number + text_document.blockCount() - blocks_before
+            block = text_document.findBlockByNumber(max(0, shifted))
+            if block.isValid():
+                scrollbar.setValue(block.firstLineNumber() + max(0, top_offset))
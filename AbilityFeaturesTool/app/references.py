@@ -0,0 +1,201 @@
+"""Inverted index of what entries refer to, for "find usages".
+
+References are read from the parsed entry body (see ``entry_parser``):
+
+``id``       IDs compared or tested in formulas: ``AbilityId == 44`` gives
+             ``AbilityId 44``, ``HasSA(33)`` gives ``SA 33``, and the numeric
+             results of a ``[code=Patch]`` block give ``AbilityId N``
+``status``   ``BattleStatus_Doom`` in formulas and ``InitialStatus Doom``-style
+             scope arguments, both as ``Doom``
+``scope``    scope keywords (``StatusInit``, ``BattleStart`` …)
+``keyword``  feature keywords following a scope (``AsTarget``, ``EvenImmobilized`` …)
+``block``    ``[code=...]`` block names
+``constant`` other enumeration constants (``RegularItem_Avenger`` …)
+
+Names are matched case-insensitively. Entries are keyed by ``id(entry)`` like
+the document's other indexes, and the document keeps the index in step with
+every edit, one entry at a time.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, Iterable, List, Set, Tuple
+import re
+
+from . import ability_data
+from .models import AbilityEntry
+
+
+REFERENCE_KINDS = ("id", "status", "scope", "keyword", "block", "constant")
+
+KIND_LABELS = {
+    "id": "Referenced ID",
+    "status": "Status",
+    "scope": "Scope",
+    "keyword": "Feature keyword",
+    "block": "Block",
+    "constant": "Constant",
+}
+
+ReferenceKey = Tuple[str, str]
+
+_STATUS_PREFIXES = ("BattleStatus_", "BattleStatusId_")
+_ID_COMPARISON = re.compile(r"\b([A-Za-z_][A-Za-z0-9_]*Id)\s*(?:==|!=|<>|=)\s*(\d+)\b")
+_ID_COMPARISON_REVERSED = re.compile(r"\b(\d+)\s*(?:==|!=|<>|=)\s*([A-Za-z_][A-Za-z0-9_]*Id)\b")
+_ID_CALL = re.compile(r"\bHas(SA|AA)\s*\(\s*(\d+)\s*\)")
+# A number that is a whole result of a Patch expression: alone, or a ternary branch.
+_PATCH_RESULT = re.compile(r"(?:^|[?:])\s*(\d+)\s*(?=$|[?:)])")
+_CONSTANT = re.compile(
+    r"\b((?:" + "|".join(re.escape(prefix) for prefix in ability_data.NCALC_CONSTANT_PREFIXES) + r")[A-Za-z0-9_]+)"
+)
+
+
+@dataclass
+class Reference:
+    kind: str
+    name: str
+    # Index into ``body_lines``.
+    line: int
+    key: ReferenceKey = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        self.key = (self.kind, self.name.lower())
+
+
+@lru_cache(maxsize=1 << 14)
+def expression_references(block: str, expression: str) -> Tuple[Tuple[str, str], ...]:
+    """``(kind, name)`` pairs mentioned by one ``[code=block]`` expression."""
+    found: List[Tuple[str, str]] = []
+    for match in _ID_COMPARISON.finditer(expression):
+        found.append(("id", f"{match.group(1)} {int(match.group(2))}"))
+    for match in _ID_COMPARISON_REVERSED.finditer(expression):
+        found.append(("id", f"{match.group(2)} {int(match.group(1))}"))
+    for match in _ID_CALL.finditer(expression):
+        found.append(("id", f"{match.group(1)} {int(match.group(2))}"))
+    if block == "Patch":
+        for match in _PATCH_RESULT.finditer(expression):
+            found.append(("id", f"AbilityId {int(match.group(1))}"))
+    for match in _CONSTANT.finditer(expression):
+        name = match.group(1)
+        status = _status_name(name)
+        found.append(("status", status) if status else ("constant", name))
+    return tuple(dict.fromkeys(found))
+
+
+def entry_references(entry: AbilityEntry) -> Tuple[Reference, ...]:
+    """Every reference in *entry*, once per ``(kind, name)`` at its first line.
+
+    Scope references come first, then block references, each in body order.
+    """
+    parsed = entry.parsed()
+    found: Dict[ReferenceKey, Reference] = {}
+
+    def note(kind: str, name: str, line: int) -> None:
+        if (kind, name.lower()) not in found:
+            reference = Reference(kind, name, line)
+            found[reference.key] = reference
+
+    for scope in parsed.scopes:
+        note("scope", scope.keyword, scope.line)
+        status_argument = False
+        for word in scope.keywords:
+            if status_argument:
+                note("status", _status_name(word) or word, scope.line)
+                status_argument = False
+            elif word.isidentifier():
+                note("keyword", word, scope.line)
+                status_argument = word.endswith("Status")
+    for block in parsed.blocks:
+        note("block", block.name, block.line)
+        for kind, name in expression_references(block.name, block.expression):
+            note(kind, name, block.line)
+    return tuple(found.values())
+
+
+class ReferenceIndex:
+    """``(kind, name)`` -> entries that mention it; ``version`` changes on every update."""
+
+    def __init__(self, entries: Iterable[AbilityEntry] = ()) -> None:
+        self.version = 0
+        self._entries: Dict[int, AbilityEntry] = {}
+        self._references: Dict[int, Tuple[Reference, ...]] = {}
+        self._postings: Dict[ReferenceKey, Set[int]] = {}
+        # kind -> lower-cased name -> name as first seen
+        self._names: Dict[str, Dict[str, str]] = {kind: {} for kind in REFERENCE_KINDS}
+        for entry in entries:
+            self.add(entry)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def entry(self, entry_id: int) -> AbilityEntry:
+        return self._entries[entry_id]
+
+    # ------------------------------------------------------------------ upkeep
+    def add(self, entry: AbilityEntry) -> None:
+        entry_id = id(entry)
+        if entry_id in self._entries:
+            self.discard(self._entries[entry_id])
+        references = entry_references(entry)
+        self._entries[entry_id] = entry
+        self._references[entry_id] = references
+        for reference in references:
+            key = reference.key
+            bucket = self._postings.get(key)
+            if bucket is None:
+                bucket = self._postings[key] = set()
+                self._names[reference.kind][key[1]] = reference.name
+            bucket.add(entry_id)
+        self.version += 1
+
+    def discard(self, entry: AbilityEntry) -> None:
+        entry_id = id(entry)
+        references = self._references.pop(entry_id, None)
+        if references is None:
+            return
+        del self._entries[entry_id]
+        for reference in references:
+            key = reference.key
+            bucket = self._postings[key]
+            bucket.discard(entry_id)
+            if not bucket:
+                del self._postings[key]
+                del self._names[reference.kind][key[1]]
+        self.version += 1
+
+    # ------------------------------------------------------------------ queries
+    def usages(self, kind: str, name: str) -> Set[int]:
+        """``id()`` of every entry referring to *name* as a *kind*."""
+        return set(self._postings.get((kind, name.lower()), ()))
+
+    def references(self, entry: AbilityEntry) -> Tuple[Reference, ...]:
+        return self._references.get(id(entry), ())
+
+    def reference_in(self, entry: AbilityEntry, kind: str, name: str) -> Reference:
+        """The reference that made *entry* a usage of ``(kind, name)``."""
+        key = (kind, name.lower())
+        return next(reference for reference in self.references(entry) if reference.key == key)
+
+    def names(self, kind: str) -> List[Tuple[str, int]]:
+        """Names referenced as *kind* with their entry counts, in natural order."""
+        names = [(name, len(self._postings[(kind, lowered)])) for lowered, name in self._names[kind].items()]
+        names.sort(key=lambda item: _natural_key(item[0]))
+        return names
+
+    def kinds_of(self, name: str) -> List[str]:
+        """Kinds under which *name* is referenced, in ``REFERENCE_KINDS`` order."""
+        lowered = name.lower()
+        return [kind for kind in REFERENCE_KINDS if lowered in self._names[kind]]
+
+
+def _status_name(word: str) -> str:
+    for prefix in _STATUS_PREFIXES:
+        if word.startswith(prefix):
+            return word[len(prefix):]
+    return ""
+
+
+def _natural_key(name: str) -> Tuple[object, ...]:
+    return tuple(int(part) if part.isdigit() else part.lower() for part in re.split(r"(\d+)", name))
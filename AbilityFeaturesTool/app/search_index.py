@@ -0,0 +1,279 @@
+"""Inverted index and query syntax for searching AbilityFeatures entries.
+
+Queries are whitespace separated terms. Plain terms (or ``"quoted phrases"``)
+must all appear, case-insensitively, somewhere in the entry's header or body.
+Field terms narrow the search further:
+
+``type:SA``          entry type key (``SA``, ``SA_GLOBAL``, ``AA_GLOBAL`` …)
+``id:12``            ability ID from the header; ranges such as ``id:10-20`` work too
+``scope:StatusInit`` a body line starting with that scope keyword
+``block:Patch``      a ``[code=Patch]`` block
+
+Repeating a field (``type:SA type:AA``) or separating values with commas
+(``type:SA,AA``) accepts any of them.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple, Union
+import re
+import shlex
+
+from .models import AbilityEntry, parse_header
+
+
+QUERY_FIELDS = ("type", "id", "scope", "block")
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9_]+")
+_ID_RANGE_PATTERN = re.compile(r"^(\d+)(?:-(\d+))?$")
+_GRAM = 3
+
+
+@dataclass
+class SearchQuery:
+    types: List[str] = field(default_factory=list)
+    ids: List[Tuple[int, int]] = field(default_factory=list)
+    scopes: List[str] = field(default_factory=list)
+    blocks: List[str] = field(default_factory=list)
+    terms: List[str] = field(default_factory=list)
+    invalid: bool = False
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.types or self.ids or self.scopes or self.blocks or self.terms or self.invalid)
+
+    @classmethod
+    def parse(cls, text: str) -> "SearchQuery":
+        try:
+            words = shlex.split(text)
+        except ValueError:
+            words = text.split()
+        query = cls()
+        for word in words:
+            name, sep, value = word.partition(":")
+            name = name.lower()
+            if not sep or name not in QUERY_FIELDS or not value:
+                term = word.lower()
+                if term:
+                    query.terms.append(term)
+                continue
+            for part in filter(None, value.split(",")):
+                query._add_field(name, part)
+        return query
+
+    def _add_field(self, name: str, value: str) -> None:
+        if name == "type":
+            self.types.append(value.upper())
+        elif name == "id":
+            match = _ID_RANGE_PATTERN.match(value)
+            if not match:
+                self.invalid = True
+                return
+            low = int(match.group(1))
+            high = int(match.group(2)) if match.group(2) else low
+            self.ids.append((min(low, high), max(low, high)))
+        elif name == "scope":
+            self.scopes.append(value.lower())
+        elif name == "block":
+            self.blocks.append(value.lower())
+
+
+def entry_scopes(entry: AbilityEntry) -> FrozenSet[str]:
+    """Lower-cased scope keywords (``StatusInit``, ``Ability`` …) used by the entry."""
+    return frozenset(scope.keyword.lower() for scope in entry.parsed().scopes)
+
+
+def entry_blocks(entry: AbilityEntry) -> FrozenSet[str]:
+    """Lower-cased names of the ``[code=...]`` blocks used by the entry."""
+    return frozenset(block.name.lower() for block in entry.parsed().blocks)
+
+
+@dataclass(frozen=True)
+class _Indexed:
+    tokens: FrozenSet[str]
+    type_key: Optional[str]
+    ability_id: Optional[int]
+    scopes: FrozenSet[str]
+    blocks: FrozenSet[str]
+
+
+class SearchIndex:
+    """Token postings plus a trigram index over the token vocabulary.
+
+    Entries are keyed by ``id(entry)`` like the document's own indexes. A plain
+    term is answered by finding every vocabulary token containing it (via the
+    trigram index) and uniting their postings; field terms are direct lookups.
+    ``version`` changes on every update so callers can cache query results.
+    """
+
+    def __init__(self, entries: Iterable[AbilityEntry] = ()) -> None:
+        self.version = 0
+        self._entries: Dict[int, AbilityEntry] = {}
+        self._indexed: Dict[int, _Indexed] = {}
+        self._postings: Dict[str, Set[int]] = {}
+        self._grams: Dict[str, Set[str]] = {}
+        self._types: Dict[str, Set[int]] = {}
+        self._ids: Dict[int, Set[int]] = {}
+        self._scopes: Dict[str, Set[int]] = {}
+        self._blocks: Dict[str, Set[int]] = {}
+        for entry in entries:
+            self.add(entry)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def entry(self, entry_id: int) -> AbilityEntry:
+        return self._entries[entry_id]
+
+    # ------------------------------------------------------------------ upkeep
+    def add(self, entry: AbilityEntry) -> None:
+        entry_id = id(entry)
+        if entry_id in self._entries:
+            self.discard(self._entries[entry_id])
+        key = parse_header(entry.header)
+        text = entry.search_text()
+        indexed = _Indexed(
+            tokens=frozenset(_TOKEN_PATTERN.findall(text)),
+            type_key=key[0] if key else None,
+            ability_id=key[1] if key else None,
+            scopes=entry_scopes(entry),
+            blocks=entry_blocks(entry),
+        )
+        self._entries[entry_id] = entry
+        self._indexed[entry_id] = indexed
+        postings = self._postings
+        for token in indexed.tokens:
+            bucket = postings.get(token)
+            if bucket is None:
+                bucket = postings[token] = set()
+                for gram in _grams(token):
+                    self._grams.setdefault(gram, set()).add(token)
+            bucket.add(entry_id)
+        if indexed.type_key is not None:
+            self._types.setdefault(indexed.type_key, set()).add(entry_id)
+        if indexed.ability_id is not None:
+            self._ids.setdefault(indexed.ability_id, set()).add(entry_id)
+        for scope in indexed.scopes:
+            self._scopes.setdefault(scope, set()).add(entry_id)
+        for block in indexed.blocks:
+            self._blocks.setdefault(block, set()).add(entry_id)
+        self.version += 1
+
+    def discard(self, entry: AbilityEntry) -> None:
+        entry_id = id(entry)
+        indexed = self._indexed.pop(entry_id, None)
+        if indexed is None:
+            return
+        del self._entries[entry_id]
+        for token in indexed.tokens:
+            bucket = self._postings[token]
+            bucket.discard(entry_id)
+            if not bucket:
+                del self._postings[token]
+                for gram in _grams(token):
+                    tokens = self._grams[gram]
+                    tokens.discard(token)
+                    if not tokens:
+                        del self._grams[gram]
+        _drop(self._types, indexed.type_key, entry_id)
+        _drop(self._ids, indexed.ability_id, entry_id)
+        for scope in indexed.scopes:
+            _drop(self._scopes, scope, entry_id)
+        for block in indexed.blocks:
+            _drop(self._blocks, block, entry_id)
+        self.version += 1
+
+    # ------------------------------------------------------------------ queries
+    def match(self, query: Union[str, SearchQuery]) -> Set[int]:
+        """``id()`` of every indexed entry matching *query*."""
+        if isinstance(query, str):
+            query = SearchQuery.parse(query)
+        if query.invalid:
+            return set()
+        if query.is_empty:
+            return set(self._entries)
+
+        candidates: List[Set[int]] = []
+        if query.types:
+            candidates.append(_union(self._types.get(value) for value in query.types))
+        if query.ids:
+            candidates.append(self._match_ids(query.ids))
+        if query.scopes:
+            candidates.append(_union(self._scopes.get(value) for value in query.scopes))
+        if query.blocks:
+            candidates.append(_union(self._blocks.get(value) for value in query.blocks))
+        unverified: List[str] = []
+        for term in query.terms:
+            pieces = _TOKEN_PATTERN.findall(term)
+            for piece in pieces:
+                candidates.append(_union(self._postings[token] for token in self.tokens_containing(piece)))
+            # A lone word-character term is answered exactly by the token lookup.
+            if pieces != [term]:
+                unverified.append(term)
+
+        if candidates:
+            candidates.sort(key=len)
+            result = set(candidates[0])
+            for other in candidates[1:]:
+                if not result:
+                    break
+                result &= other
+        else:
+            result = set(self._entries)
+        if unverified and result:
+            entries = self._entries
+            result = {
+                entry_id
+                for entry_id in result
+                if all(term in entries[entry_id].search_text() for term in unverified)
+            }
+        return result
+
+    def tokens_containing(self, fragment: str) -> Set[str]:
+        """Vocabulary tokens that contain *fragment* (already lower-cased)."""
+        if len(fragment) < _GRAM:
+            return {token for token in self._postings if fragment in token}
+        smallest: Optional[Set[str]] = None
+        for gram in _grams(fragment):
+            tokens = self._grams.get(gram)
+            if not tokens:
+                return set()
+            if smallest is None or len(tokens) < len(smallest):
+                smallest = tokens
+        assert smallest is not None
+        return {token for token in smallest if fragment in token}
+
+    def _match_ids(self, ranges: List[Tuple[int, int]]) -> Set[int]:
+        result: Set[int] = set()
+        for low, high in ranges:
+            if high - low < len(self._ids):
+                for ability_id in range(low, high + 1):
+                    result.update(self._ids.get(ability_id, ()))
+            else:
+                for ability_id, members in self._ids.items():
+                    if low <= ability_id <= high:
+                        result.update(members)
+        return result
+
+
+def _grams(token: str) -> Set[str]:
+    return {token[idx:idx + _GRAM] for idx in range(len(token) - _GRAM + 1)}
+
+
+def _union(buckets: Iterable[Optional[Set[int]]]) -> Set[int]:
+    result: Set[int] = set()
+    for bucket in buckets:
+        if bucket:
+            result.update(bucket)
+    return result
+
+
+def _drop(index: Dict, key: object, entry_id: int) -> None:
+    if key is None:
+        return
+    members = index.get(key)
+    if members is not None:
+        members.discard(entry_id)
+        if not members:
+            del index[key]
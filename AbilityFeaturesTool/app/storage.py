@@ -0,0 +1,148 @@
+"""Atomic, change-aware writes for AbilityFeatures files."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Optional
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+
+
+HASH_CHUNK_SIZE = 1 << 20
+
+
+def new_hasher() -> "hashlib.blake2b":
+    return hashlib.blake2b(digest_size=20)
+
+
+@dataclass(frozen=True)
+class FileFingerprint:
+    """Identity of a file on disk at the time it was read or written."""
+
+    path: Path
+    size: int
+    mtime_ns: int
+    digest: str
+
+    @classmethod
+    def of(cls, path: Path) -> Optional["FileFingerprint"]:
+        """Hash *path* as it is now, or ``None`` when it does not exist."""
+        try:
+            with path.open("rb") as handle:
+                stat = os.fstat(handle.fileno())
+                hasher = new_hasher()
+                for chunk in iter(lambda: handle.read(HASH_CHUNK_SIZE), b""):
+                    hasher.update(chunk)
+        except FileNotFoundError:
+            return None
+        return cls(path=path, size=stat.st_size, mtime_ns=stat.st_mtime_ns, digest=hasher.hexdigest())
+
+    def matches_stat(self, stat: os.stat_result) -> bool:
+        return stat.st_size == self.size and stat.st_mtime_ns == self.mtime_ns
+
+
+class ExternalChangeError(Exception):
+    """Raised when the target file changed on disk since it was loaded."""
+
+    def __init__(self, path: Path, current: Optional[FileFingerprint]) -> None:
+        super().__init__(f"{path} was modified outside the editor since it was loaded")
+        self.path = path
+        self.current = current
+
+
+@dataclass(frozen=True)
+class SaveResult:
+    path: Path
+    bytes_written: int
+    elapsed: float
+    skipped: bool
+    fingerprint: FileFingerprint
+
+
+def save_atomic(
+    path: Path,
+    chunks: Iterable[bytes],
+    *,
+    expected: Optional[FileFingerprint] = None,
+    force: bool = False,
+) -> SaveResult:
+    """Write *chunks* to *path* through a temp file, fsync and atomic rename.
+
+    ``expected`` is the fingerprint recorded when the document was loaded (or last
+    saved). Unless ``force`` is set, an :class:`ExternalChangeError` is raised when
+    the file on disk no longer matches it. Nothing is written when the new
+    content hashes the same as the file already on disk.
+    """
+    started = time.perf_counter()
+    parts = list(chunks)
+    hasher = new_hasher()
+    for part in parts:
+        hasher.update(part)
+    digest = hasher.hexdigest()
+
+    if expected is not None and expected.path != path:
+        expected = None
+    current = _current_fingerprint(path, expected)
+    if expected is not None and not force and (current is None or current.digest != expected.digest):
+        raise ExternalChangeError(path, current)
+    if current is not None and current.digest == digest:
+        return SaveResult(path, 0, time.perf_counter() - started, True, current)
+
+    written = 0
+    fd, temp_name = tempfile.mkstemp(dir=str(path.parent), prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            for part in parts:
+                written += handle.write(part)
+            handle.flush()
+            os.fsync(handle.fileno())
+        if current is not None:
+            shutil.copymode(path, temp_name)
+        os.replace(temp_name, path)
+    except BaseException:
+        try:
+            os.unlink(temp_name)
+        except OSError:
+            pass
+        raise
+    _fsync_directory(path.parent)
+    stat = path.stat()
+    fingerprint = FileFingerprint(path=path, size=stat.st_size, mtime_ns=stat.st_mtime_ns, digest=digest)
+    return SaveResult(path, written, time.perf_counter() - started, False, fingerprint)
+
+
+def _current_fingerprint(path: Path, expected: Optional[FileFingerprint]) -> Optional[FileFingerprint]:
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    if expected is not None and expected.path == path and expected.matches_stat(stat):
+        return expected
+    return FileFingerprint.of(path)
+
+
+def _fsync_directory(directory: Path) -> None:
+    if os.name != "posix":
+        return
+    try:
+        fd = os.open(str(directory), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def format_size(count: int) -> str:
+    if count < 1024:
+        return f"{count} bytes"
+    if count < 1024 * 1024:
+        return f"{count / 1024:.1f} KB"
+    return f"{count / (1024 * 1024):.1f} MB"
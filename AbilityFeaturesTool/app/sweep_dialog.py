@@ -0,0 +1,265 @@
+"""Dialog for sweeping an NCalc formula over ranges of input stats.
+
+Imported lazily by the main window because it needs NumPy.
+"""
+
+from __future__ import annotations
+
+from typing import List, Optional, Tuple
+
+import numpy as np
+from PySide6.QtCore import Qt
+from PySide6.QtGui import QImage, QPixmap
+from PySide6.QtWidgets import (
+    QComboBox,
+    QDialog,
+    QDialogButtonBox,
+    QDoubleSpinBox,
+    QFormLayout,
+    QHBoxLayout,
+    QHeaderView,
+    QLabel,
+    QLineEdit,
+    QMessageBox,
+    QPushButton,
+    QSpinBox,
+    QStackedWidget,
+    QTableWidget,
+    QTableWidgetItem,
+    QVBoxLayout,
+    QWidget,
+)
+
+from . import ability_data, ncalc, ncalc_sweep
+
+
+DEFAULT_RANGE = (0.0, 100.0)
+DEFAULT_STEPS = 101
+MAX_TABLE_ROWS = 500
+HEATMAP_SIZE = (480, 360)
+
+# Dark blue -> teal -> yellow, interpolated into a 256 entry lookup table.
+_PALETTE_STOPS = np.array([[48, 18, 59], [33, 145, 140], [94, 201, 98], [253, 231, 37]], dtype=np.float64)
+_PALETTE_POSITIONS = np.linspace(0, len(_PALETTE_STOPS) - 1, 256)
+_PALETTE = np.stack(
+    [np.interp(_PALETTE_POSITIONS, np.arange(len(_PALETTE_STOPS)), _PALETTE_STOPS[:, c]) for c in range(3)],
+    axis=1,
+).astype(np.uint8)
+
+
+class FormulaSweepDialog(QDialog):
+    """Evaluates a formula over a grid of stat values and shows a table or heatmap.
+
+    Each identifier of the formula gets a From/To/Steps row; one step keeps it
+    constant at From. The first two stat variables are swept by default; named
+    constants such as ``BattleStatus_Trance`` never are, and need their value
+    entered. One swept input yields a table of results, two yield a heatmap.
+    Further swept inputs are folded into the heatmap by their maximum.
+    """
+
+    def __init__(
+        self,
+        formulas: List[Tuple[str, str]],
+        current: int = 0,
+        parent: Optional[QWidget] = None,
+    ) -> None:
+        super().__init__(parent)
+        self.setWindowTitle("Sweep formula")
+        self.resize(760, 720)
+        self._image: Optional[QImage] = None
+        self._result: Optional[ncalc_sweep.SweepResult] = None
+
+        layout = QVBoxLayout(self)
+        form = QFormLayout()
+        self.block_combo = QComboBox()
+        for name, expression in formulas:
+            self.block_combo.addItem(f"[code={name}] {expression}", expression)
+        self.block_combo.currentIndexChanged.connect(self._on_block_changed)
+        form.addRow("Block", self.block_combo)
+        self.formula_edit = QLineEdit()
+        self.formula_edit.editingFinished.connect(self._refresh_inputs)
+        form.addRow("Formula", self.formula_edit)
+        layout.addLayout(form)
+
+        self.input_table = QTableWidget(0, 4)
+        self.input_table.setHorizontalHeaderLabels(["Input", "From", "To", "Steps"])
+        self.input_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.input_table.verticalHeader().setVisible(False)
+        self.input_table.setMaximumHeight(200)
+        layout.addWidget(self.input_table)
+
+        run_row = QHBoxLayout()
+        self.points_label = QLabel()
+        run_row.addWidget(self.points_label, 1)
+        run_btn = QPushButton("Evaluate")
+        run_btn.setDefault(True)
+        run_btn.clicked.connect(self._run)
+        run_row.addWidget(run_btn)
+        layout.addLayout(run_row)
+
+        self.summary_label = QLabel("Set the input ranges and press Evaluate.")
+        self.summary_label.setWordWrap(True)
+        layout.addWidget(self.summary_label)
+
+        self.output_stack = QStackedWidget()
+        self.result_table = QTableWidget(0, 2)
+        self.result_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.result_table.verticalHeader().setVisible(False)
+        self.result_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.output_stack.addWidget(self.result_table)
+        self.heatmap_label = QLabel()
+        self.heatmap_label.setAlignment(Qt.AlignCenter)
+        self.heatmap_label.setMinimumSize(*HEATMAP_SIZE)
+        self.output_stack.addWidget(self.heatmap_label)
+        layout.addWidget(self.output_stack, 1)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Close)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+
+        if formulas:
+            self.block_combo.setCurrentIndex(max(0, min(current, len(formulas) - 1)))
+            self._on_block_changed(self.block_combo.currentIndex())
+
+    # ------------------------------------------------------------------ inputs
+    def _on_block_changed(self, index: int) -> None:
+        expression = self.block_combo.itemData(index)
+        if expression is None:
+            return
+        self.formula_edit.setText(str(expression))
+        self._refresh_inputs()
+
+    def _refresh_inputs(self) -> None:
+        compiled = ncalc.compile_expression(self.formula_edit.text().strip())
+        previous = {axis.name: axis for axis in self._axes(include_constants=True)}
+        names = list(compiled.identifiers)
+        constants = [name for name in names if name.startswith(ability_data.NCALC_CONSTANT_PREFIXES)]
+        swept = [name for name in names if name not in constants][:2]
+        self.input_table.setRowCount(len(names))
+        for row, name in enumerate(names):
+            axis = previous.get(name)
+            if axis is None and name in constants:
+                axis = ncalc_sweep.SweepAxis(name, 0.0, 0.0, 1)
+            elif axis is None:
+                steps = DEFAULT_STEPS if name in swept else 1
+                axis = ncalc_sweep.SweepAxis(name, DEFAULT_RANGE[0], DEFAULT_RANGE[1], steps)
+            item = QTableWidgetItem(name)
+            item.setFlags(item.flags() & ~Qt.ItemIsEditable)
+            if name in constants:
+                item.setToolTip("A named constant: enter its value in From.")
+            self.input_table.setItem(row, 0, item)
+            for column, value in ((1, axis.start), (2, axis.stop)):
+                spin = QDoubleSpinBox()
+                spin.setRange(-1e9, 1e9)
+                spin.setDecimals(2)
+                spin.setValue(value)
+                self.input_table.setCellWidget(row, column, spin)
+            steps_spin = QSpinBox()
+            steps_spin.setRange(1, 100_000)
+            steps_spin.setValue(axis.steps)
+            steps_spin.valueChanged.connect(self._update_point_count)
+            self.input_table.setCellWidget(row, 3, steps_spin)
+        if constants:
+            self.summary_label.setText(
+                f"Enter the value of {', '.join(constants)} in From; named constants are not swept."
+            )
+        self._update_point_count()
+
+    def _axes(self, *, include_constants: bool = False) -> List[ncalc_sweep.SweepAxis]:
+        axes: List[ncalc_sweep.SweepAxis] = []
+        for row in range(self.input_table.rowCount()):
+            name_item = self.input_table.item(row, 0)
+            start = self.input_table.cellWidget(row, 1)
+            stop = self.input_table.cellWidget(row, 2)
+            steps = self.input_table.cellWidget(row, 3)
+            if name_item is None or start is None or stop is None or steps is None:
+                continue
+            axis = ncalc_sweep.SweepAxis(name_item.text(), start.value(), stop.value(), steps.value())
+            if include_constants or axis.steps > 1:
+                axes.append(axis)
+        return axes
+
+    def _update_point_count(self) -> None:
+        points = 1
+        for axis in self._axes():
+            points *= axis.steps
+        self.points_label.setText(f"{points:,} points")
+
+    # ------------------------------------------------------------------ output
+    def _run(self) -> None:
+        inputs = self._axes(include_constants=True)
+        axes = [axis for axis in inputs if axis.steps > 1]
+        constants = {axis.name: _number(axis.start) for axis in inputs if axis.steps <= 1}
+        try:
+            result = ncalc_sweep.sweep(self.formula_edit.text().strip(), axes, constants)
+        except (ncalc_sweep.SweepError, TypeError, ValueError, ArithmeticError) as exc:
+            # NumPy reports operands it cannot combine as TypeError or ValueError.
+            QMessageBox.warning(self, "Cannot sweep formula", str(exc))
+            return
+        self._result = result
+        notes = "".join(f"\n{note}" for note in result.notes)
+        self.summary_label.setText(f"{result.summary()} in {result.elapsed * 1000:.1f} ms.{notes}")
+        if len(result.axes) >= 2:
+            self._show_heatmap(result)
+        else:
+            self._show_table(result)
+
+    def _show_table(self, result: ncalc_sweep.SweepResult) -> None:
+        if result.axes:
+            name, inputs = result.axes[0]
+            values = result.values
+        else:
+            name, inputs = "Constant inputs", np.array([""])
+            values = result.values.reshape(1)
+        rows = np.unique(np.linspace(0, len(inputs) - 1, min(len(inputs), MAX_TABLE_ROWS)).astype(np.int64))
+        self.result_table.setHorizontalHeaderLabels([name, "Result"])
+        self.result_table.setRowCount(len(rows))
+        for row, source in enumerate(rows):
+            self.result_table.setItem(row, 0, QTableWidgetItem(_format(inputs[source])))
+            self.result_table.setItem(row, 1, QTableWidgetItem(_format(values[source])))
+        self.output_stack.setCurrentWidget(self.result_table)
+
+    def _show_heatmap(self, result: ncalc_sweep.SweepResult) -> None:
+        values = result.values
+        if values.ndim > 2:
+            values = values.max(axis=tuple(range(2, values.ndim)))
+        values = values.astype(np.float64)
+        finite = np.isfinite(values)
+        low = values[finite].min() if finite.any() else 0.0
+        high = values[finite].max() if finite.any() else 0.0
+        scale = 255.0 / (high - low) if high > low else 0.0
+        shades = np.where(finite, (values - low) * scale, 0).astype(np.uint8)
+        rgb = _PALETTE[shades]
+        rgb[~finite] = (128, 128, 128)
+        # Rows are the first input (top to bottom), columns the second.
+        rgb = np.ascontiguousarray(rgb)
+        height, width = rgb.shape[:2]
+        self._image = QImage(rgb.data, width, height, width * 3, QImage.Format_RGB888).copy()
+        pixmap = QPixmap.fromImage(self._image).scaled(*HEATMAP_SIZE, Qt.IgnoreAspectRatio, Qt.FastTransformation)
+        self.heatmap_label.setPixmap(pixmap)
+        (row_name, row_values), (col_name, col_values) = result.axes[:2]
+        folded = ""
+        if len(result.axes) > 2:
+            folded = f" (maximum over {', '.join(name for name, _ in result.axes[2:])})"
+        self.heatmap_label.setToolTip(
+            f"Rows: {row_name} {_format(row_values[0])} → {_format(row_values[-1])}\n"
+            f"Columns: {col_name} {_format(col_values[0])} → {_format(col_values[-1])}\n"
+            f"Colour: {_format(low)} (dark) → {_format(high)} (bright){folded}"
+        )
+        self.summary_label.setText(
+            self.summary_label.text()
+            + f"\nRows: {row_name}, columns: {col_name}; dark {_format(low)} → bright {_format(high)}{folded}."
+        )
+        self.output_stack.setCurrentWidget(self.heatmap_label)
+
+
+def _number(value: float) -> float:
+    return int(value) if float(value).is_integer() else value
+
+
+def _format(value: object) -> str:
+    if isinstance(value, (bool, np.bool_)):
+        return "true" if value else "false"
+    if isinstance(value, (float, np.floating)):
+        return f"{float(value):g}"
+    return str(value)
@@ -0,0 +1,117 @@
+"""Find every match of a query in a large text and keep the result in step with edits.
+
+Matches are two sorted ``array('q')`` columns of start and end offsets, so
+"which match is at or after the cursor" is a binary search and a later edit
+splices the arrays instead of scanning again. Offsets are counted in UTF-16
+code units, the unit Qt text positions use. Nothing here imports Qt.
+"""
+
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from typing import Callable, Optional, Pattern, Tuple
+import re
+
+
+_WIDE = re.compile("[\U00010000-\U0010ffff]")
+
+
+class FindError(Exception):
+    """Raised for an invalid regular expression."""
+
+
+@dataclass(frozen=True)
+class FindQuery:
+    """What to look for. In regex mode ``^`` and ``$`` match at line ends."""
+
+    text: str
+    regex: bool = False
+    whole_word: bool = False
+    case_sensitive: bool = False
+
+    def compile(self) -> Pattern[str]:
+        source = self.text if self.regex else re.escape(self.text)
+        if self.whole_word:
+            source = rf"(?<!\w)(?:{source})(?!\w)"
+        try:
+            flags = re.MULTILINE | (0 if self.case_sensitive else re.IGNORECASE)
+            return re.compile(source, flags)
+        except re.error as exc:
+            raise FindError(f"Invalid regular expression: {exc}") from exc
+
+
+def utf16_converter(text: str) -> Callable[[int], int]:
+    """Map code point offsets in *text* to UTF-16 offsets (identity for BMP-only text)."""
+    wide = [match.start() for match in _WIDE.finditer(text)]
+    if not wide:
+        return lambda offset: offset
+    return lambda offset: offset + bisect_left(wide, offset)
+
+
+def scan(pattern: Pattern[str], text: str, base: int = 0) -> Tuple[array, array]:
+    """Starts and ends (UTF-16, plus *base*) of the non-empty matches in *text*."""
+    starts, ends = array("q"), array("q")
+    convert = utf16_converter(text)
+    for match in pattern.finditer(text):
+        start, end = match.span()
+        if start != end:
+            starts.append(base + convert(start))
+            ends.append(base + convert(end))
+    return starts, ends
+
+
+class MatchSet:
+    def __init__(self, query: FindQuery, starts: Optional[array] = None, ends: Optional[array] = None) -> None:
+        self.query = query
+        self.pattern = query.compile()
+        self.starts = starts if starts is not None else array("q")
+        self.ends = ends if ends is not None else array("q")
+
+    @classmethod
+    def search(cls, query: FindQuery, text: str) -> "MatchSet":
+        matches = cls(query)
+        matches.starts, matches.ends = scan(matches.pattern, text)
+        return matches
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def span(self, index: int) -> Tuple[int, int]:
+        return self.starts[index], self.ends[index]
+
+    def next_index(self, position: int) -> Optional[int]:
+        """First match starting at or after *position*, wrapping to the first one."""
+        if not self.starts:
+            return None
+        index = bisect_left(self.starts, position)
+        return index if index < len(self.starts) else 0
+
+    def previous_index(self, position: int) -> Optional[int]:
+        """Last match starting before *position*, wrapping to the last one."""
+        if not self.starts:
+            return None
+        index = bisect_left(self.starts, position) - 1
+        return index if index >= 0 else len(self.starts) - 1
+
+    def index_of(self, start: int, end: int) -> Optional[int]:
+        """Index of the match spanning exactly ``[start, end)``, if there is one."""
+        index = bisect_left(self.starts, start)
+        if index < len(self.starts) and self.starts[index] == start and self.ends[index] == end:
+            return index
+        return None
+
+    def overlapping(self, start: int, end: int) -> Tuple[int, int]:
+        """Index range ``[first, last)`` of the matches overlapping ``[start, end)``."""
+        first = bisect_right(self.ends, start)
+        return first, max(first, bisect_left(self.starts, end))
+
+    def splice(self, first: int, last: int, starts: array, ends: array, delta: int) -> None:
+        """Replace matches ``[first, last)`` with new ones and shift the later ones by *delta*."""
+        tail_starts, tail_ends = self.starts[last:], self.ends[last:]
+        if delta:
+            tail_starts = array("q", [start + delta for start in tail_starts])
+            tail_ends = array("q", [end + delta for end in tail_ends])
+        self.starts = self.starts[:first] + starts + tail_starts
+        self.ends = self.ends[:first] + ends + tail_ends
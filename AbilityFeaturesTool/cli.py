@@ -0,0 +1,355 @@
+"""Command-line tools for AbilityFeatures files; never imports Qt.
+
+    python -m AbilityFeaturesTool.cli lint mods/
+    python -m AbilityFeaturesTool.cli format --check mods/
+    python -m AbilityFeaturesTool.cli merge base.txt patch.txt -o merged.txt
+    python -m AbilityFeaturesTool.cli stats --json mods/
+
+Directories are searched recursively for ``AbilityFeatures*.txt``. Files are
+fanned out over a process pool (``--jobs``); workers send back plain data
+rather than documents. ``lint`` hands out the largest files first and reports
+each file as soon as it is checked, then sums up where the time went.
+``--json`` prints one machine-readable object on stdout. Exit status: 0 on
+success, 1 when lint finds errors (warnings too with ``--strict``) or
+``format --check`` finds unformatted files, 2 when a file cannot be read.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+from .app import lint, merge, ncalc, storage
+from .app.models import AbilityDocument, parse_header
+
+
+DEFAULT_PATTERN = "AbilityFeatures*.txt"
+NEWLINES = {"lf": "\n", "crlf": "\r\n"}
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+# ---------------------------------------------------------------------- helpers
+def find_files(paths: Iterable[str], pattern: str = DEFAULT_PATTERN) -> List[Path]:
+    """Expand directories into the matching files below them; keep files as given."""
+    found: List[Path] = []
+    seen = set()
+    for raw in paths:
+        path = Path(raw)
+        candidates = sorted(match for match in path.rglob(pattern) if match.is_file()) if path.is_dir() else [path]
+        for candidate in candidates:
+            if candidate not in seen:
+                seen.add(candidate)
+                found.append(candidate)
+    return found
+
+
+def run_pool(function: Callable[[T], R], items: Sequence[T], jobs: int) -> Iterator[R]:
+    """Map *function* over *items* in a process pool, yielding results in order."""
+    if jobs <= 1 or len(items) <= 1:
+        yield from map(function, items)
+        return
+    chunksize = max(1, len(items) // (jobs * 4))
+    with ProcessPoolExecutor(max_workers=min(jobs, len(items))) as pool:
+        yield from pool.map(function, items, chunksize=chunksize)
+
+
+def run_pool_unordered(function: Callable[[T], R], items: Sequence[T], jobs: int) -> Iterator[Tuple[int, R]]:
+    """Map *function* over *items* in a process pool, yielding ``(index, result)`` as each finishes."""
+    if jobs <= 1 or len(items) <= 1:
+        yield from enumerate(map(function, items))
+        return
+    with ProcessPoolExecutor(max_workers=min(jobs, len(items))) as pool:
+        futures = {pool.submit(function, item): index for index, item in enumerate(items)}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+
+def largest_first(files: Sequence[Path]) -> List[Path]:
+    """*files* by descending size, so one big file does not finish the run alone."""
+    def size(path: Path) -> int:
+        try:
+            return path.stat().st_size
+        except OSError:
+            return 0
+    return sorted(files, key=size, reverse=True)
+
+
+def canonical_text(document: AbilityDocument) -> str:
+    """One blank line between entries, no trailing spaces, no runs of blank lines."""
+    sections = [_tidy(document.preamble)] if any(line.strip() for line in document.preamble) else []
+    sections.extend(_tidy([entry.header, *entry.body_lines]) for entry in document.entries)
+    return "\n\n".join(sections) + "\n" if sections else ""
+
+
+def _tidy(lines: Iterable[str]) -> str:
+    tidy: List[str] = []
+    blank = False
+    for line in lines:
+        line = line.rstrip()
+        if not line:
+            blank = bool(tidy)
+            continue
+        if blank:
+            tidy.append("")
+            blank = False
+        tidy.append(line)
+    return "\n".join(tidy)
+
+
+# ---------------------------------------------------------------------- workers
+# Workers run in other processes: they take and return plain, picklable data.
+def _lint_file(path: str) -> Dict[str, object]:
+    started = time.perf_counter()
+    try:
+        document = AbilityDocument.load(Path(path))
+    except (OSError, UnicodeDecodeError) as exc:
+        return {"path": path, "error": str(exc)}
+    diagnostics = lint.lint_document(document)
+    counts = ncalc.summarize(diagnostics)
+    return {
+        "path": path,
+        "entries": len(document.entries),
+        "errors": counts[ncalc.ERROR],
+        "warnings": counts[ncalc.WARNING],
+        "elapsed": time.perf_counter() - started,
+        "diagnostics": [asdict(diagnostic) for diagnostic in diagnostics],
+    }
+
+
+def _format_file(task: Tuple[str, str, bool]) -> Dict[str, object]:
+    path, newline, check = task
+    try:
+        document = AbilityDocument.load(Path(path))
+        text = canonical_text(document)
+        newline = NEWLINES.get(newline, document.newline)
+        data = (text.replace("\n", newline) if newline != "\n" else text).encode("utf-8")
+        changed = data != b"".join(document.iter_bytes())
+        if changed and not check:
+            storage.save_atomic(Path(path), [data], expected=document.fingerprint)
+    except (OSError, UnicodeDecodeError, storage.ExternalChangeError) as exc:
+        return {"path": path, "error": str(exc)}
+    return {"path": path, "changed": changed, "written": changed and not check}
+
+
+def _stats_file(path: str) -> Dict[str, object]:
+    started = time.perf_counter()
+    try:
+        document = AbilityDocument.load(Path(path))
+    except (OSError, UnicodeDecodeError) as exc:
+        return {"path": path, "error": str(exc)}
+    types: Counter = Counter()
+    ids: Dict[str, set] = {}
+    blocks: Counter = Counter()
+    scopes: Counter = Counter()
+    for entry in document.entries:
+        key = parse_header(entry.header)
+        type_key = key[0] if key else "unknown"
+        types[type_key] += 1
+        if key and key[1] is not None:
+            ids.setdefault(type_key, set()).add(key[1])
+        parsed = entry.parsed()
+        blocks.update(block.name for block in parsed.blocks)
+        scopes.update(scope.keyword for scope in parsed.scopes)
+    return {
+        "path": path,
+        "bytes": document.fingerprint.size if document.fingerprint else 0,
+        "entries": len(document.entries),
+        "types": dict(types),
+        "ids": {type_key: len(values) for type_key, values in ids.items()},
+        "blocks": dict(blocks),
+        "scopes": dict(scopes),
+        "elapsed": time.perf_counter() - started,
+    }
+
+
+# ---------------------------------------------------------------------- commands
+def _command_lint(args: argparse.Namespace, files: List[Path]) -> int:
+    tasks = [str(path) for path in largest_first(files)]
+    results: List[Optional[Dict[str, object]]] = [None] * len(tasks)
+    status = 0
+    for index, result in run_pool_unordered(_lint_file, tasks, args.jobs):
+        results[index] = result
+        if "error" in result:
+            status = 2
+            if not args.json:
+                print(f"{result['path']}: cannot read: {result['error']}", file=sys.stderr, flush=True)
+            continue
+        if result["errors"] or (args.strict and result["warnings"]):
+            status = max(status, 1)
+        if not args.json:
+            for diagnostic in result["diagnostics"]:
+                print(f"{result['path']}: entry #{diagnostic['entry_index'] + 1}: "
+                      f"{ncalc.format_diagnostic(ncalc.Diagnostic(**diagnostic))}")
+            print(f"{result['path']}: {result['entries']} entries, {result['errors']} errors, "
+                  f"{result['warnings']} warnings ({result['elapsed'] * 1000:.0f} ms)", flush=True)
+    # Report in the order the files were found, whatever order they finished in.
+    order = {path: index for index, path in enumerate(str(path) for path in files)}
+    results.sort(key=lambda result: order[result["path"]])
+    checked = [result for result in results if "error" not in result]
+    slowest = sorted(checked, key=lambda result: result["elapsed"], reverse=True)[:3]
+    work = sum(result["elapsed"] for result in checked)
+    summary = {
+        "files": len(results),
+        "entries": sum(result["entries"] for result in checked),
+        "errors": sum(result["errors"] for result in checked),
+        "warnings": sum(result["warnings"] for result in checked),
+        "unreadable": len(results) - len(checked),
+        "jobs": min(args.jobs, len(tasks)),
+        "work_time": round(work, 3),
+        "slowest": [{"path": result["path"], "elapsed": round(result["elapsed"], 3)} for result in slowest],
+    }
+    if not args.json and len(checked) > 1:
+        print("Slowest: " + ", ".join(f"{result['path']} ({result['elapsed'] * 1000:.0f} ms)" for result in slowest))
+    return _finish(args, results, summary, status,
+                   f"{summary['files']} files, {summary['entries']} entries: "
+                   f"{summary['errors']} errors, {summary['warnings']} warnings; "
+                   f"{work:.2f} s of work on {summary['jobs']} processes")
+
+
+def _command_format(args: argparse.Namespace, files: List[Path]) -> int:
+    tasks = [(str(path), args.newline, args.check) for path in files]
+    results = []
+    status = 0
+    for result in run_pool(_format_file, tasks, args.jobs):
+        results.append(result)
+        if "error" in result:
+            status = 2
+            if not args.json:
+                print(f"{result['path']}: {result['error']}", file=sys.stderr)
+        elif result["changed"]:
+            if args.check:
+                status = max(status, 1)
+            if not args.json:
+                print(f"{'would reformat' if args.check else 'reformatted'} {result['path']}")
+    changed = sum(1 for result in results if result.get("changed"))
+    summary = {"files": len(results), "changed": changed, "check": args.check}
+    verb = "would be reformatted" if args.check else "reformatted"
+    return _finish(args, results, summary, status, f"{summary['files']} files, {changed} {verb}")
+
+
+def _command_merge(args: argparse.Namespace, files: List[Path]) -> int:
+    if len(files) < 2:
+        print("merge needs at least two files", file=sys.stderr)
+        return 2
+    try:
+        result, _ = merge.merge_files(files, Path(args.output) if args.output else None, processes=args.jobs)
+    except merge.MergeError as exc:
+        print(f"cannot read: {exc}", file=sys.stderr)
+        return 2
+    if args.report:
+        Path(args.report).write_text(result.report(), encoding="utf-8")
+    elif not args.json:
+        sys.stdout.write(result.report())
+    conflicts = [
+        {
+            "key": conflict.label,
+            "identical": conflict.identical,
+            "winner": result.sources[conflict.winner].name,
+            "sources": [result.sources[index].name for index, _ in conflict.definitions],
+        }
+        for conflict in result.conflicts
+    ]
+    summary = {
+        "files": len(result.sources),
+        "entries_read": result.entries_read,
+        "entries_merged": len(result.document.entries),
+        "conflicts": len(result.differing),
+        "identical_overlaps": len(result.conflicts) - len(result.differing),
+        "output": args.output,
+    }
+    return _finish(args, conflicts, summary, 0, result.summary())
+
+
+def _command_stats(args: argparse.Namespace, files: List[Path]) -> int:
+    results = []
+    status = 0
+    totals: Dict[str, Counter] = {"types": Counter(), "blocks": Counter(), "scopes": Counter()}
+    for result in run_pool(_stats_file, [str(path) for path in files], args.jobs):
+        results.append(result)
+        if "error" in result:
+            status = 2
+            print(f"{result['path']}: cannot read: {result['error']}", file=sys.stderr)
+            continue
+        for name, counter in totals.items():
+            counter.update(result[name])
+        if not args.json:
+            types = ", ".join(f"{key} {count}" for key, count in sorted(result["types"].items()))
+            print(f"{result['path']}: {result['entries']} entries ({types}), "
+                  f"{storage.format_size(result['bytes'])}")
+    readable = [result for result in results if "error" not in result]
+    summary = {
+        "files": len(results),
+        "entries": sum(result["entries"] for result in readable),
+        "bytes": sum(result["bytes"] for result in readable),
+        **{name: dict(counter.most_common()) for name, counter in totals.items()},
+    }
+    if not args.json and readable:
+        top_blocks = ", ".join(f"{name} {count}" for name, count in totals["blocks"].most_common(8))
+        print(f"Most used blocks: {top_blocks}")
+    return _finish(args, results, summary, status,
+                   f"{summary['files']} files, {summary['entries']} entries, {storage.format_size(summary['bytes'])}")
+
+
+def _finish(args: argparse.Namespace, results: object, summary: Dict[str, object], status: int, line: str) -> int:
+    elapsed = time.perf_counter() - args.started
+    if args.json:
+        summary = {**summary, "elapsed": round(elapsed, 3)}
+        json.dump({"command": args.command, "summary": summary, "results": results}, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        print(f"{line} ({elapsed:.2f} s)")
+    return status
+
+
+# ---------------------------------------------------------------------- entry point
+def build_parser() -> argparse.ArgumentParser:
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("paths", nargs="+", help="files, or directories to search recursively")
+    common.add_argument("--pattern", default=DEFAULT_PATTERN, help=f"file name pattern in directories (default {DEFAULT_PATTERN})")
+    common.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="worker processes")
+    common.add_argument("--json", action="store_true", help="print a JSON object instead of text")
+
+    parser = argparse.ArgumentParser(prog="python -m AbilityFeaturesTool.cli", description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    lint_parser = commands.add_parser("lint", parents=[common], help="check entries and [code=...] formulas")
+    lint_parser.add_argument("--strict", action="store_true", help="fail on warnings too")
+    format_parser = commands.add_parser("format", parents=[common], help="rewrite files in canonical layout")
+    format_parser.add_argument("--check", action="store_true", help="only report files that would change")
+    format_parser.add_argument("--newline", choices=["keep", *NEWLINES], default="keep")
+    merge_parser = commands.add_parser("merge", parents=[common], help="merge files, later ones win")
+    merge_parser.add_argument("-o", "--output", help="write the merged document here")
+    merge_parser.add_argument("--report", help="write the conflict report here instead of stdout")
+    commands.add_parser("stats", parents=[common], help="count entries, types, blocks and scopes")
+    return parser
+
+
+_COMMANDS = {
+    "lint": _command_lint,
+    "format": _command_format,
+    "merge": _command_merge,
+    "stats": _command_stats,
+}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    args.started = time.perf_counter()
+    files = find_files(args.paths, args.pattern)
+    if not files:
+        print("no AbilityFeatures files found", file=sys.stderr)
+        return 2
+    return _COMMANDS[args.command](args, files)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())